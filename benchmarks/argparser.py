@@ -0,0 +1,62 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import timeit
+
+from storm.decorators import argparser
+
+
+class _Context:
+    def __init__(self, arguments):
+        self.arguments = arguments
+
+    def get_arguments(self, name):
+        return self.arguments.get(name, [])
+
+
+def _handler(context, **kwargs):
+    return kwargs
+
+
+def _declare(count):
+    """the mix of required, optional and multiple arguments"""
+    arguments = []
+    values = {}
+    for i in range(count):
+        name = 'arg%d' % i
+        kind = i % 3
+        if kind == 0:
+            arguments.append((name, int, False))
+            values[name] = ['%d' % i]
+        elif kind == 1:
+            arguments.append((name, str, False, None))
+        else:
+            arguments.append((name, int, True))
+            values[name] = ['1', '2', '3']
+    return arguments, _Context(values)
+
+
+def main(number=100000):
+    print("%10s %16s" % ("arguments", "overhead, us"))
+    for count in (1, 5, 20):
+        arguments, context = _declare(count)
+        wrapped = argparser.argparser(arguments)(_handler)
+        parse_time = timeit.timeit(lambda: wrapped(context), number=number)
+        call_time = timeit.timeit(lambda: _handler(context), number=number)
+        print("%10d %16.2f" % (count, (parse_time - call_time) / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import gc
+import time
+
+from storm.decorators import handler
+from storm.decorators import json
+from storm.decorators.argparser import argparser
+
+
+class _CountingLoop(asyncio.SelectorEventLoop):
+    """counts the callbacks, each of them costs the Handle allocation and the loop iteration"""
+    callbacks = 0
+
+    def call_soon(self, *args, **kwargs):
+        self.callbacks += 1
+        return super().call_soon(*args, **kwargs)
+
+
+class _Modules:
+    def __init__(self, loop):
+        self.loop = loop
+
+
+class _Context:
+    """the minimal request context"""
+
+    current_user = 'user'
+
+    def __init__(self, loop):
+        self.finished = False
+        self.modules = _Modules(loop)
+        self.settings = {'known_exceptions': None}
+        self.arguments = {'value': ['1']}
+
+    def admit(self, priority):
+        return True
+
+    def get_argument(self, name, default):
+        return default
+
+    def get_header(self, name):
+        return None
+
+    def get_arguments(self, name):
+        return self.arguments.get(name, [])
+
+    def set_header(self, name, value):
+        pass
+
+    def add_vary(self, name):
+        pass
+
+    def set_status(self, status):
+        pass
+
+    def write(self, chunk):
+        pass
+
+    def finish(self):
+        self.finished = True
+
+
+def _sync_handler(context, value: int):
+    return {'value': value}
+
+
+async def _async_handler(context, value: int):
+    return {'value': value}
+
+
+def _declare(func):
+    return handler.handler(argparser([('value', int, False)])(json.output(func)), secure=True)
+
+
+async def _serve(h, context, number):
+    """executes the handler like the framework does"""
+    for _ in range(number):
+        context.finished = False
+        result = h(context)
+        if result is not None:
+            await result
+
+
+def _measure(loop, func, number):
+    h = _declare(func)
+    context = _Context(loop)
+    loop.run_until_complete(_serve(h, context, 100))
+
+    gc.collect()
+    elapsed = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        loop.run_until_complete(_serve(h, context, number))
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    loop.callbacks = 0
+    loop.run_until_complete(_serve(h, context, number))
+    # run_until_complete schedules own callbacks
+    callbacks = loop.callbacks - 2
+    return elapsed / number * 1e6, callbacks / number
+
+
+def main(number=20000):
+    loop = _CountingLoop()
+    asyncio.set_event_loop(loop)
+    print("%10s %14s %24s" % ("handler", "latency, us", "callbacks per request"))
+    for name, func in (('def', _sync_handler), ('async def', _async_handler)):
+        latency, callbacks = _measure(loop, func, number)
+        print("%10s %14.2f %24.2f" % (name, latency, callbacks))
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
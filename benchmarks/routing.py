@@ -0,0 +1,56 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import re
+import timeit
+
+from storm._tornado import routing
+
+
+def _regex_routes(count):
+    return [re.compile(r'/resource%d/(?P<id>\d+)/items/(?P<name>[^/]+)$' % i) for i in range(count)]
+
+
+def _regex_lookup(rules, path):
+    """the linear scan like tornado.web.Application does"""
+    for i, regex in enumerate(rules):
+        match = regex.match(path)
+        if match is not None:
+            return i, match.groupdict()
+
+
+def _prefix_tree(count):
+    router = routing.Router()
+    for i in range(count):
+        router.add('/resource%d/{id:int}/items/{name}' % i, i)
+    return router
+
+
+def main(number=10000):
+    print("%8s %14s %14s" % ("routes", "regex, us", "tree, us"))
+    for count in (10, 100, 500):
+        rules = _regex_routes(count)
+        router = _prefix_tree(count)
+        # the worst case for linear scan - the last route
+        path = '/resource%d/12345/items/name' % (count - 1)
+        assert _regex_lookup(rules, path)[0] == router.match(path)[0]
+
+        regex_time = timeit.timeit(lambda: _regex_lookup(rules, path), number=number)
+        tree_time = timeit.timeit(lambda: router.match(path), number=number)
+        print("%8d %14.2f %14.2f" % (count, regex_time / number * 1e6, tree_time / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import datetime
+import timeit
+
+from storm import serializers
+
+
+def _payloads():
+    """the typical shapes of responses: the single object, the page of query and the nested document"""
+    record = {
+        "id": 123456, "name": "John Smith", "email": "john.smith@example.com", "active": True,
+        "score": 98.25, "tags": ["admin", "staff"], "created": datetime.date(2017, 5, 1).isoformat(), "parent": None,
+    }
+    page = {"total": 1000, "offset": 0, "items": [dict(record, id=i) for i in range(100)]}
+    document = {"id": 1, "sections": [{"title": "section %d" % i, "items": page["items"][:10]} for i in range(10)]}
+    return [("object", record), ("page", page), ("document", document)]
+
+
+def _backends():
+    for name in serializers.JSON_BACKENDS + ('msgpack',):
+        for sort_keys in (True, False):
+            try:
+                if name == 'msgpack':
+                    serializers.configure(sort_keys=sort_keys)
+                    serializer = serializers.get(serializers.MSGPACK_CONTENT_TYPE)
+                else:
+                    serializers.configure(name, sort_keys=sort_keys)
+                    serializer = serializers.get()
+            except ImportError:
+                serializer = None
+            if serializer is None:
+                print("%10s is not available" % name)
+                break
+            yield name + ('' if sort_keys else ' unsorted'), serializer
+            if name == 'msgpack':
+                break
+
+
+def main(number=2000):
+    print("%18s %10s %12s %12s %10s" % ("backend", "payload", "dumps, us", "loads, us", "bytes"))
+    for name, serializer in _backends():
+        for payload_name, payload in _payloads():
+            data = serializer.dumps(payload)
+            dumps_time = min(timeit.repeat(lambda: serializer.dumps(payload), number=number, repeat=3))
+            loads_time = min(timeit.repeat(lambda: serializer.loads(data), number=number, repeat=3))
+            print("%18s %10s %12.2f %12.2f %10d" % (
+                name, payload_name, dumps_time / number * 1e6, loads_time / number * 1e6, len(data)
+            ))
+    serializers.configure()
+
+
+if __name__ == '__main__':
+    main()
@@ -45,6 +45,7 @@ if __name__ == '__main__':
         packages=find_packages(),
         zip_safe=False,
         install_requires=find_requires(),
+        python_requires='>=3.6',
         author="Bulat Gaifullin",
         author_email="gaifullinbf@gmail.com",
         maintainer="Bulat Gaifullin",
@@ -61,7 +62,7 @@ if __name__ == '__main__':
             "Operating System :: POSIX",
             "Operating System :: POSIX :: Linux",
             "Operating System :: Unix",
-            "Programming Language :: Python :: 3.4",
+            "Programming Language :: Python :: 3.6",
             "Topic :: WEB",
         ],
     )
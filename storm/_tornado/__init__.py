@@ -18,9 +18,10 @@ from tornado.web import HTTPError
 from tornado.concurrent import Future
 
 from . import auth
+from .application import OverloadController
 from .application import start as start_serve
 from .http_client import HTTPClient
 
 
-__all__ = ["Future", "HTTPClient", "HTTPError", "ObjectDict",
+__all__ = ["Future", "HTTPClient", "HTTPError", "ObjectDict", "OverloadController",
            "auth", "import_object", "start_serve"]
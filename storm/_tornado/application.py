@@ -13,48 +13,166 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import collections
+import math
+import os
 import signal
 
+from tornado import gen
+from tornado import httpserver
+from tornado import netutil
 from tornado import web
 
+from .. import compression
+from .. import serializers
+from . import executors
 from . import handler
 from . import log
-
-
-def _options_callback(func, context):
-    def wrapper():
-        func(**context)
-        context.clear()
-    return wrapper
+from . import process
+from . import routing
 
 
 class ModulesRegistry:
-    def __init__(self, loop, logger):
-        self.loop = loop
+    def __init__(self, logger):
+        self.loop = None
         self.logger = logger
-
-    @staticmethod
-    def _load_module(registry, name, loader, options, loop, logger):
-        settings = {k[len(name) + 1:]: v for k, v in options.group_dict(name).items()}
-        registry[name] = loader(settings, loop=loop, logger=logger)
-        logger.info("the module %s has been loaded successfully.", name)
+        self._loaders = []
 
     def lazy_load(self, module, options):
+        """defines the module settings, the module will be loaded by load"""
         name = module.__name__.split('.')[-1]
         for opt in module.SETTINGS:
             options.define(name='_'.join((name, opt.pop('name'))), group=name, **opt)
+        self._loaders.append((name, module.load, getattr(module, 'unload', None)))
 
-        options.add_parse_callback(_options_callback(
-            self._load_module,
-            {
-                'registry': self.__dict__,
-                'loader': module.load,
-                'name': name,
-                'loop': self.loop,
-                'logger': self.logger,
-                'options': options
-            })
-        )
+    def load(self, options, loop):
+        """loads the modules, should be called in the worker process"""
+        self.loop = loop
+        logger = self.logger
+        for name, loader, _ in self._loaders:
+            settings = {k[len(name) + 1:]: v for k, v in options.group_dict(name).items()}
+            setattr(self, name, loader(settings, loop=loop, logger=logger))
+            logger.info("the module %s has been loaded successfully.", name)
+
+    def unload(self):
+        """releases the resources of modules in the reverse order"""
+        logger = self.logger
+        for name, _, unloader in reversed(self._loaders):
+            module = vars(self).pop(name, None)
+            if unloader is None or module is None:
+                continue
+            try:
+                unloader(module, logger=logger)
+                logger.info("the module %s has been unloaded.", name)
+            except Exception as e:
+                logger.exception("failed to unload the module %s: %r", name, e)
+
+
+class OverloadController:
+    """
+    the adaptive limit of concurrent requests in the style of AIMD/gradient limiters:
+    the limit grows additively, while the event loop lag and the latency are steady, and shrinks
+    multiplicatively, when they grow. the requests of lower priority are shed first.
+    """
+
+    # the share of limit, that is available for requests of priority, the critical requests are never shed
+    SHARES = {'critical': None, 'high': 1.0, 'normal': 0.9, 'low': 0.5}
+
+    def __init__(self, initial_limit=100, min_limit=10, max_limit=1000, lag_threshold=0.05,
+                 latency_tolerance=2.0, backoff=0.9, interval=0.1, baseline_window=300):
+        """
+        :param initial_limit: the initial limit of concurrent requests
+        :param min_limit: the lower bound of limit
+        :param max_limit: the upper bound of limit
+        :param lag_threshold: the event loop lag in seconds, that means overload
+        :param latency_tolerance: the ratio of short-term latency to the baseline, that means overload
+        :param backoff: the multiplier of limit on overload
+        :param interval: the interval in seconds to measure lag and to adjust limit
+        :param baseline_window: the number of intervals, the baseline is the moving average of latency over them
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.lag_threshold = lag_threshold
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.interval = interval
+        self.inflight = 0
+        self.lag = 0.0
+        self.latency = None
+        self.baseline = None
+        self.shed = collections.Counter()
+        self.baseline_window = baseline_window
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        self._loop = None
+        self._timer = None
+
+    def admit(self, priority):
+        """takes the slot for request of priority, returns False if request should be shed"""
+        share = self.SHARES[priority]
+        if share is not None and self.inflight >= self.limit * share:
+            self.shed[priority] += 1
+            return False
+        self.inflight += 1
+        return True
+
+    def complete(self, latency):
+        """releases the slot of request, that has been completed in latency seconds"""
+        self.inflight -= 1
+        self._latency_sum += latency
+        self._latency_count += 1
+
+    def stats(self):
+        """returns the state of controller"""
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "lag": self.lag,
+            "latency": self.latency,
+            "baseline": self.baseline,
+            "shed": dict(self.shed),
+        }
+
+    def adjust(self):
+        """adjusts the limit according to the measured lag and latency"""
+        # the latency is the average over interval, it is not checked, if no request has been completed
+        latency = None
+        if self._latency_count:
+            latency = self.latency = self._latency_sum / self._latency_count
+            self._latency_sum, self._latency_count = 0.0, 0
+            # the baseline is the long-term moving average, so the steady mix of fast and slow requests
+            # is not the overload, and the baseline follows the latency shift
+            if self.baseline is None:
+                self.baseline = latency
+            else:
+                self.baseline += (latency - self.baseline) / self.baseline_window
+
+        if self.lag > self.lag_threshold or (latency is not None and latency > self.baseline * self.latency_tolerance):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            return
+
+        if self.inflight >= self.limit * 0.5:
+            self.limit = min(self.max_limit, self.limit + math.sqrt(self.limit))
+
+    def start(self, loop):
+        """starts measuring the event loop lag"""
+        self._loop = loop
+        self._schedule()
+
+    def stop(self):
+        """stops measuring the event loop lag"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule(self):
+        self._timer = self._loop.call_later(self.interval, self._tick, self._loop.time() + self.interval)
+
+    def _tick(self, expected):
+        self.lag = max(self._loop.time() - expected, 0.0)
+        self.adjust()
+        self._schedule()
 
 
 def _get_event_loop():
@@ -70,17 +188,60 @@ def _concat_url(base, uri):
     return base + uri
 
 
+def _shutdown_handler(loop, server, settings, modules, timeout, overload=None):
+    """
+    makes the signal handler, that stops accepting new connections, waits for the active requests
+    not longer than timeout, closes the kept alive connections, unloads the modules and stops the loop.
+    the second signal stops the loop immediately.
+    """
+    draining = []
+    active_requests = settings['active_requests']
+
+    async def drain():
+        server.stop()
+        # the responses are sent with "Connection: close", see RequestHandler.flush
+        settings['draining'] = True
+        log.app_log.info("stop accepting connections, %d requests in progress.", len(active_requests))
+
+        deadline = loop.time() + timeout
+        while active_requests and loop.time() < deadline:
+            await gen.sleep(0.1)
+        if active_requests:
+            log.app_log.warning("%d requests have not been completed in time.", len(active_requests))
+
+        # closes the kept alive connections, that have not been closed by clients
+        await server.close_all_connections()
+        if overload is not None:
+            overload.stop()
+        executors.shutdown()
+        modules.unload()
+        loop.stop()
+
+    def handler(*_):
+        if draining:
+            loop.add_callback_from_signal(loop.stop)
+        else:
+            draining.append(True)
+            loop.add_callback_from_signal(drain)
+
+    return handler
+
+
 def compile_handler(methods):
-    return type("Handler%d" % id(methods), (handler.TemplateHandler,), methods)
+    cls = type("Handler%d" % id(methods), (handler.TemplateHandler,), methods)
+    if any(getattr(m, 'stream_body', False) for m in methods.values()):
+        cls = web.stream_request_body(cls)
+    return cls
 
 
-def start(prefix, settings, modules, routes, known_exceptions, **kwargs):
+def start(prefix, settings, modules, routes, known_exceptions, workers=1, **kwargs):
     """starts the tornado application.
     :param prefix: the url prefix
     :param settings: the user defined settings
     :param modules: the modules to load
     :param handlers: the list of url routes (url, handler)
     :param known_exceptions: the mapping of known exceptions to HTTP codes
+    :param workers: the number of worker processes, 0 - one per CPU
     :param kwargs: the tornado application arguments
     """
     from tornado.options import options
@@ -89,11 +250,29 @@ def start(prefix, settings, modules, routes, known_exceptions, **kwargs):
                    callback=lambda p: options.parse_config_file(p, final=False))
     options.define("port", default=8000, help="listening port", type=int)
     options.define("address", default='127.0.0.1', help="listening address")
+    options.define("workers", default=workers, help="the number of worker processes, 0 - one per CPU", type=int)
+    options.define("reuse_port", default=False, help="each worker binds own socket with SO_REUSEPORT", type=bool)
+    options.define("shutdown_timeout", default=10.0, help="the time in seconds to complete requests on shutdown",
+                   type=float)
+    options.define("serializer", default=None, type=str,
+                   help="the json backend: json, ujson or orjson, default - the first available")
+    options.define("sort_keys", default=True, type=bool, help="sort the keys of objects in responses")
+    options.define("compression", default=True, type=bool, help="compress the responses by Accept-Encoding")
+    options.define("compression_threshold", default=1024, type=int, help="the minimum size of response to compress")
+    options.define("compression_level", default=6, type=int, help="the compression level, 1 - fastest, 9 - best")
+    options.define("thread_pool_size", default=0, type=int,
+                   help="the number of threads to run handlers with executor='thread', 0 - default")
+    options.define("process_pool_size", default=0, type=int,
+                   help="the number of processes to run handlers with executor='process', 0 - CPUs per worker")
+    options.define("overload_control", default=False, help="shed requests by priority, when server is overloaded",
+                   type=bool)
+    options.define("overload_max_limit", default=1000, help="the upper bound of concurrent requests", type=int)
+    options.define("overload_lag", default=0.05, help="the event loop lag in seconds, that means overload",
+                   type=float)
 
     options.add_parse_callback(log.patch_logger)
 
-    loop = _get_event_loop()
-    modules_registry = ModulesRegistry(loop.asyncio_loop, log.gen_log)
+    modules_registry = ModulesRegistry(log.gen_log)
 
     for module in modules:
         modules_registry.lazy_load(module, options)
@@ -111,16 +290,58 @@ def start(prefix, settings, modules, routes, known_exceptions, **kwargs):
     # prevent override this option
     kwargs['known_exceptions'] = known_exceptions
     kwargs['modules'] = modules_registry
+    kwargs['active_requests'] = set()
 
+    # the url templates are looked up in the prefix tree, the regular expressions are matched one by one
     handlers = []
+    loaders = []
     for uri, methods in routes:
         log.app_log.info("add resource: %s", uri)
         handlers.append((_concat_url(prefix, uri), compile_handler(methods)))
+        loaders.extend(m.load for m in methods.values() if hasattr(m, 'load'))
+
+    app = routing.Application(handlers, **kwargs)
+
+    # the listening socket is shared between workers, unless each worker binds own with SO_REUSEPORT
+    sockets = None
+    if not options.reuse_port:
+        sockets = netutil.bind_sockets(options.port, options.address)
+    workers = process.worker_count(options.workers)
+    if workers != 1:
+        # the lazy handlers are imported before fork, so the workers share the modules, see storm.manifest
+        for load in loaders:
+            load()
+        worker_id = process.fork_workers(workers)
+        log.app_log.info("worker %d started.", worker_id)
+    if sockets is None:
+        sockets = netutil.bind_sockets(options.port, options.address, reuse_port=True)
+
+    # each worker has own process pool, the pools of workers share the CPUs
+    process_pool_size = options.process_pool_size or max(1, (os.cpu_count() or 1) // workers)
+    executors.configure(thread=options.thread_pool_size, process=process_pool_size)
+    executors.start()
+    serializers.configure(options.serializer, options.sort_keys)
+    compression.configure(options.compression, options.compression_threshold, options.compression_level)
+
+    # the event loop and the modules should be created after fork
+    loop = _get_event_loop()
+    modules_registry.load(options, loop.asyncio_loop)
+
+    overload = None
+    if options.overload_control:
+        overload = OverloadController(
+            initial_limit=min(100, options.overload_max_limit), min_limit=min(10, options.overload_max_limit),
+            max_limit=options.overload_max_limit, lag_threshold=options.overload_lag
+        )
+        overload.start(loop.asyncio_loop)
+        app.settings['overload'] = overload
 
-    app = web.Application(handlers, **kwargs)
-    app.listen(options.port, options.address, xheaders=True)
+    server = httpserver.HTTPServer(app, xheaders=True)
+    server.add_sockets(sockets)
 
-    signal.signal(signal.SIGTERM, lambda *x: loop.stop())
+    signal.signal(signal.SIGTERM, _shutdown_handler(
+        loop, server, app.settings, modules_registry, options.shutdown_timeout, overload
+    ))
     log.app_log.info("start listening on %s:%d", options.address, options.port or 80)
 
     try:
@@ -14,13 +14,15 @@ SOFTWARE.
 """
 
 import functools
-import ujson
 import urllib.parse as urllib_parse
 
 import tornado.auth
 import tornado.httpclient as httpclient
+from tornado.concurrent import return_future
 from tornado.httputil import url_concat
 
+from .. import serializers
+
 
 AuthError = tornado.auth.AuthError
 
@@ -41,7 +43,7 @@ class GoogleOAuth2(tornado.auth.OAuth2Mixin, ContextMixin):
     _API_ENDPOINT = "https://www.googleapis.com/plus/v1/people"
     _OAUTH_NO_CALLBACKS = False
 
-    @tornado.auth.return_future
+    @return_future
     def authenticate(self, redirect_uri, callback,
                      code=None, client_id=None, client_secret=None):
         """Handles the login for the Google user, returning a user object."""
@@ -64,13 +66,13 @@ class GoogleOAuth2(tornado.auth.OAuth2Mixin, ContextMixin):
         if response.error:
             raise AuthError("Google auth error: %s(%s)" % (response.error, response.body))
         try:
-            session = ujson.loads(response.body)
+            session = serializers.get().loads(response.body)
         except ValueError as e:
             raise AuthError("Google auth error: %s" % e) from None
 
         callback(session)
 
-    @tornado.auth.return_future
+    @return_future
     def google_request(self, path, callback, **kwargs):
         """call the relative google plus apis."""
 
@@ -88,7 +90,7 @@ class GoogleOAuth2(tornado.auth.OAuth2Mixin, ContextMixin):
                             (response.error, response.body, response.request.url))
 
         try:
-            data = ujson.loads(response.body)
+            data = serializers.get().loads(response.body)
         except ValueError as e:
             raise AuthError("Error response: %s fetching %s" % (e, response.request.url)) from None
 
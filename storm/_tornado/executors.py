@@ -0,0 +1,66 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import multiprocessing
+from concurrent import futures
+
+
+# the maximum number of workers by kind of executor, None - the default of concurrent.futures
+_sizes = {'thread': None, 'process': None}
+_executors = dict()
+# the kinds of executors, that are used by handlers
+_required = set()
+
+
+def configure(thread=None, process=None):
+    """sets the maximum number of workers of the thread and the process pools"""
+    _sizes['thread'] = thread or None
+    _sizes['process'] = process or None
+
+
+def require(kind):
+    """marks that the executor of kind is used, the process pool is created by start"""
+    _required.add(kind)
+
+
+def start():
+    """
+    creates the process pool, if it is used, before the event loop is started:
+    the workers are forked from the process without threads and inherit the functions, that are registered by name.
+    """
+    if 'process' not in _required or 'process' in _executors:
+        return
+    method = multiprocessing.get_start_method()
+    if method != 'fork':
+        raise RuntimeError("executor='process' requires the 'fork' start method of multiprocessing, not %r" % method)
+    executor = _executors['process'] = futures.ProcessPoolExecutor(_sizes['process'])
+    # the workers are forked on the first call
+    executor.submit(int).result()
+
+
+def get(kind):
+    """returns the executor by kind, the thread pool is created on the first call"""
+    executor = _executors.get(kind)
+    if executor is None:
+        if kind == 'process':
+            raise RuntimeError("the process pool is not started")
+        executor = _executors[kind] = futures.ThreadPoolExecutor(_sizes[kind])
+    return executor
+
+
+def shutdown():
+    """stops the executors and waits for the running calls, it is called after the requests have been completed"""
+    while _executors:
+        _, executor = _executors.popitem()
+        executor.shutdown(wait=True)
@@ -14,12 +14,19 @@ SOFTWARE.
 """
 
 
+import asyncio
+import copy
+import hashlib
 import logging
+import time
 import uuid
 from itertools import filterfalse
 
+import tornado.httputil
 import tornado.web
-import ujson
+
+from .. import serializers
+from .json_stream import JsonStream
 
 
 logger = logging.getLogger(__package__.split('.', 1)[0])
@@ -34,6 +41,12 @@ def _split_locales(locales):
         yield code.partition('-')[0].lower()
 
 
+def _retrieve_exception(future):
+    """marks the exception of future as retrieved"""
+    if not future.cancelled():
+        future.exception()
+
+
 class RequestHandler(tornado.web.RequestHandler):
     """The request context"""
 
@@ -41,6 +54,20 @@ class RequestHandler(tornado.web.RequestHandler):
 
     _logger = None
 
+    # the monotonic time, when the handler should be completed, see declare(timeout=)
+    deadline = None
+    # the monotonic time, when the request has been admitted by the overload controller
+    _admitted_at = None
+    # the callbacks, that receive the response before it is sent
+    _response_callbacks = None
+    # the ETag of response to GET request: True - sha1 of body, 'fast' - blake2b of body, False - none,
+    # see declare(etag=)
+    etag = True
+    # the parser of request body, that is streamed to handler, see declare(stream_body=)
+    _body_stream = None
+    # the chunks of request body, that is received by handler with streaming body, but is not streamed
+    _body_chunks = None
+
     @property
     def finished(self):
         """indicates that request has been finished yet."""
@@ -55,6 +82,141 @@ class RequestHandler(tornado.web.RequestHandler):
     def modules(self):
         return self.settings['modules']
 
+    def remaining_time(self):
+        """the remaining time budget of request in seconds or None if request has no deadline."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def admit(self, priority):
+        """asks the overload controller to admit the request, returns False if request should be shed."""
+        controller = self.settings.get('overload')
+        if controller is None:
+            return True
+        if not controller.admit(priority):
+            return False
+        self._admitted_at = time.monotonic()
+        return True
+
+    def _release_admission(self):
+        """reports the latency of admitted request to the overload controller"""
+        if self._admitted_at is not None:
+            self.settings['overload'].complete(time.monotonic() - self._admitted_at)
+            self._admitted_at = None
+
+    def compute_etag(self):
+        """computes the fingerprint of response body, if the ETag is enabled for handler"""
+        if self.etag != 'fast':
+            return super().compute_etag() if self.etag else None
+        fingerprint = hashlib.blake2b(digest_size=16)
+        for part in self._write_buffer:
+            fingerprint.update(part)
+        return '"%s"' % fingerprint.hexdigest()
+
+    def add_vary(self, name):
+        """appends the name of request header to the Vary header of response"""
+        vary = self._headers.get('Vary')
+        if vary is None:
+            self.set_header('Vary', name)
+        elif name.lower() not in (x.strip().lower() for x in vary.split(',')):
+            self.set_header('Vary', '%s, %s' % (vary, name))
+
+    def check_version(self, version):
+        """
+        sets the ETag by the version of resource, that is supplied by handler.
+        returns True if the client has the same version, the response is completed with 304 status in this case.
+        """
+        self.set_header('Etag', '"%s"' % version)
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return True
+        return False
+
+    def on_response(self, callback):
+        """registers the callback, that receives the response (status, reason, headers, body) before it is sent."""
+        if self._response_callbacks is None:
+            self._response_callbacks = []
+        self._response_callbacks.append(callback)
+
+    def write_response(self, response):
+        """writes the response (status, reason, headers, body), that has been received by on_response."""
+        status, reason, headers, body = response
+        self.set_status(status, reason)
+        date = self._headers.get('Date')
+        self._headers = tornado.httputil.HTTPHeaders()
+        for name, value in headers:
+            self._headers.add(name, value)
+        if date is not None and 'Date' not in self._headers:
+            self._headers['Date'] = date
+        if status == 200 and 'Etag' in self._headers and self.check_etag_header():
+            # the version of resource has been supplied by handler, see check_version
+            self.set_status(304)
+            self.finish()
+        else:
+            self.finish(body)
+
+    def _capture_response(self):
+        """passes the response to on_response callbacks"""
+        callbacks = self._response_callbacks
+        self._response_callbacks = None
+        headers = list(self._headers.get_all())
+        if hasattr(self, '_new_cookie'):
+            # the cookies are added to headers on flush
+            headers.extend(('Set-Cookie', x.OutputString(None)) for x in self._new_cookie.values())
+        response = (self._status_code, self._reason, headers, b''.join(self._write_buffer))
+        for callback in callbacks:
+            callback(response)
+
+    def abort(self):
+        """closes the connection without completing the response, so the client detects, that it is broken"""
+        self.request.connection.stream.close()
+        self.finish()
+
+    def flush(self, include_footers=False, callback=None):
+        """see tornado.RequestHandler flush"""
+        if not self._headers_written and self.settings.get('draining'):
+            # the server is stopping, the client should not send the next request on this connection
+            self.set_header('Connection', 'close')
+        return super().flush(include_footers, callback)
+
+    def finish(self, chunk=None):
+        """see tornado.RequestHandler finish"""
+        if self._response_callbacks is not None and not self._finished:
+            if self._headers_written:
+                # the response has been streamed, it cannot be captured
+                self._response_callbacks = None
+            else:
+                if chunk is not None:
+                    self.write(chunk)
+                    chunk = None
+                self._capture_response()
+        return super().finish(chunk)
+
+    def shadow(self):
+        """
+        makes the copy of context to run handler in background,
+        the response of copy is passed to on_response callbacks instead of being sent.
+        """
+        shadow = copy.copy(self)
+        shadow._finished = False
+        shadow._headers_written = False
+        shadow._response_callbacks = None
+        shadow._admitted_at = None
+        shadow.clear()
+        shadow.finish = shadow._finish_shadow
+        return shadow
+
+    def _finish_shadow(self, chunk=None):
+        """the finish of shadow context, see shadow"""
+        if self._finished:
+            raise RuntimeError("finish() called twice")
+        if chunk is not None:
+            self.write(chunk)
+        if self._response_callbacks is not None:
+            self._capture_response()
+        self._finished = True
+
     def request_uri(self):
         """Shortcut for request.uri."""
         return self.request.uri
@@ -69,7 +231,16 @@ class RequestHandler(tornado.web.RequestHandler):
 
     def get_body(self):
         """Shortcut for request.body."""
-        return self.request.body
+        body = self.request.body
+        if not isinstance(body, bytes):
+            # the body is received by data_received
+            return b''.join(self._body_chunks or ())
+        return body
+
+    @property
+    def body_stream(self):
+        """the asynchronous iterator of json array elements or NDJSON lines of body, see declare(stream_body=)"""
+        return self._body_stream
 
     def get_content_type(self):
         """Shortcut to get content-type and charset"""
@@ -110,6 +281,19 @@ class RequestHandler(tornado.web.RequestHandler):
         """see tornado.RequestHandler initialize"""
         request_id = self.get_header('X-REQUEST-ID', None) or str(uuid.uuid4())
         self._logger = logging.LoggerAdapter(logger, {"request": request_id})
+        self.settings['active_requests'].add(self)
+
+    def on_finish(self):
+        """see tornado.RequestHandler on_finish"""
+        self.settings['active_requests'].discard(self)
+        self._release_admission()
+
+    def on_connection_close(self):
+        """see tornado.RequestHandler on_connection_close"""
+        # the handler is still running, it is removed from active requests by on_finish
+        self._release_admission()
+        if self._body_stream is not None:
+            self._body_stream.abort(tornado.web.HTTPError(400, reason="the connection has been closed"))
 
     def get_header(self, name, default=None):
         """get the header from request by name"""
@@ -144,17 +328,49 @@ class RequestHandler(tornado.web.RequestHandler):
         if "exc_info" in kwargs and not self.settings.get("serve_traceback"):
             del kwargs["exc_info"]
 
+        headers = kwargs.pop("headers", None)
+        if headers:
+            for name, value in headers.items():
+                self.set_header(name, value)
+
         kwargs["status"] = status_code
         kwargs["reason"] = self._reason
 
-        self.set_header('Content-Type', 'application/json; charset=UTF-8')
-        pretty = bool(self.get_argument('pretty', None))
-        self.write(ujson.dumps(kwargs, sort_keys=True, indent=pretty << 1))
+        serializer = serializers.negotiate(self.get_header('Accept'))
+        self.set_header('Content-Type', serializer.content_type)
+        self.add_vary('Accept')
+        self.write(serializer.dumps(kwargs, bool(self.get_argument('pretty', None))))
         self.finish()
 
+    def prepare(self):
+        """starts the handler, that streams the request body, before the body is received"""
+        name = self.request.method.lower()
+        method = getattr(self, name, None)
+        if not getattr(method, 'stream_body', False):
+            return
+
+        if method.max_body_size is not None:
+            self.request.connection.set_max_body_size(method.max_body_size)
+        content_type, _ = self.get_content_type()
+        self._body_stream = stream = JsonStream(ndjson=content_type == 'application/x-ndjson')
+        self.request.body.add_done_callback(
+            lambda f: stream.abort(tornado.web.HTTPError(400)) if f.exception() else stream.close()
+        )
+        result = method(*self.path_args, **self.path_kwargs)
+        if result is not None:
+            result = asyncio.ensure_future(result)
+            # the result is not awaited, if the connection is closed before the body is received
+            result.add_done_callback(_retrieve_exception)
+        # the handler is running, the method, that is called after the body is received, waits for it
+        setattr(self, name, lambda *_, **__: result)
+
     def data_received(self, chunk):
-        """make abstract methods inspector happy"""
-        pass
+        """see tornado.web.RequestHandler.data_received"""
+        if self._body_stream is not None:
+            return self._body_stream.feed(chunk)
+        if self._body_chunks is None:
+            self._body_chunks = []
+        self._body_chunks.append(chunk)
 
 
 class TemplateHandler(RequestHandler):
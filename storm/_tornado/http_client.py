@@ -13,27 +13,466 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import asyncio
+import base64
+import collections
+import copy
+import socket
+import ssl
+from io import BytesIO
+from urllib.parse import urljoin, urlsplit
 
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.http1connection import HTTP1Connection, HTTP1ConnectionParameters
 from tornado.httpclient import HTTPRequest, AsyncHTTPClient, HTTPResponse, HTTPError
-from tornado.httputil import HTTPHeaders, url_concat
+from tornado.httputil import HTTPHeaders, HTTPMessageDelegate, RequestStartLine, url_concat
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+from tornado.tcpclient import TCPClient
 
 from . import _cookiejar
 
-__all__ = ['HTTPClient', 'HTTPResponse']
+__all__ = ['HTTPClient', 'HTTPResponse', 'ConnectTimeoutError', 'QueueTimeoutError']
+
+
+# the request may be repeated safely, if it has one of these methods
+_IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'))
+_REDIRECT_CODES = frozenset((301, 302, 303, 307, 308))
+_UNSUPPORTED = ('body_producer', 'expect_100_continue', 'header_callback', 'network_interface', 'proxy_host')
+
+_DEFAULTS = dict(
+    connect_timeout=20.0,
+    request_timeout=20.0,
+    follow_redirects=True,
+    max_redirects=5,
+    decompress_response=True,
+    validate_cert=True,
+    allow_ipv6=True,
+)
+
+
+class ConnectTimeoutError(HTTPError):
+    """the connection has not been established in time, the request has not been sent"""
+
+    def __init__(self):
+        super().__init__(599, "Timeout while connecting")
+
+
+class QueueTimeoutError(HTTPError):
+    """the request has not left the queue in time, the request has not been sent"""
+
+    def __init__(self):
+        super().__init__(599, "Timeout in request queue")
+
+
+class _StaleConnection(Exception):
+    """the reused connection has been closed by server before any response bytes arrived"""
+
+
+class _ConnectionPool:
+    """the idle keep-alive connections by host"""
+
+    def __init__(self, idle_timeout, io_loop):
+        self.idle_timeout = idle_timeout
+        self.io_loop = io_loop
+        self.idle = collections.defaultdict(collections.deque)
+        self.created = 0
+        self.reused = 0
+        self.retried = 0
+
+    def acquire(self, key):
+        """returns the idle connection to host or None"""
+        streams = self.idle.get(key)
+        while streams:
+            stream, handle = streams.pop()
+            self.io_loop.remove_timeout(handle)
+            stream.set_close_callback(None)
+            if not stream.closed():
+                self.reused += 1
+                return stream
+        return None
+
+    def release(self, key, stream):
+        """returns the connection to pool, it is closed after idle timeout"""
+        streams = self.idle[key]
+        entry = None
+
+        def discard():
+            if entry in streams:
+                streams.remove(entry)
+                self.io_loop.remove_timeout(entry[1])
+                stream.close()
+
+        entry = (stream, self.io_loop.call_later(self.idle_timeout, discard))
+        streams.append(entry)
+        stream.set_close_callback(discard)
+
+    def close(self):
+        """closes all idle connections"""
+        for streams in self.idle.values():
+            while streams:
+                stream, handle = streams.pop()
+                self.io_loop.remove_timeout(handle)
+                stream.set_close_callback(None)
+                stream.close()
+        self.idle.clear()
+
+    def __len__(self):
+        return sum(len(x) for x in self.idle.values())
+
+
+
+class _ResponseReader(HTTPMessageDelegate):
+    """collects the response"""
+
+    def __init__(self, request):
+        self.request = request
+        self.code = None
+        self.reason = None
+        self.headers = None
+        self.chunks = []
+        self.finished = False
+
+    def is_redirect(self):
+        return self.request.follow_redirects and self.request.max_redirects > 0 and self.code in _REDIRECT_CODES
+
+    def headers_received(self, start_line, headers):
+        self.code, self.reason, self.headers = start_line.code, start_line.reason, headers
+
+    def data_received(self, chunk):
+        if self.request.streaming_callback is not None and not self.is_redirect():
+            self.request.streaming_callback(chunk)
+        else:
+            self.chunks.append(chunk)
+
+    def finish(self):
+        self.finished = True
+
+
+def _ssl_options(request):
+    """returns the ssl context of request"""
+    if request.ssl_options is not None:
+        return request.ssl_options
+    context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=request.ca_certs)
+    if not request.validate_cert:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    if request.client_cert is not None:
+        context.load_cert_chain(request.client_cert, request.client_key)
+    return context
+
+
+class PooledHTTPClient:
+    """
+    the http client with per-host limit of connections and keep-alive connections pool.
+    the keep-alive is disabled, if idle_timeout is 0.
+    the idempotent request, that fails on reused connection before any response bytes arrived,
+    is retried once on new connection.
+    """
+
+    def __init__(self, max_clients=10, max_per_host=None, idle_timeout=0, queue_timeout=None, defaults=None,
+                 max_buffer_size=104857600, resolver=None):
+        self.io_loop = IOLoop.current()
+        self.defaults = dict(_DEFAULTS)
+        if defaults:
+            self.defaults.update(defaults)
+        self.max_clients = max_clients
+        self.max_per_host = max_per_host or max_clients
+        self.idle_timeout = idle_timeout
+        self.queue_timeout = queue_timeout
+        self.max_buffer_size = max_buffer_size
+        self.tcp_client = TCPClient(resolver=resolver)
+        self.pool = _ConnectionPool(idle_timeout, self.io_loop)
+        self.queue = collections.deque()
+        self.active = 0
+        self.per_host = collections.Counter()
+        self.queued_total = 0
+        self.queue_timeouts = 0
+
+    def close(self):
+        """closes the idle connections"""
+        self.pool.close()
+        self.tcp_client.close()
+
+    def fetch(self, request, callback=None, raise_error=True, **kwargs):
+        """
+        executes the request, returns the future of response
+        :param request: the HTTPRequest or url
+        :param callback: the function, that is called with response, the error is reported by response.error
+        :param raise_error: the future raises the error of response, if there is no callback
+        :param kwargs: the arguments of HTTPRequest, if request is url
+        """
+        if not isinstance(request, HTTPRequest):
+            request = HTTPRequest(url=request, **kwargs)
+        for name, value in self.defaults.items():
+            if getattr(request, name, None) is None:
+                setattr(request, name, value)
+        # the cancellation of the future removes the request from queue or closes its connection
+        response = gen.convert_yielded(self._fetch(request))
+        if callback is not None:
+            response.add_done_callback(lambda f: f.cancelled() or callback(f.result()))
+            return response
+        if not raise_error:
+            return response
+
+        future = Future()
+
+        def done(f):
+            if f.cancelled():
+                future.cancel()
+                return
+            error = f.result().error
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(f.result())
+
+        response.add_done_callback(done)
+        future.add_done_callback(lambda f: f.cancelled() and response.cancel())
+        return future
+
+    async def _fetch(self, request):
+        start = self.io_loop.time()
+        host = urlsplit(request.url).netloc
+        timeout = min(request.connect_timeout, request.request_timeout)
+        try:
+            await self._acquire(host, min(timeout, self.queue_timeout or timeout))
+        except QueueTimeoutError as e:
+            return HTTPResponse(request, 599, error=e, request_time=self.io_loop.time() - start)
+
+        original = request
+        try:
+            while True:
+                reader = await self._send(request)
+                if not reader.is_redirect():
+                    break
+                request = self._redirect(request, reader)
+            return HTTPResponse(
+                original, reader.code, reason=reader.reason, headers=reader.headers,
+                buffer=BytesIO(b''.join(reader.chunks)), effective_url=request.url,
+                request_time=self.io_loop.time() - start
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return HTTPResponse(original, 599, error=e, request_time=self.io_loop.time() - start)
+        finally:
+            self._release(host)
+
+    async def _acquire(self, host, timeout):
+        """waits for the free slot, that is limited by max_clients and max_per_host"""
+        if not self.queue and self._available(host):
+            self._take(host)
+            return
+        entry = (host, Future())
+        self.queue.append(entry)
+        self.queued_total += 1
+        try:
+            await gen.with_timeout(self.io_loop.time() + timeout, entry[1])
+        except gen.TimeoutError:
+            if entry[1].done():
+                return
+            self.queue.remove(entry)
+            self.queue_timeouts += 1
+            raise QueueTimeoutError()
+        except asyncio.CancelledError:
+            if entry[1].done():
+                # the slot has been taken for the request
+                self._release(host)
+            else:
+                self.queue.remove(entry)
+            raise
+
+    def _available(self, host):
+        return self.active < self.max_clients and self.per_host[host] < self.max_per_host
+
+    def _take(self, host):
+        self.active += 1
+        self.per_host[host] += 1
+
+    def _release(self, host):
+        self.active -= 1
+        count = self.per_host[host] - 1
+        if count:
+            self.per_host[host] = count
+        else:
+            del self.per_host[host]
+        self._process_queue()
+
+    def _process_queue(self):
+        """wakes up the queued requests in order, the requests to the busy hosts are skipped"""
+        queue = self.queue
+        skipped = 0
+        while len(queue) > skipped and self.active < self.max_clients:
+            host, waiter = queue.popleft()
+            if not self._available(host):
+                queue.append((host, waiter))
+                skipped += 1
+                continue
+            self._take(host)
+            waiter.set_result(None)
+        queue.rotate(skipped)
+
+    async def _send(self, request):
+        """sends the request, the idempotent request is retried once, if the reused connection is stale"""
+        for name in _UNSUPPORTED:
+            if getattr(request, name, None):
+                raise NotImplementedError('%s not supported' % name)
+        parsed = urlsplit(request.url)
+        if parsed.scheme not in ('http', 'https'):
+            raise ValueError("Unsupported url scheme: %s" % request.url)
+        key = (parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80), parsed.scheme == 'https')
+        deadline = self.io_loop.time() + request.request_timeout
+
+        stream = self.pool.acquire(key) if self.idle_timeout else None
+        if stream is not None:
+            try:
+                return await self._exchange(stream, key, request, parsed, deadline, reused=True)
+            except _StaleConnection:
+                self.pool.retried += 1
+        stream = await self._connect(key, request, deadline)
+        return await self._exchange(stream, key, request, parsed, deadline, reused=False)
+
+    async def _connect(self, key, request, deadline):
+        host, port, secure = key
+        connecting = self.tcp_client.connect(
+            host, port, af=socket.AF_UNSPEC if request.allow_ipv6 else socket.AF_INET,
+            ssl_options=_ssl_options(request) if secure else None, max_buffer_size=self.max_buffer_size,
+            timeout=min(self.io_loop.time() + request.connect_timeout, deadline)
+        )
+        try:
+            stream = await asyncio.shield(connecting)
+        except asyncio.CancelledError:
+            # the request has been cancelled, the connection is closed, when it is established
+            connecting.add_done_callback(lambda f: f.cancelled() or f.exception() or f.result().close())
+            raise
+        except gen.TimeoutError:
+            raise ConnectTimeoutError()
+        except StreamClosedError as e:
+            raise e.real_error or e
+        self.pool.created += 1
+        return stream
+
+    async def _exchange(self, stream, key, request, parsed, deadline, reused):
+        """writes the request and reads the response, the kept alive connection is returned to pool"""
+        connection = HTTP1Connection(stream, True, HTTP1ConnectionParameters(
+            no_keep_alive=not self.idle_timeout, decompress=request.decompress_response
+        ))
+        reader = _ResponseReader(request)
+        path = (parsed.path or '/') + ('?' + parsed.query if parsed.query else '')
+        try:
+            connection.write_headers(RequestStartLine(request.method, path, ''), self._headers(request, parsed))
+            if request.body is not None:
+                connection.write(request.body)
+            connection.finish()
+            await gen.with_timeout(deadline, connection.read_response(reader), quiet_exceptions=StreamClosedError)
+        except gen.TimeoutError:
+            stream.close()
+            raise HTTPError(599, "Timeout during request")
+        except asyncio.CancelledError:
+            stream.close()
+            raise
+        except StreamClosedError as e:
+            stream.close()
+            # the server may have processed the request, so only idempotent requests are repeated
+            if reused and reader.code is None and request.method.upper() in _IDEMPOTENT_METHODS:
+                raise _StaleConnection()
+            raise e.real_error or HTTPError(599, "Connection closed")
+
+        if not reader.finished:
+            stream.close()
+            raise HTTPError(599, "Connection closed")
+        # the connection is closed by HTTP1Connection, if the keep-alive is not allowed
+        if not stream.closed():
+            self.pool.release(key, connection.detach())
+        return reader
+
+    def _headers(self, request, parsed):
+        """returns the headers to send"""
+        headers = HTTPHeaders(request.headers)
+        if 'Connection' not in headers:
+            headers['Connection'] = 'keep-alive' if self.idle_timeout else 'close'
+        if 'Host' not in headers:
+            headers['Host'] = parsed.netloc.rpartition('@')[-1]
+        username, password = parsed.username, parsed.password
+        if username is None and request.auth_username is not None:
+            if request.auth_mode not in (None, 'basic'):
+                raise ValueError("unsupported auth_mode %s" % request.auth_mode)
+            username, password = request.auth_username, request.auth_password
+        if username is not None:
+            credentials = ('%s:%s' % (username, password or '')).encode('utf-8')
+            headers['Authorization'] = 'Basic ' + base64.b64encode(credentials).decode('ascii')
+        if request.user_agent:
+            headers['User-Agent'] = request.user_agent
+        if request.body is not None:
+            headers['Content-Length'] = str(len(request.body))
+        if request.method == 'POST' and 'Content-Type' not in headers:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if request.decompress_response:
+            headers['Accept-Encoding'] = 'gzip'
+        return headers
+
+    @staticmethod
+    def _redirect(request, reader):
+        """returns the request to the location of redirect"""
+        redirect = copy.copy(request)
+        redirect.url = urljoin(request.url, reader.headers['Location'])
+        redirect.max_redirects = request.max_redirects - 1
+        redirect.headers = HTTPHeaders(request.headers)
+        redirect.headers.pop('Host', None)
+        if reader.code in (302, 303) and request.method != 'HEAD':
+            redirect.method = 'GET'
+            redirect.body = None
+            for name in ('Content-Length', 'Content-Type', 'Content-Encoding', 'Transfer-Encoding'):
+                redirect.headers.pop(name, None)
+        return redirect
+
+    def stats(self):
+        """returns the statistics of connections pool"""
+        created, reused = self.pool.created, self.pool.reused
+        return {
+            "active": self.active,
+            "queued": len(self.queue),
+            "queued_total": self.queued_total,
+            "queue_timeouts": self.queue_timeouts,
+            "idle": len(self.pool),
+            "per_host": dict(self.per_host),
+            "connections": created,
+            "reused": reused,
+            "reuse_ratio": reused / (created + reused) if created + reused else 0.0,
+            "stale_retries": self.pool.retried,
+        }
 
 
 class HTTPClient:
     ErrorClass = HTTPError
+    # the errors of requests, that have not been sent
+    ConnectTimeoutError = ConnectTimeoutError
+    QueueTimeoutError = QueueTimeoutError
 
-    def __init__(self, settings):
+    def __init__(self, settings, **pool_settings):
         AsyncHTTPClient.configure(None, defaults=settings)
-        self.client = AsyncHTTPClient()
+        self.client = PooledHTTPClient(defaults=settings, **pool_settings)
         self.cookies = _cookiejar.CookieJar()
 
+    def stats(self):
+        """returns the statistics of connections pool"""
+        return self.client.stats()
+
     url_concat = staticmethod(url_concat)
 
+    @property
+    def defaults(self):
+        """the default arguments of request"""
+        return self.client.defaults
+
+    def close(self):
+        """closes the client and frees the resources"""
+        self.client.close()
+
     def extract_cookies(self, response):
-        if response.exception() is None:
+        if not response.cancelled() and response.exception() is None:
             self.cookies.extract_cookies(response.result())
 
     def fetch(self, method, url, body, headers, callback=None, **kwargs):
@@ -0,0 +1,198 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import codecs
+import collections
+import json
+
+from tornado.web import HTTPError
+
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = frozenset(_WHITESPACE + ',]')
+
+
+class JsonStream:
+    """
+    the incremental parser of request body, it is the asynchronous iterator,
+    that yields the elements of top-level json array or the lines of NDJSON.
+    """
+
+    def __init__(self, ndjson=False, max_pending=1024):
+        """
+        :param ndjson: if True, the body is parsed as NDJSON, otherwise as json array
+        :param max_pending: the number of parsed items, after that the receiving of body is paused
+        """
+        self.ndjson = ndjson
+        self.max_pending = max_pending
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._raw_decode = json.JSONDecoder().raw_decode
+        self._buffer = ''
+        self._pos = 0
+        # the size of buffer, that is enough to retry parsing of incomplete value
+        self._retry_size = 0
+        # the array is parsed by states: start, first, value, next, end
+        self._state = 'start'
+        self._items = collections.deque()
+        self._error = None
+        self._closed = False
+        self._waiter = None
+        self._drained = None
+
+    def feed(self, chunk):
+        """
+        parses the chunk of body
+        :return: the future, that is resolved when consumer takes the items, if there are too many pending items
+        """
+        if self._closed or self._error is not None:
+            return None
+        self._buffer += self._decoder.decode(chunk)
+        self._parse(False)
+        self._wakeup()
+        if len(self._items) < self.max_pending:
+            return None
+        if self._drained is None:
+            self._drained = asyncio.Future()
+        return self._drained
+
+    def close(self):
+        """indicates the end of body"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._error is None:
+            self._buffer += self._decoder.decode(b'', final=True)
+            self._parse(True)
+        self._wakeup()
+
+    def abort(self, error):
+        """stops parsing, the consumer receives the error"""
+        if self._error is None:
+            self._error = error
+        self._closed = True
+        self._wakeup()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._items:
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                raise StopAsyncIteration
+            self._waiter = asyncio.Future()
+            await self._waiter
+
+        item = self._items.popleft()
+        if self._drained is not None and len(self._items) < self.max_pending:
+            self._drained.set_result(None)
+            self._drained = None
+        return item
+
+    def _wakeup(self):
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _fail(self, message):
+        self._error = HTTPError(400, reason="invalid request body: " + message)
+
+    def _parse(self, final):
+        try:
+            if self.ndjson:
+                self._parse_lines(final)
+            else:
+                self._parse_array(final)
+        except ValueError as e:
+            self._fail(str(e))
+
+        # the parsed data is dropped from buffer
+        if self._pos > 4096 and self._pos * 2 > len(self._buffer):
+            self._buffer = self._buffer[self._pos:]
+            self._retry_size -= self._pos
+            self._pos = 0
+
+    def _parse_lines(self, final):
+        buffer, pos, items = self._buffer, self._pos, self._items
+        while True:
+            end = buffer.find('\n', pos)
+            if end == -1:
+                if not final:
+                    break
+                end = len(buffer)
+            line = buffer[pos:end].strip()
+            if line:
+                items.append(json.loads(line))
+            pos = end + 1
+            if pos > len(buffer):
+                break
+        self._pos = min(pos, len(buffer))
+
+    def _skip_whitespace(self, pos):
+        buffer = self._buffer
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def _parse_array(self, final):
+        buffer, items, state = self._buffer, self._items, self._state
+        pos = self._skip_whitespace(self._pos)
+        while pos < len(buffer):
+            c = buffer[pos]
+            if state == 'start':
+                if c != '[':
+                    raise ValueError("expected array")
+                state = 'first'
+                pos += 1
+            elif state == 'next':
+                if c == ',':
+                    state = 'value'
+                elif c == ']':
+                    state = 'end'
+                else:
+                    raise ValueError("expected ',' or ']' at %d" % pos)
+                pos += 1
+            elif state == 'end':
+                raise ValueError("unexpected data after array")
+            elif state == 'first' and c == ']':
+                state = 'end'
+                pos += 1
+            else:
+                # the incomplete value is parsed again, when the buffer is doubled
+                if not final and len(buffer) < self._retry_size:
+                    break
+                try:
+                    value, end = self._raw_decode(buffer, pos)
+                except ValueError:
+                    if final:
+                        raise
+                    self._retry_size = pos + 2 * (len(buffer) - pos)
+                    break
+                if not final and buffer[end - 1] not in '}]"' and buffer[end:end + 1] not in _DELIMITERS:
+                    # the number or literal may be continued in the next chunk, e.g. 1 and 1.5
+                    break
+                items.append(value)
+                self._retry_size = 0
+                state = 'next'
+                pos = end
+            pos = self._skip_whitespace(pos)
+
+        self._pos = pos
+        self._state = state
+        if final and state != 'end':
+            raise ValueError("unexpected end of array")
@@ -0,0 +1,114 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import collections
+import gc
+import os
+import signal
+import sys
+import time
+
+from . import log
+
+
+def _freeze_heap():
+    """moves the objects, that have been created on boot, to the permanent generation.
+    the collector does not touch them anymore, so the memory pages stay shared copy-on-write after fork.
+    """
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+
+
+def worker_count(count):
+    """returns the number of workers, 0 - one worker per CPU"""
+    if count <= 0:
+        return os.cpu_count() or 1
+    return count
+
+
+def fork_workers(count, max_restarts=10, restart_window=60.0):
+    """
+    starts the worker processes and supervises them.
+    :param count: the number of workers, 0 - one worker per CPU
+    :param max_restarts: the maximum number of restarts of crashed workers within restart_window
+    :param restart_window: the time in seconds to count the restarts
+    :return: the worker id in a child process, the master process exits when all workers stopped
+    """
+
+    count = worker_count(count)
+    _freeze_heap()
+
+    children = dict()
+    stopping = []
+
+    def start_worker(worker_id):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            return True
+        children[pid] = worker_id
+        return False
+
+    def stop_workers(signum, _):
+        stopping.append(signum)
+        for pid in children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    for i in range(count):
+        if start_worker(i):
+            return i
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    signal.signal(signal.SIGINT, stop_workers)
+    log.app_log.info("started %d workers.", count)
+
+    restarts = collections.deque()
+    while children:
+        try:
+            pid, status = os.wait()
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            break
+
+        worker_id = children.pop(pid, None)
+        if worker_id is None or stopping:
+            continue
+
+        if os.WIFSIGNALED(status):
+            log.app_log.warning("worker %d (pid %d) killed by signal %d.", worker_id, pid, os.WTERMSIG(status))
+        elif os.WEXITSTATUS(status) != 0:
+            log.app_log.warning("worker %d (pid %d) exited with status %d.", worker_id, pid, os.WEXITSTATUS(status))
+        else:
+            log.app_log.info("worker %d (pid %d) exited.", worker_id, pid)
+            continue
+
+        now = time.monotonic()
+        while restarts and restarts[0] <= now - restart_window:
+            restarts.popleft()
+        restarts.append(now)
+        if len(restarts) > max_restarts:
+            stop_workers(signal.SIGTERM, None)
+            raise RuntimeError("too many worker restarts within %s seconds" % restart_window)
+
+        if start_worker(worker_id):
+            return worker_id
+
+    sys.exit(0)
@@ -0,0 +1,190 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import re
+
+from tornado import routing
+from tornado import web
+from tornado.escape import url_unescape
+
+__all__ = ['Application', 'Router', 'is_template']
+
+
+_PARAMETER = re.compile(r'\{(\w+)(?::(\w+))?\}')
+_REGEX_CHARS = re.compile(r'[\\()\[\]{}*+?^$|]')
+
+# the parameters types in order of matching, the literal segments are always matched first
+_PARAMETER_TYPES = ('int', 'float', 'str', 'path')
+
+_CHECKERS = {
+    'int': str.isdecimal,
+    'float': re.compile(r'-?\d+(\.\d+)?$').match,
+    'str': bool,
+}
+
+
+def is_template(url):
+    """checks that url is the template, that can be added to the prefix tree instead of regular expression"""
+    return _REGEX_CHARS.search(_PARAMETER.sub('', url)) is None
+
+
+class _Node:
+    __slots__ = ('children', 'parameters', 'tail', 'target')
+
+    def __init__(self):
+        self.children = dict()
+        self.parameters = list()
+        self.tail = None
+        self.target = None
+
+    def parameter(self, type_):
+        """returns the child node for parameter of type"""
+        for t, _, node in self.parameters:
+            if t == type_:
+                return node
+        node = _Node()
+        self.parameters.append((type_, _CHECKERS[type_], node))
+        self.parameters.sort(key=lambda x: _PARAMETER_TYPES.index(x[0]))
+        return node
+
+
+def _unescape(value):
+    if '%' in value:
+        return url_unescape(value, encoding=None, plus=False)
+    return value.encode('utf-8')
+
+
+def _split(path):
+    return path[1:].split('/') if path.startswith('/') else path.split('/')
+
+
+def _match(node, segments, index, values):
+    """
+    looks up the node, that matches segments, literal segments take precedence over parameters.
+    the branches are tried in order of precedence, the node is visited only from its parent, so at most once.
+    """
+    if index == len(segments):
+        return node.target
+
+    segment = segments[index]
+    child = node.children.get(segment)
+    if child is not None:
+        target = _match(child, segments, index + 1, values)
+        if target is not None:
+            return target
+
+    for _, checker, child in node.parameters:
+        if checker(segment):
+            values.append(segment)
+            target = _match(child, segments, index + 1, values)
+            if target is not None:
+                return target
+            values.pop()
+
+    if node.tail is not None:
+        tail = '/'.join(segments[index:])
+        if tail:
+            values.append(tail)
+            return node.tail
+    return None
+
+
+class Router:
+    """
+    The prefix tree of url templates. The lookup takes time proportional to the path length,
+    when at most one branch of each node matches the path, e.g. the templates differ by literal segments.
+    Otherwise the matching branches are tried in order of precedence and each node is visited at most once,
+    so the lookup takes time proportional to the number of nodes, that match the prefix of path.
+    The template consists of literal segments and parameters {name[:type]}, where type is one of
+    int, float, str (default) - single path segment, path - the rest of path.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, template, target):
+        """adds the url template, raises ValueError if the same template has been added"""
+        node = self._root
+        names = []
+        segments = _split(template)
+        for i, segment in enumerate(segments):
+            parameter = _PARAMETER.fullmatch(segment)
+            if parameter is None:
+                node = node.children.setdefault(segment, _Node())
+                continue
+
+            name, type_ = parameter.group(1), parameter.group(2) or 'str'
+            if type_ not in _PARAMETER_TYPES:
+                raise ValueError("unknown type of parameter %s in %s" % (segment, template))
+            names.append(name)
+            if type_ == 'path':
+                if i != len(segments) - 1:
+                    raise ValueError("the path parameter should be last in %s" % template)
+                if node.tail is not None:
+                    raise ValueError("the url template %s is already added" % template)
+                node.tail = (target, names)
+                return
+            node = node.parameter(type_)
+        if node.target is not None:
+            raise ValueError("the url template %s is already added" % template)
+        node.target = (target, names)
+
+    def match(self, path):
+        """
+        :param path: the request path
+        :return: the target and the url unescaped named parameters or None
+        """
+        values = []
+        found = _match(self._root, _split(path), 0, values)
+        if found is None:
+            return None
+        target, names = found
+        return target, {n: _unescape(v) for n, v in zip(names, values)}
+
+
+class _TreeRouter(routing.Router):
+    """looks up the handler in the prefix tree"""
+
+    def __init__(self, application, prefix_tree):
+        self.application = application
+        self.prefix_tree = prefix_tree
+
+    def find_handler(self, request, **kwargs):
+        """see tornado.routing.Router find_handler"""
+        found = self.prefix_tree.match(request.path)
+        if found is not None:
+            return self.application.get_handler_delegate(request, found[0], path_kwargs=found[1])
+        return None
+
+
+class Application(web.Application):
+    """
+    the application, that looks up the url templates in the prefix tree.
+    the consecutive templates are added to the same tree, the urls are matched in order of registration.
+    """
+
+    def __init__(self, handlers=None, **settings):
+        rules = []
+        prefix_tree = None
+        for url, target in handlers or ():
+            if not is_template(url):
+                rules.append((url, target))
+                prefix_tree = None
+                continue
+            if prefix_tree is None:
+                prefix_tree = Router()
+                rules.append(routing.Rule(routing.AnyMatches(), _TreeRouter(self, prefix_tree)))
+            prefix_tree.add(url, target)
+        super().__init__(rules, **settings)
@@ -17,6 +17,8 @@ import warnings
 from collections import defaultdict
 
 from . import framework
+from .decorators.handler import ExceptionResolver
+from .manifest import Manifest
 from .resources import traverse
 
 _ARRAY = (tuple, list)
@@ -61,12 +63,15 @@ def ishandler(h):
     return callable(h) and hasattr(h, '__handler__')
 
 
-def start(*packages, prefix='/', **kwargs):
+def start(*packages, prefix='/', manifest=None, **kwargs):
     """
     launch application, not return until exit
     :param packages: the list of packages to find handlers
     :param prefix: the uri prefix
-    :param kwargs: the parameters that will be passed to Tornado application
+    :param manifest: the path to manifest file, that caches the discovered handlers,
+                     the modules with handlers only will be imported on first request
+    :param kwargs: the parameters that will be passed to Tornado application,
+                   `workers` - the number of worker processes, 0 - one per CPU
     """
 
     requires = set()
@@ -87,7 +92,11 @@ def start(*packages, prefix='/', **kwargs):
         for m in filter(ishandler, vars(unit).values()):
             m(routes)
 
-    traverse(packages, consumer)
+    if manifest is not None:
+        manifest = Manifest(manifest)
+    traverse(packages, consumer, manifest)
+    if manifest is not None:
+        manifest.save()
 
     modules = []
     for name in requires:
@@ -95,5 +104,7 @@ def start(*packages, prefix='/', **kwargs):
         known_exceptions.update(getattr(module, 'EXCEPTIONS', _empty_list))
         modules.append(module)
 
-    kwargs.setdefault('known_exceptions', dict()).update(known_exceptions)
+    exceptions = dict(kwargs.pop('known_exceptions', ()))
+    exceptions.update(known_exceptions)
+    kwargs['known_exceptions'] = ExceptionResolver(exceptions)
     framework.start_serve(prefix, options, modules, routes.get(), **kwargs)
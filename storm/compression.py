@@ -0,0 +1,100 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import functools
+import gzip
+import zlib
+
+__all__ = ("compress", "configure", "negotiate")
+
+
+def _gzip(data, level):
+    return gzip.compress(data, level)
+
+
+def _deflate(data, level):
+    return zlib.compress(data, level)
+
+
+def _brotli():
+    import brotli
+
+    def compress(data, level):
+        return brotli.compress(data, quality=min(level, 11))
+
+    return compress
+
+
+# the encodings in order of preference
+_encoders = [('gzip', _gzip), ('deflate', _deflate)]
+try:
+    _encoders.insert(0, ('br', _brotli()))
+except ImportError:
+    pass
+
+_ENCODERS = dict(_encoders)
+_PREFERENCE = {name: i for i, (name, _) in enumerate(_encoders)}
+
+# the compression is enabled, the minimum size of body in bytes, the compression level
+_settings = {'enabled': True, 'threshold': 1024, 'level': 6}
+
+
+def configure(enabled=True, threshold=1024, level=6):
+    """
+    :param enabled: if False, the responses are not compressed
+    :param threshold: the minimum size of body in bytes to compress
+    :param level: the compression level, 1 - fastest, 9 - best
+    """
+    _settings.update(enabled=enabled, threshold=threshold, level=level)
+    negotiate.cache_clear()
+
+
+@functools.lru_cache(maxsize=256)
+def negotiate(accept_encoding):
+    """selects the content encoding by Accept-Encoding header, None - identity"""
+    if not accept_encoding or not _settings['enabled']:
+        return None
+
+    candidates = []
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if name not in _ENCODERS:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, _PREFERENCE[name], name))
+    return min(candidates)[2] if candidates else None
+
+
+def compress(context, body):
+    """compresses the body according to Accept-Encoding of request, sets Content-Encoding, returns the body"""
+    if not _settings['enabled']:
+        return body
+
+    context.add_vary('Accept-Encoding')
+    if len(body) < _settings['threshold']:
+        return body
+    encoding = negotiate(context.get_header('Accept-Encoding'))
+    if encoding is None:
+        return body
+    context.set_header('Content-Encoding', encoding)
+    return _ENCODERS[encoding](body, _settings['level'])
@@ -13,6 +13,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from .cache import cache
 from .json import json
 
-__all__ = ('json',)
+__all__ = ('cache', 'json')
@@ -16,6 +16,7 @@ SOFTWARE.
 import functools
 
 from .. import framework
+from .converters import resolve
 
 
 class InvalidArgumentTypeError(framework.HTTPError):
@@ -43,52 +44,83 @@ class MissingArgumentError(framework.HTTPError):
 
 _UNSET = object()
 
-class _ArgumentParser:
-    """Class to parse request arguments"""
-
-    def __init__(self, name=None, converter=None, multiple=False, default=_UNSET):
-        self.name = name
-        self.multiple = multiple
-        self.converter = converter
-        self.default = default
-
-    def _convert(self, v):
-        if self.converter is None:
-            return v
-        try:
-            return self.converter(v)
-        except (ValueError, TypeError):
-            raise InvalidArgumentTypeError(self.name, self.converter)
-
-    def __call__(self, context, path_args):
-        """acquires argument from context"""
-
-        name = self.name
-        if path_args and name in path_args:
-            return self._convert(path_args[name])
-
-        value = context.get_arguments(name)
-        if not value:
-            if self.default is _UNSET:
-                raise MissingArgumentError(name)
-            return self.default
-        if self.multiple:
-            value = [self._convert(x) for x in value]
-        else:
-            value = self._convert(value[-1])
-        return value
+
+def _argument(name, annotation=None, multiple=False, default=_UNSET):
+    """resolves the conversion plan of argument"""
+    converter, is_list, separator, optional = resolve(annotation)
+    if optional and default is _UNSET:
+        default = None
+    return name, converter, multiple or is_list, separator, default
+
+
+def _argument_source(index, name, converter, multiple, separator, default):
+    """generates the code, that acquires the argument from context"""
+    var = 'a%d' % index
+    convert = 'c%d(%%s)' % index if converter is not None else '%s'
+    if not multiple:
+        value = convert % (var + '[-1]')
+    elif separator is not None:
+        value = '[%s for x in %s for y in x.split(%r) if y]' % (convert % 'y', var, separator)
+    elif converter is not None:
+        value = '[%s for x in %s]' % (convert % 'x', var)
+    else:
+        value = var
+
+    # the path argument is converted in the same way as the single query argument
+    lines = [
+        'if path_args and %r in path_args:' % name,
+        '    %s = [path_args[%r]]' % (var, name),
+        'else:',
+        '    %s = get_arguments(%r)' % (var, name),
+    ]
+    if default is _UNSET:
+        lines.extend([
+            'if not %s:' % var,
+            '    raise MissingArgumentError(%r)' % name,
+        ])
+        if value != var:
+            lines.append('%s = %s' % (var, value))
+    else:
+        lines.append('%s = %s if %s else d%d' % (var, value, var, index))
+
+    if converter is None:
+        return lines
+
+    lines = ['try:'] + ['    ' + x for x in lines]
+    lines.extend([
+        'except (ValueError, TypeError):',
+        '    raise InvalidArgumentTypeError(%r, c%d)' % (name, index),
+    ])
+    return lines
+
+
+def _compile(arguments, func):
+    """generates the function, that parses the arguments and calls func without per-argument dispatch"""
+    namespace = {
+        'func': func,
+        'MissingArgumentError': MissingArgumentError,
+        'InvalidArgumentTypeError': InvalidArgumentTypeError,
+    }
+    body = ['get_arguments = context.get_arguments']
+    call = []
+    for i, argument in enumerate(arguments):
+        name, converter, multiple, separator, default = _argument(*argument)
+        namespace['c%d' % i] = converter
+        namespace['d%d' % i] = default
+        body.extend(_argument_source(i, name, converter, multiple, separator, default))
+        call.append('%s=a%d' % (name, i))
+    body.append('return func(%s)' % ', '.join(['context'] + call))
+
+    source = 'def wrapped(context, **path_args):\n' + ''.join('    %s\n' % x for x in body)
+    exec(compile(source, '<argparser of %s>' % getattr(func, '__qualname__', func), 'exec'), namespace)
+    wrapped = namespace['wrapped']
+    wrapped.__source__ = source
+    return wrapped
 
 
 def argparser(arguments):
     """declare input arguments"""
     def add_parser(func):
-
-        parsers = tuple(_ArgumentParser(*x) for x in arguments)
-
-        @functools.wraps(func, updated=[])
-        def wrapped(context, **kwargs):
-            kwargs = {p.name: p(context, kwargs) for p in parsers}
-            return func(context, **kwargs)
-        return wrapped
+        return functools.wraps(func, updated=[])(_compile(arguments, func))
 
     return add_parser
@@ -0,0 +1,221 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import collections
+import functools
+import logging
+import time
+
+from .. import compression
+from .. import serializers
+from ..utilities import isawaitable
+from .singleflight import SingleFlight
+
+
+logger = logging.getLogger(__package__.split('.', 1)[0])
+
+# the methods, which responses may be cached
+_METHODS = frozenset(('GET', 'HEAD'))
+
+
+class _Entry:
+    __slots__ = ('response', 'size', 'expires', 'stale_until')
+
+    def __init__(self, response, size, expires, stale_until):
+        self.response = response
+        self.size = size
+        self.expires = expires
+        self.stale_until = stale_until
+
+
+class ResponseCache:
+    """the LRU cache of responses, that is bounded by the total size of responses"""
+
+    def __init__(self, max_bytes):
+        """
+        :param max_bytes: the maximum total size of cached responses
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._names = collections.defaultdict(set)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """returns the entry by key, marks it as recently used"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, response, ttl, stale=0, size=None):
+        """
+        :param key: the key, the first item is the name of handler
+        :param response: the response (status, reason, headers, body)
+        :param ttl: the time to live in seconds
+        :param stale: the time in seconds after ttl, when the stale response may be served during refresh
+        :param size: the size of response in bytes, the size of body and headers by default
+        """
+        if size is None:
+            size = len(response[3]) + sum(len(k) + len(v) for k, v in response[2])
+        self.discard(key)
+        if size > self.max_bytes:
+            return
+
+        expires = time.monotonic() + ttl
+        self._entries[key] = _Entry(response, size, expires, expires + stale)
+        self._names[key[0]].add(key)
+        self.size += size
+        while self.size > self.max_bytes:
+            self.discard(next(iter(self._entries)))
+
+    def discard(self, key):
+        """removes the entry by key"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+            keys = self._names[key[0]]
+            keys.discard(key)
+            if not keys:
+                del self._names[key[0]]
+
+    def invalidate(self, name, **arguments):
+        """removes the entries of handler, that have been stored for the arguments, all if arguments are empty"""
+        arguments = set(_normalize(arguments))
+        for key in [k for k in self._names.get(name, ()) if arguments.issubset(k[1])]:
+            self.discard(key)
+
+    def clear(self):
+        """removes all entries"""
+        self._entries.clear()
+        self._names.clear()
+        self.size = 0
+
+    def stats(self):
+        """returns the counters of cache"""
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
+
+
+# the responses of all handlers are stored in the same cache, each worker process has own cache,
+# so invalidate removes the responses of current worker only
+store = ResponseCache(64 << 20)
+
+
+def _hashable(value):
+    """converts the lists and dicts to tuples and the sets to frozensets recursively"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(x) for x in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(x) for x in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+def _normalize(arguments):
+    """makes the hashable tuple from arguments"""
+    return tuple(sorted((k, _hashable(v)) for k, v in arguments.items()))
+
+
+def _log_refresh_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("failed to refresh the cached response: %r", future.exception())
+
+
+def cache(func=None, ttl=60, stale=0, per_user=True, name=None):
+    """
+    caches the final response of handler, GET and HEAD only
+    :param ttl: the time to live in seconds
+    :param stale: the time in seconds after ttl, when the stale response is served and is refreshed in background
+    :param per_user: if True, the responses are cached for each user separately
+    :param name: the name to invalidate the responses, the qualified name of function by default
+    """
+    if func is None:
+        return functools.partial(cache, ttl=ttl, stale=stale, per_user=per_user, name=name)
+
+    if name is None:
+        name = func.__module__ + '.' + func.__qualname__
+
+    # the concurrent misses and refreshes of the same key share one execution of handler
+    flights = SingleFlight()
+    _isawaitable = isawaitable
+    _monotonic = time.monotonic
+    _negotiate = serializers.negotiate
+    _negotiate_encoding = compression.negotiate
+
+    def store_response(key, response):
+        status, reason, headers, body = response
+        if status == 200 and not any(k == 'Set-Cookie' for k, _ in headers):
+            # the Date is set, when the response is served
+            store.put(key, (status, reason, [x for x in headers if x[0] != 'Date'], body), ttl, stale)
+
+    def invoke(key, context, kwargs):
+        context.on_response(functools.partial(store_response, key))
+        return func(context, **kwargs)
+
+    def refresh(key, context, kwargs):
+        try:
+            result = flights.run(key, functools.partial(invoke, key), context.shadow(), kwargs)
+        except Exception as e:
+            logger.error("failed to refresh the cached response: %r", e)
+            return
+        if _isawaitable(result):
+            asyncio.ensure_future(result).add_done_callback(_log_refresh_error)
+
+    @functools.wraps(func, updated=[])
+    def wrapper(context, **kwargs):
+        if context.request.method not in _METHODS:
+            return func(context, **kwargs)
+
+        key = (
+            name, _normalize(kwargs), str(context.current_user) if per_user else None,
+            _negotiate(context.get_header('Accept')).content_type,
+            # the compressed response is stored once for each encoding
+            _negotiate_encoding(context.get_header('Accept-Encoding')),
+            # the format of output, see json
+            bool(context.get_argument('pretty', None))
+        )
+        entry = store.get(key)
+        if entry is not None:
+            now = _monotonic()
+            if now < entry.expires:
+                store.hits += 1
+                return context.write_response(entry.response)
+            if now < entry.stale_until:
+                store.stale_hits += 1
+                if not flights.in_flight(key):
+                    refresh(key, context, kwargs)
+                return context.write_response(entry.response)
+
+        store.misses += 1
+        return flights.run(key, functools.partial(invoke, key), context, kwargs)
+
+    return wrapper
+
+
+cache.invalidate = store.invalidate
+cache.store = store
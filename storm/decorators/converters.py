@@ -0,0 +1,145 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import collections.abc
+import datetime
+import enum
+import re
+import types
+import typing
+
+__all__ = ('resolve',)
+
+
+_NONE_TYPE = type(None)
+_UNION_TYPES = (typing.Union, getattr(types, 'UnionType', typing.Union))
+_LIST_TYPES = (list, typing.List, typing.Sequence, collections.abc.Sequence)
+
+_TRUE = frozenset(('1', 'true', 'yes', 'on'))
+_FALSE = frozenset(('0', 'false', 'no', 'off'))
+
+# the colon in the UTC offset is not understood by strptime before python 3.7
+_UTC_OFFSET = re.compile(r'([+-]\d\d):(\d\d)$')
+_DATETIME_FORMATS = (
+    '%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%dT%H:%M:%S%z',
+    '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M', '%Y-%m-%d',
+)
+
+
+def _origin(annotation):
+    if hasattr(typing, 'get_origin'):
+        return typing.get_origin(annotation)
+    return getattr(annotation, '__origin__', None)
+
+
+def _args(annotation):
+    args = getattr(annotation, '__args__', None) or ()
+    return tuple(x for x in args if not isinstance(x, typing.TypeVar))
+
+
+def _named(name):
+    """sets the name of converter, that is used in error message"""
+    def decorator(func):
+        func.__name__ = name
+        return func
+    return decorator
+
+
+@_named('bool')
+def _bool(value):
+    value = value.lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValueError(value)
+
+
+@_named('datetime')
+def _datetime(value):
+    # the "Z" suffix is not understood by strptime
+    if value.endswith('Z'):
+        value = value[:-1] + '+0000'
+    else:
+        value = _UTC_OFFSET.sub(r'\1\2', value)
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(value)
+
+
+@_named('date')
+def _date(value):
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _enum(cls):
+    """converts the name or the value to enum member"""
+    members = {str(m.value): m for m in cls}
+    members.update(cls.__members__)
+
+    @_named(cls.__name__)
+    def convert(value):
+        try:
+            return members[value]
+        except KeyError:
+            raise ValueError(value) from None
+
+    return convert
+
+
+def _converter(annotation):
+    """returns the function, that converts string to annotation type"""
+    if annotation is None or annotation is str or annotation is typing.Any:
+        return None
+    if annotation is bool:
+        return _bool
+    # datetime is subclass of date
+    if annotation is datetime.datetime:
+        return _datetime
+    if annotation is datetime.date:
+        return _date
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return _enum(annotation)
+    if callable(annotation) and _origin(annotation) is None:
+        return annotation
+    raise TypeError("unsupported annotation of argument: %r" % (annotation,))
+
+
+def resolve(annotation):
+    """
+    resolves the conversion plan of argument by annotation.
+    the List[T] and Sequence[T] argument accepts the repeated and the comma separated values,
+    the Optional[T] argument is None if it is not specified.
+    the other generic types are not supported, TypeError is raised on declaration.
+    :return: the converter, is multiple, the separator of values, is optional
+    """
+    optional = False
+    origin = _origin(annotation)
+    if origin in _UNION_TYPES:
+        args = [x for x in _args(annotation) if x is not _NONE_TYPE]
+        if len(args) == 1 and len(args) != len(_args(annotation)):
+            optional = True
+            annotation = args[0]
+            origin = _origin(annotation)
+
+    if annotation in _LIST_TYPES or origin in _LIST_TYPES:
+        args = _args(annotation)
+        return _converter(args[0] if args else None), True, ',', optional
+
+    return _converter(annotation), False, None, optional
@@ -0,0 +1,57 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import functools
+
+from .._tornado import executors
+
+
+KINDS = frozenset(('thread', 'process'))
+
+# the functions, that are called in the process pool by name, the workers inherit them on fork,
+# so the functions should be registered before the pool is started by executors.start
+_functions = dict()
+
+
+def _call(name, kwargs):
+    """calls the registered function in the worker process"""
+    return _functions[name](None, **kwargs)
+
+
+def offload(func, kind):
+    """
+    the decorator, that runs the function in the thread or the process pool and returns the future.
+    the function in the process pool receives None instead of context.
+    """
+    if kind not in KINDS:
+        raise ValueError("unknown executor: %r" % kind)
+
+    if kind == 'thread':
+        @functools.wraps(func, updated=[])
+        def wrapper(context, **kwargs):
+            return asyncio.get_event_loop().run_in_executor(
+                executors.get('thread'), functools.partial(func, context, **kwargs)
+            )
+    else:
+        # the function cannot be pickled, because the module attribute is replaced by declare
+        name = func.__module__ + '.' + func.__qualname__
+        _functions[name] = func
+        executors.require('process')
+
+        @functools.wraps(func, updated=[])
+        def wrapper(context, **kwargs):
+            return asyncio.get_event_loop().run_in_executor(executors.get('process'), _call, name, kwargs)
+
+    return wrapper
@@ -15,40 +15,39 @@ SOFTWARE.
 
 import asyncio
 import functools
+import time
 
 from .. import framework
-from ..utilities import convert2
+from ..utilities import isawaitable
+from . import limits
+from .singleflight import SingleFlight
 
 
-def coroutine_adapter(func):
-    """asyncio.Future -> framework.Future"""
+class ExceptionResolver:
+    """resolves the HTTP status of exception by the most specific class in its MRO"""
 
-    func = asyncio.coroutine(func)
+    def __init__(self, exceptions, cache_size=256):
+        self.exceptions = dict(exceptions)
+        self.resolve = functools.lru_cache(maxsize=cache_size)(self._resolve)
 
-    if framework.Future is asyncio.Future:
-        return func
-
-    @functools.wraps(func, updated=[])
-    def decorator(context, **kwargs):
-        future = asyncio.async(func(context, **kwargs), loop=context.modules.loop)
-        return convert2(None, future, framework.Future())
-
-    return decorator
+    def _resolve(self, error_type):
+        """
+        :param error_type: the type of exception
+        :return: the HTTP status, the function f(e) or None if exception is unknown
+        """
+        exceptions = self.exceptions
+        for base in error_type.__mro__:
+            if base in exceptions:
+                return exceptions[base]
+        return None
 
 
 def _handle_exception(context, e):
     """Handle the exception that occurs upon handle request"""
-    known_exceptions = context.settings['known_exceptions']
-    error_type = type(e)
-    if error_type in known_exceptions:
-        status = known_exceptions[error_type]
-    else:
-        base = next((k for k in known_exceptions if isinstance(e, k)), None)
-        if base is not None:
-            status = known_exceptions[error_type] = known_exceptions[base]
-        else:
-            status = 500
-            context.logger.exception("Unknown exception: %r", e)
+    status = context.settings['known_exceptions'].resolve(type(e))
+    if status is None:
+        status = 500
+        context.logger.exception("Unknown exception: %r", e)
 
     if callable(status):
         status = status(e)
@@ -58,31 +57,118 @@ def _handle_exception(context, e):
         context.send_error(status, reason=getattr(e, 'message', None) or str(e))
 
 
-def handler(func, secure=True, status=None):
+def _complete(context, result, status):
+    """writes the result of handler to response"""
+    if context.finished:
+        return
+
+    if status is not None:
+        context.set_status(status)
+    if isinstance(result, (str, bytes)):
+        context.write(result)
+
+
+async def _await_result(context, result, status):
+    """awaits the result of asynchronous handler on the running loop"""
+    try:
+        _complete(context, await result, status)
+    except framework.HTTPError:
+        raise
+    except Exception as e:
+        _handle_exception(context, e)
+
+
+async def _await_result_with_deadline(context, result, status):
+    """awaits the result of asynchronous handler, cancels it when the deadline of request is exceeded"""
+    try:
+        _complete(context, await asyncio.wait_for(result, context.remaining_time()), status)
+    except framework.HTTPError:
+        raise
+    except asyncio.TimeoutError:
+        _handle_timeout(context)
+    except Exception as e:
+        _handle_exception(context, e)
+
+
+def _handle_timeout(context):
+    """Handle the request, that exceeded the deadline"""
+    if context.finished:
+        context.logger.error("The deadline exceeded after request had been finished.")
+    else:
+        context.logger.warning("The deadline exceeded.")
+        context.send_error(504, reason="the request has timed out")
+
+
+async def _invoke_limited(limiter, invoke, context, kwargs):
+    """invokes the handler, when the limiter has a free slot"""
+    try:
+        await limiter.acquire()
+    except limits.Overloaded as e:
+        context.logger.warning("The request is rejected: %s.", e)
+        context.send_error(503, reason=str(e), headers={"Retry-After": str(e.retry_after)})
+        return
+
+    try:
+        result = invoke(context, kwargs)
+        if result is not None:
+            await result
+    finally:
+        limiter.release()
+
+
+def handler(func, secure=True, status=None, timeout=None, max_concurrency=None, max_queue=0, queue_timeout=None,
+            priority='normal', coalesce=False, etag=True, stream_body=False, max_body_size=None):
     """the decorator, that makes request handler"""
-    is_coroutine = asyncio.iscoroutinefunction(func)
-    future_class = asyncio.Future
 
-    @coroutine_adapter
-    def wrapper(context, **kwargs):
-        if secure and not context.current_user:
-            return context.send_error(403)
+    if priority not in framework.OverloadController.SHARES:
+        raise ValueError("unknown priority: %r" % priority)
+    if etag not in (True, False, 'fast'):
+        raise ValueError("unknown etag: %r" % etag)
+
+    _isawaitable = isawaitable
+    _monotonic = time.monotonic
+    await_result = _await_result if timeout is None else _await_result_with_deadline
 
+    def invoke(context, kwargs):
         try:
             result = func(context, **kwargs)
-            if is_coroutine or isinstance(result, future_class):
-                yield from result
-
-            if context.finished:
-                return
-
-            if status is not None:
-                context.set_status(status)
-            if isinstance(result, (str, bytes)):
-                context.write(result)
+            if _isawaitable(result):
+                return await_result(context, result, status)
+            _complete(context, result, status)
         except framework.HTTPError:
             raise
         except Exception as e:
             _handle_exception(context, e)
 
-    return functools.update_wrapper(wrapper, func, updated=[])
+    if max_concurrency is not None:
+        limiter = limits.register(
+            func.__module__ + '.' + func.__qualname__,
+            limits.ConcurrencyLimiter(max_concurrency, max_queue, queue_timeout)
+        )
+        invoke = functools.partial(_invoke_limited, limiter, invoke)
+
+    if coalesce:
+        # the identical requests are coalesced before they take the slots of limiter
+        invoke = functools.partial(SingleFlight(secure), invoke)
+
+    @functools.wraps(func, updated=[])
+    def wrapper(context, **kwargs):
+        if not context.admit(priority):
+            return context.send_error(503, reason="the server is overloaded", headers={"Retry-After": "1"})
+
+        if secure and not context.current_user:
+            return context.send_error(403)
+
+        if timeout is not None:
+            context.deadline = _monotonic() + timeout
+        if etag is not True:
+            context.etag = etag
+
+        return invoke(context, kwargs)
+
+    # the handler is started before the request body is received, see RequestHandler.prepare
+    wrapper.stream_body = stream_body
+    wrapper.max_body_size = max_body_size
+    # the limiter is registered on import, so the module cannot be imported lazily, see storm.manifest
+    wrapper.lazy = max_concurrency is None
+    return wrapper
@@ -13,68 +13,180 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import asyncio
 import functools
-import ujson
+import inspect
+import types
 
-from ..utilities import convert1
+from .. import compression
+from .. import serializers
+from ..utilities import isawaitable
+from .schema import compile_schema
+from .schema import is_schema
 
 
 CONTENT_TYPE = 'application/json'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
 CHARSET = 'UTF-8'
+# the size of data in bytes, that is written to response before waiting for flush
+STREAM_BATCH_SIZE = 64 * 1024
 
 _empty_result = {'_json': None}
 
 
 def _json_dumps(context, data):
     if not context.finished:
-        indent = bool(context.get_argument('pretty', None)) << 1
-        context.set_header('Content-Type', '%s; charset=%s' % (CONTENT_TYPE, CHARSET))
-        context.write(ujson.dumps(data, sort_keys=True, indent=indent).encode(CHARSET))
+        serializer = serializers.negotiate(context.get_header('Accept'))
+        context.set_header('Content-Type', serializer.content_type)
+        context.add_vary('Accept')
+        context.write(compression.compress(context, serializer.dumps(data, bool(context.get_argument('pretty', None)))))
         context.finish()
 
 
 def _json_input(func):
     """decodes json from body and pass as keyword argument"""
 
+    # the arguments annotated with dataclass or TypedDict are bound from body,
+    # the single argument is bound to whole body, otherwise each argument is bound to the field with same name
+    spec = inspect.getfullargspec(inspect.unwrap(func))
+    annotations = spec.annotations
+    schemas = [
+        (name, compile_schema(annotations[name]))
+        for name in spec.args + spec.kwonlyargs if is_schema(annotations.get(name))
+    ]
+    pass_json = not schemas or '_json' in spec.args or spec.varkw is not None
+
+    def bind(kwargs, body):
+        """binds the schema arguments from body, returns the list of errors"""
+        if len(schemas) == 1:
+            name, validate = schemas[0]
+            kwargs[name], errors = validate(body)
+            return errors
+
+        if not isinstance(body, dict):
+            return ['body: expected object']
+        errors = []
+        for name, validate in schemas:
+            if name in body:
+                kwargs[name], e = validate(body[name], name)
+                errors.extend(e)
+            else:
+                errors.append('%s: is required' % name)
+        return errors
+
     @functools.wraps(func, updated=[])
     def wrapper(context, **kwargs):
-        body = context.get_request_body()
+        body = context.get_body()
+        data = None
         if len(body) != 0:
             actual_content_type, charset = context.get_content_type()
-            if actual_content_type != CONTENT_TYPE:
+            serializer = serializers.get(actual_content_type)
+            if serializer is None:
                 return context.send_error(415, reason="Content-Type should be \"%s\"" % CONTENT_TYPE)
 
-            if len(charset) > 0 and charset != CHARSET:
+            if len(charset) > 0 and charset != CHARSET and serializer.text:
                 return context.send_error(415, reason="charset should be \"%s\"" % CHARSET)
 
             try:
-                kwargs['_json'] = ujson.loads(body)
+                data = serializer.loads(body)
             except ValueError as e:
                 return context.send_error(400, reason=str(e))
 
+            if pass_json:
+                kwargs['_json'] = data
+
+        if schemas:
+            if len(body) == 0:
+                return context.send_error(400, reason="the request body is required")
+            errors = bind(kwargs, data)
+            if errors:
+                return context.send_error(400, reason="invalid request body", errors=errors)
+
         return func(context, **kwargs)
     return wrapper
 
 
+def _is_stream(result):
+    """checks that result is generator or asynchronous iterator"""
+    return isinstance(result, types.GeneratorType) or hasattr(result, '__aiter__')
+
+
+async def _json_stream(context, items):
+    """writes the items as json array or NDJSON if it is accepted, waits for flush after each batch"""
+    if context.finished:
+        return
+
+    ndjson = NDJSON_CONTENT_TYPE in context.get_header('Accept', '')
+    if ndjson:
+        context.set_header('Content-Type', '%s; charset=%s' % (NDJSON_CONTENT_TYPE, CHARSET))
+    else:
+        context.set_header('Content-Type', '%s; charset=%s' % (CONTENT_TYPE, CHARSET))
+        context.write(b'[')
+
+    dumps = serializers.get().dumps
+    write = context.write
+    separator = b'\n' if ndjson else b','
+    size = 0
+    first = True
+
+    def write_item(item):
+        """writes the item, returns True if the batch is full"""
+        nonlocal size, first
+        chunk = dumps(item)
+        if ndjson:
+            chunk += separator
+        elif first:
+            first = False
+        else:
+            chunk = separator + chunk
+        write(chunk)
+        size += len(chunk)
+        if size < STREAM_BATCH_SIZE:
+            return False
+        size = 0
+        return True
+
+    flushed = False
+    try:
+        if isinstance(items, types.GeneratorType):
+            for i in items:
+                if write_item(i):
+                    flushed = True
+                    await context.flush()
+        else:
+            async for i in items:
+                if write_item(i):
+                    flushed = True
+                    await context.flush()
+    except Exception:
+        if flushed:
+            # the status has been sent, the response is ended without the final chunk to report the failure
+            context.abort()
+        raise
+
+    if not ndjson:
+        write(b']')
+    context.finish()
+
+
+async def _json_dumps_async(context, result):
+    result = await result
+    if _is_stream(result):
+        await _json_stream(context, result)
+    else:
+        _json_dumps(context, result)
+
+
 def _json_output(func):
     """serializes output as json"""
-    _future_class = asyncio.Future
-    _async = asyncio.async
-    _partial = functools.partial
-    _is_coroutine = asyncio.iscoroutinefunction(func)
+    _isawaitable = isawaitable
 
     @functools.wraps(func, updated=[])
     def wrapper(context, **kwargs):
-        if _is_coroutine:
-            result = _async(func(context, **kwargs), loop=context.modules.loop)
-        else:
-            result = func(context, **kwargs)
-
-        if isinstance(result, _future_class):
-            return convert1(
-                _partial(_json_dumps, context), result, loop=context.modules.loop
-            )
+        result = func(context, **kwargs)
+        if _isawaitable(result):
+            return _json_dumps_async(context, result)
+        if _is_stream(result):
+            return _json_stream(context, result)
 
         _json_dumps(context, result)
 
@@ -0,0 +1,119 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import collections
+import math
+
+
+# the limiters of handlers by name
+_limiters = dict()
+
+
+class Overloaded(Exception):
+    """the request is rejected, because the handler has no free slots"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """limits the number of concurrent calls, the excess calls wait in the bounded FIFO queue"""
+
+    def __init__(self, max_concurrency, max_queue=0, queue_timeout=None):
+        """
+        :param max_concurrency: the maximum number of concurrent calls
+        :param max_queue: the maximum number of waiting calls
+        :param queue_timeout: the maximum time in seconds to wait in queue, None - no limit
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency should be positive: %r" % max_concurrency)
+
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = max(1, math.ceil(queue_timeout or 1))
+        self.active = 0
+        self.shed = 0
+        self.timeouts = 0
+        self._waiters = collections.deque()
+
+    @property
+    def queued(self):
+        """the number of waiting calls"""
+        return len(self._waiters)
+
+    def stats(self):
+        """returns the counters of limiter"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+        }
+
+    async def acquire(self):
+        """waits for the free slot, raises Overloaded if queue is full or wait is timed out"""
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise Overloaded("the queue of handler is full", self.retry_after)
+
+        waiter = asyncio.Future()
+        self._waiters.append(waiter)
+        try:
+            # the slot is passed by release
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            self.timeouts += 1
+            raise Overloaded("the request has timed out in queue", self.retry_after)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot has been passed already
+                self.release()
+            raise
+        finally:
+            if waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+    def release(self):
+        """releases the slot, passes it to the first waiter if any"""
+        waiters = self._waiters
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+def register(name, limiter):
+    """registers the limiter to expose its stats"""
+    _limiters[name] = limiter
+    return limiter
+
+
+def stats():
+    """returns the stats of all limiters by handler name"""
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,203 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import enum
+import typing
+
+from .converters import _UNION_TYPES
+from .converters import _args
+from .converters import _origin
+from .converters import resolve
+
+__all__ = ('compile_schema', 'is_schema')
+
+
+_NONE_TYPE = type(None)
+
+
+class _Errors(list):
+    """the list of validation errors"""
+    def add(self, path, message):
+        self.append('%s: %s' % (path or 'body', message))
+
+
+def is_schema(annotation):
+    """checks that annotation is dataclass or TypedDict, that can be bound from json"""
+    if not isinstance(annotation, type):
+        return False
+    if hasattr(annotation, '__dataclass_fields__'):
+        return True
+    return issubclass(annotation, dict) and bool(getattr(annotation, '__annotations__', None))
+
+
+def _fields(cls):
+    """
+    :return: the list of (name, type, required) of schema class
+    """
+    hints = typing.get_type_hints(cls)
+    if hasattr(cls, '__dataclass_fields__'):
+        import dataclasses
+        return [
+            (f.name, hints.get(f.name), f.default is dataclasses.MISSING and f.default_factory is dataclasses.MISSING)
+            for f in cls.__dataclass_fields__.values() if f.init
+        ]
+
+    required = getattr(cls, '__required_keys__', None)
+    if required is None:
+        required = hints if getattr(cls, '__total__', True) else ()
+    return [(name, t, name in required) for name, t in hints.items()]
+
+
+def _expect(check, name, convert=None):
+    def validate(value, path, errors):
+        if check(value):
+            return value if convert is None else convert(value)
+        errors.add(path, 'expected %s' % name)
+    return validate
+
+
+def _any(value, path, errors):
+    return value
+
+
+def _list_validator(item):
+    def validate(value, path, errors):
+        if not isinstance(value, list):
+            return errors.add(path, 'expected list')
+        return [item(x, '%s[%d]' % (path, i), errors) for i, x in enumerate(value)]
+    return validate
+
+
+def _dict_validator(item):
+    def validate(value, path, errors):
+        if not isinstance(value, dict):
+            return errors.add(path, 'expected object')
+        return {k: item(v, '%s.%s' % (path, k) if path else k, errors) for k, v in value.items()}
+    return validate
+
+
+def _optional_validator(validator):
+    def validate(value, path, errors):
+        if value is None:
+            return None
+        return validator(value, path, errors)
+    return validate
+
+
+def _enum_validator(cls):
+    members = {m.value: m for m in cls}
+    members.update(cls.__members__)
+
+    def validate(value, path, errors):
+        try:
+            return members[value]
+        except (KeyError, TypeError):
+            errors.add(path, 'expected one of %s' % ', '.join(map(str, cls.__members__)))
+    return validate
+
+
+def _string_validator(cls):
+    """the value, that is passed as string in json, e.g. datetime or uuid"""
+    convert = resolve(cls)[0]
+    name = cls.__name__
+
+    def validate(value, path, errors):
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, str):
+            try:
+                return convert(value)
+            except (ValueError, TypeError):
+                pass
+        errors.add(path, 'expected %s' % name)
+    return validate
+
+
+def _schema_validator(cls):
+    fields = [(name, _validator(t), required) for name, t, required in _fields(cls)]
+    is_dict = issubclass(cls, dict)
+
+    def validate(value, path, errors):
+        if not isinstance(value, dict):
+            return errors.add(path, 'expected object')
+
+        values = {}
+        count = len(errors)
+        for name, validator, required in fields:
+            field_path = '%s.%s' % (path, name) if path else name
+            if name in value:
+                values[name] = validator(value[name], field_path, errors)
+            elif required:
+                errors.add(field_path, 'is required')
+
+        if len(errors) != count:
+            return None
+        return values if is_dict else cls(**values)
+    return validate
+
+
+_SIMPLE = {
+    int: _expect(lambda x: isinstance(x, int) and not isinstance(x, bool), 'int'),
+    float: _expect(lambda x: isinstance(x, (int, float)) and not isinstance(x, bool), 'float', float),
+    str: _expect(lambda x: isinstance(x, str), 'str'),
+    bool: _expect(lambda x: isinstance(x, bool), 'bool'),
+    list: _expect(lambda x: isinstance(x, list), 'list'),
+    dict: _expect(lambda x: isinstance(x, dict), 'object'),
+}
+_SIMPLE[typing.List] = _SIMPLE[list]
+_SIMPLE[typing.Dict] = _SIMPLE[dict]
+
+
+def _validator(annotation):
+    """compiles the validator of json value"""
+    if annotation is None or annotation is typing.Any:
+        return _any
+    if annotation in _SIMPLE:
+        return _SIMPLE[annotation]
+
+    origin = _origin(annotation)
+    args = _args(annotation)
+    if origin in _UNION_TYPES:
+        other = [x for x in args if x is not _NONE_TYPE]
+        if len(other) == 1:
+            return _optional_validator(_validator(other[0]))
+        return _any
+    if origin in (list, typing.List):
+        return _list_validator(_validator(args[0]) if args else _any)
+    if origin in (dict, typing.Dict):
+        return _dict_validator(_validator(args[1]) if len(args) == 2 else _any)
+
+    if is_schema(annotation):
+        return _schema_validator(annotation)
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return _enum_validator(annotation)
+    if isinstance(annotation, type):
+        return _string_validator(annotation)
+    return _any
+
+
+def compile_schema(cls):
+    """
+    compiles the validator of schema class.
+    :return: the function f(value), that returns the tuple (instance, errors)
+    """
+    validator = _schema_validator(cls)
+
+    def validate(value, path=''):
+        errors = _Errors()
+        result = validator(value, path, errors)
+        return result, errors
+
+    return validate
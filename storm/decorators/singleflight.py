@@ -0,0 +1,113 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import functools
+
+from .. import compression
+from .. import serializers
+
+
+# the methods, which requests may be coalesced
+_METHODS = frozenset(('GET', 'HEAD'))
+
+
+def _share(flight, response):
+    """
+    passes the response to the waiting requests, the successful responses only are shared,
+    the response, that sets cookies, depends on request and is not shared as well
+    """
+    if not flight.done():
+        if not 200 <= response[0] < 300 or any(k == 'Set-Cookie' for k, _ in response[2]):
+            response = None
+        flight.set_result(response)
+
+
+class SingleFlight:
+    """shares the response of in-flight request with the identical concurrent requests"""
+
+    def __init__(self, secure=True):
+        """
+        :param secure: if True, the requests of different users are not coalesced
+        """
+        self.secure = secure
+        self.leaders = 0
+        self.followers = 0
+        self._flights = dict()
+
+    def key(self, context):
+        """the key of request: method, path, normalized arguments, the user and the negotiated format and encoding"""
+        request = context.request
+        arguments = tuple(sorted((k, tuple(v)) for k, v in request.query_arguments.items()))
+        user = str(context.current_user) if self.secure else None
+        media_type = serializers.negotiate(request.headers.get('Accept')).content_type
+        encoding = compression.negotiate(request.headers.get('Accept-Encoding'))
+        return request.method, request.path, arguments, user, media_type, encoding
+
+    def __call__(self, invoke, context, kwargs):
+        """invokes the handler or waits for the response of identical request in flight"""
+        if context.request.method not in _METHODS:
+            return invoke(context, kwargs)
+        return self.run(self.key(context), invoke, context, kwargs)
+
+    def run(self, key, invoke, context, kwargs):
+        """invokes the handler or waits for the response of request with the same key in flight"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.followers += 1
+            return self._follow(flight, invoke, context, kwargs)
+
+        self.leaders += 1
+        flight = asyncio.Future()
+        context.on_response(functools.partial(_share, flight))
+        self._flights[key] = flight
+        try:
+            result = invoke(context, kwargs)
+        except BaseException:
+            self._land(key, flight, context)
+            raise
+
+        if result is None:
+            self._land(key, flight, context)
+            return None
+        return self._lead(key, flight, result, context)
+
+    def in_flight(self, key):
+        """checks that the request with key is in flight"""
+        return key in self._flights
+
+    async def _lead(self, key, flight, result, context):
+        try:
+            await result
+        finally:
+            self._land(key, flight, context)
+
+    def _land(self, key, flight, context):
+        """completes the flight, the response is passed by the callback of context.finish"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if context.finished and not flight.done():
+            # the response has been sent without capturing, e.g. it is streamed
+            flight.set_result(None)
+
+    @staticmethod
+    async def _follow(flight, invoke, context, kwargs):
+        response = await asyncio.shield(flight)
+        if response is None:
+            # the leader has no response to share, handle the request independently
+            result = invoke(context, kwargs)
+            if result is not None:
+                await result
+        elif not context.finished:
+            context.write_response(response)
@@ -18,7 +18,9 @@ import inspect
 
 from . import decorators
 from .decorators import argparser
+from .decorators import executor as _executor
 from .decorators import handler as _handler
+from .decorators.schema import is_schema
 
 __all__ = ("declare",)
 
@@ -29,13 +31,17 @@ def _register(registry, method=None, url=None, h=None):
 
 
 def _apply_mutation(func, mutators):
-    """applies the wrappers"""
+    """applies the wrappers: the comma separated names or the sequence of names and wrappers"""
     if mutators:
-        for m in filter(None, mutators.split(',')):
-            d = decorators
-            for attr in m.split('.'):
-                d = getattr(d, attr)
-            func = d(func)
+        if isinstance(mutators, str):
+            mutators = mutators.split(',')
+        for m in filter(None, mutators):
+            if isinstance(m, str):
+                d = decorators
+                for attr in m.split('.'):
+                    d = getattr(d, attr)
+                m = d
+            func = m(func)
     return func
 
 
@@ -44,18 +50,20 @@ def _apply_argparser(func):
     spec = inspect.getfullargspec(inspect.unwrap(func))
     arguments = list()
     # first argument is context
-    # args
+    # args, the arguments annotated with schema are bound from body
     defaults_len = spec.defaults and len(spec.defaults) or 0
     args_len = len(spec.args) - defaults_len
     for i in range(1, args_len):
         name = spec.args[i]
-        if not name.startswith('_'):
-            arguments.append((name, spec.annotations.get(name), name.endswith('s')))
+        annotation = spec.annotations.get(name)
+        if not name.startswith('_') and not is_schema(annotation):
+            # the list is declared by List[T] or Sequence[T], the plural name is used for unannotated arguments only
+            arguments.append((name, annotation, annotation is None and name.endswith('s')))
 
     # kwargs
     for i in range(defaults_len):
         name = spec.args[args_len + i]
-        if not name.startswith('_'):
+        if not name.startswith('_') and not is_schema(spec.annotations.get(name)):
             default = spec.defaults[i]
             if name in spec.annotations:
                 annotation = spec.annotations[name]
@@ -67,11 +75,20 @@ def _apply_argparser(func):
     return argparser.argparser(arguments)(func)
 
 
-def declare(method, url, mutator=None, **kwargs):
-    """make the method handler"""
+def declare(method, url, mutator=None, executor=None, **kwargs):
+    """
+    make the method handler,
+    the timeout cancels the asynchronous handler only, the synchronous one blocks the loop and is not interrupted
+    """
 
     def make_handler(func):
+        if executor is not None:
+            # the function body only is run in the executor, the arguments and result are processed on the loop
+            func = _executor.offload(func, executor)
         h = _handler.handler(_apply_argparser(_apply_mutation(func, mutator)), **kwargs)
+        if executor == 'process':
+            # the function should be registered before the process pool is forked
+            h.lazy = False
         r = functools.partial(_register, method=method, url=url, h=h)
         r.__handler__ = True
         return r
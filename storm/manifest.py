@@ -0,0 +1,154 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import functools
+import json
+import os
+
+from .handler import _register
+from .resources import _import_object
+
+__all__ = ('Manifest',)
+
+
+# the attributes of handler, that are read by application before the handler is called
+_ATTRIBUTES = ('stream_body', 'max_body_size')
+
+
+def _lazy_handler(module_name, attr, attributes):
+    """the handler, that imports the module on the first request"""
+    handler = None
+
+    def load():
+        """imports the module, returns the handler"""
+        nonlocal handler
+        if handler is None:
+            handler = getattr(_import_object(module_name), attr).keywords['h']
+        return handler
+
+    def wrapper(context, *args, **kwargs):
+        return (handler or load())(context, *args, **kwargs)
+
+    for name, value in attributes.items():
+        setattr(wrapper, name, value)
+    wrapper.load = load
+    return wrapper
+
+
+def _describe(module):
+    """
+    describes the handlers of module
+    :return: the list of (attr, method, url, attributes) or None if the module cannot be imported lazily,
+             the module should declare LAZY = True, the module with handlers, that have side effects on import
+             (see handler.lazy), is imported on start
+    """
+    if not getattr(module, 'LAZY', False) or hasattr(module, 'SETTINGS') or hasattr(module, 'EXCEPTIONS'):
+        return None
+
+    handlers = []
+    for attr, h in vars(module).items():
+        if not getattr(h, '__handler__', False):
+            continue
+        if not isinstance(h, functools.partial) or h.func is not _register:
+            return None
+        func = h.keywords['h']
+        if not getattr(func, 'lazy', True):
+            return None
+        attributes = {name: getattr(func, name) for name in _ATTRIBUTES if hasattr(func, name)}
+        handlers.append([attr, h.keywords['method'], h.keywords['url'], attributes])
+    return handlers
+
+
+class _LazyModule:
+    """the module stub, that provides the meta information from manifest"""
+
+    def __init__(self, name, requires, handlers):
+        self.__name__ = name
+        self.REQUIRES = requires
+        for attr, method, url, attributes in handlers:
+            h = functools.partial(_register, method=method, url=url, h=_lazy_handler(name, attr, attributes))
+            h.__handler__ = True
+            setattr(self, attr, h)
+
+
+class Manifest:
+    """
+    The cache of discovered modules, the modules, that declare LAZY = True and only handlers,
+    are not imported on start, but on first request to any of their handlers.
+    The records are invalidated, when the module file is modified, but not when the modules,
+    that are imported by it, are modified.
+    """
+
+    VERSION = 3
+
+    def __init__(self, path):
+        self.path = path
+        self.modules = dict()
+        self.changed = False
+        self._seen = set()
+        try:
+            with open(path, 'r') as stream:
+                data = json.load(stream)
+        except (OSError, ValueError):
+            self.changed = True
+            return
+
+        if data.get('version') == self.VERSION:
+            self.modules = data['modules']
+        else:
+            self.changed = True
+
+    @staticmethod
+    def _stat(origin):
+        stat = os.stat(origin)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def get(self, name, origin):
+        """returns the module stub or None if module should be imported"""
+        self._seen.add(name)
+        record = self.modules.get(name)
+        if origin is None or record is None or record['handlers'] is None:
+            return None
+        if record['origin'] != origin or record['stat'] != self._stat(origin):
+            return None
+        return _LazyModule(name, record['requires'], record['handlers'])
+
+    def put(self, name, origin, module):
+        """records the imported module"""
+        self._seen.add(name)
+        if origin is None:
+            return
+        record = {
+            'origin': origin,
+            'stat': self._stat(origin),
+            'requires': list(getattr(module, 'REQUIRES', ())),
+            'handlers': _describe(module),
+        }
+        if self.modules.get(name) != record:
+            self.modules[name] = record
+            self.changed = True
+
+    def save(self):
+        """writes the manifest if it was changed, the records of removed modules are dropped"""
+        for name in set(self.modules).difference(self._seen):
+            del self.modules[name]
+            self.changed = True
+        if not self.changed:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as stream:
+            json.dump({'version': self.VERSION, 'modules': self.modules}, stream, sort_keys=True, indent=1)
+        os.replace(tmp, self.path)
+        self.changed = False
@@ -13,7 +13,11 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import asyncio
+import weakref
+
 import wsql
+from wsql.cluster.functional import TransactionScope
 
 
 EXCEPTIONS = {
@@ -72,6 +76,57 @@ SETTINGS = [
 ]
 
 
+class _Query:
+    """the query, that registers the connection, on which it is executed"""
+
+    def __init__(self, query, connections):
+        self._query = query
+        self._connections = connections
+
+    async def __call__(self, connection):
+        self._connections.add(connection)
+        try:
+            return await self._query(connection)
+        except asyncio.CancelledError:
+            # the query has been interrupted by deadline, the connection is in unknown state, so the pool discards it
+            connection.close()
+            raise
+
+
+class _Transaction(_Query, TransactionScope):
+    """the transaction, that registers the connection, the cluster executes it on the master node"""
+
+
+class Database:
+    """the database connection, that respects the deadline of request"""
+
+    def __init__(self, connection, loop):
+        self.connection = connection
+        self.loop = loop
+        # the connections of pools, wsql does not provide the way to close the pools
+        self._connections = weakref.WeakSet()
+
+    def execute(self, query, context=None):
+        """
+        executes the query asynchronously
+        :param query: the query
+        :param context: the RequestContext, if it has deadline the query and retries are limited by remaining time
+        """
+        wrapper = _Transaction if isinstance(query, TransactionScope) else _Query
+        query = wrapper(query, self._connections)
+        remaining = None if context is None else context.remaining_time()
+        if remaining is None:
+            return self.connection.execute(query)
+        return asyncio.wait_for(self.connection.execute(query), remaining)
+
+    def close(self):
+        """closes the connections, that have been opened by pools"""
+        while self._connections:
+            connection = self._connections.pop()
+            if connection.connected:
+                connection.close()
+
+
 def load(options, loop, logger):
     """load the database module"""
 
@@ -80,4 +135,9 @@ def load(options, loop, logger):
 
     options["row_formatter"] = object_row_decoder
 
-    return wsql.cluster.connect(options, loop=loop, logger=logger)
+    return Database(wsql.cluster.connect(options, loop=loop, logger=logger), loop)
+
+
+def unload(database, **_):
+    """unload the database module"""
+    database.close()
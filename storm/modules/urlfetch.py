@@ -14,15 +14,33 @@ SOFTWARE.
 """
 
 import asyncio
+import collections
+import copy
+import email.utils
 import functools
-import ujson
-from urllib.parse import urljoin
+import random
+import socket
+import sys
+import time
+from urllib.parse import urljoin, urlsplit
 
 from .. import framework
+from .. import serializers
+from ..decorators.cache import ResponseCache
+
+
+class CircuitOpenError(Exception):
+    """the requests to host are rejected, because the circuit breaker is open"""
+
+    def __init__(self, host, retry_after):
+        super().__init__("the circuit breaker of %s is open" % host)
+        self.host = host
+        self.retry_after = retry_after
 
 
 EXCEPTIONS = {
     framework.HTTPClient.ErrorClass: lambda x: x.code,
+    CircuitOpenError: 503,
 }
 
 
@@ -47,16 +65,430 @@ SETTINGS = [
         "name": "retries",
         "help": "the default retries count"
     },
+    {
+        "name": "retry_codes",
+        "default": [429, 502, 503, 504, 599],
+        "type": int,
+        "multiple": True,
+        "help": "the response codes, that are retried (can be repeated)"
+    },
+    {
+        "name": "retry_backoff",
+        "default": 0.05,
+        "help": "the base delay in seconds before retry, it is doubled on each attempt"
+    },
+    {
+        "name": "retry_max_backoff",
+        "default": 5.0,
+        "help": "the maximum delay in seconds before retry, the longer Retry-After gives up the request"
+    },
+    {
+        "name": "retry_budget",
+        "default": 0.1,
+        "help": "the maximum ratio of retries to requests in the process"
+    },
+    {
+        "name": "retry_budget_reserve",
+        "default": 10,
+        "help": "the number of retries allowed beyond the ratio, when the rate of requests is low"
+    },
+    {
+        "name": "breaker_failure_rate",
+        "default": 0.5,
+        "help": "the ratio of failed requests to host, that opens the circuit breaker, 0 - disables the breaker"
+    },
+    {
+        "name": "breaker_slow_call",
+        "default": 0.0,
+        "help": "the request time in seconds, since that the request is slow, 0 - the slow requests are not counted"
+    },
+    {
+        "name": "breaker_slow_rate",
+        "default": 0.8,
+        "help": "the ratio of slow requests to host, that opens the circuit breaker"
+    },
+    {
+        "name": "breaker_min_requests",
+        "default": 20,
+        "help": "the minimum number of requests in window to evaluate the ratios"
+    },
+    {
+        "name": "breaker_window",
+        "default": 10,
+        "help": "the time window in seconds to evaluate the ratios"
+    },
+    {
+        "name": "breaker_open_timeout",
+        "default": 5.0,
+        "help": "the time in seconds, while the open circuit breaker rejects requests before probing the host"
+    },
+    {
+        "name": "breaker_probes",
+        "default": 3,
+        "help": "the number of successful probes, that closes the half-open circuit breaker"
+    },
+    {
+        "name": "cache_size",
+        "default": 0,
+        "help": "the maximum size in bytes of cached responses, 0 - disables the cache"
+    },
+    {
+        "name": "max_connections",
+        "default": 10,
+        "help": "the maximum number of concurrent requests, the excess requests wait in queue"
+    },
+    {
+        "name": "max_connections_per_host",
+        "default": 0,
+        "help": "the maximum number of concurrent requests to one host, 0 - no limit"
+    },
+    {
+        "name": "keep_alive_timeout",
+        "default": 15.0,
+        "help": "the time in seconds to keep the idle connection open for reuse, 0 - disables keep-alive"
+    },
+    {
+        "name": "queue_timeout",
+        "default": 0.0,
+        "help": "the maximum time in seconds to wait in queue, 0 - up to the request timeout"
+    },
 ]
 
 
+def _is_expired(context):
+    """checks that the deadline of request is exceeded"""
+    return context.remaining_time() == 0
+
+
+def _parse_retry_after(value):
+    """returns the delay in seconds from the Retry-After header"""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_failure(error):
+    """checks that the error means the failure of upstream"""
+    if error is None:
+        return False
+    if isinstance(error, framework.HTTPClient.ErrorClass):
+        return error.code >= 500
+    return True
+
+
+class RetryBudget:
+    """
+    limits the retries by ratio to the requests in the process:
+    each request deposits `ratio` token, each retry withdraws one token.
+    """
+
+    def __init__(self, ratio=0.1, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = float(reserve)
+        self.requests = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def deposit(self):
+        """accounts the new request"""
+        self.requests += 1
+        self.balance = min(self.balance + self.ratio, self.reserve)
+
+    def withdraw(self):
+        """returns True if the retry is allowed"""
+        if self.balance < 1:
+            self.rejected += 1
+            return False
+        self.balance -= 1
+        self.retries += 1
+        return True
+
+    def stats(self):
+        """returns the counters of budget"""
+        return {"requests": self.requests, "retries": self.retries, "rejected": self.rejected,
+                "balance": self.balance}
+
+
+# the errors, that mean the request has not been sent
+_CONNECT_ERRORS = (
+    framework.HTTPClient.ConnectTimeoutError, framework.HTTPClient.QueueTimeoutError,
+    ConnectionRefusedError, socket.gaierror
+)
+
+
+def _retrieve_exception(future):
+    """marks the exception of future as retrieved"""
+    if not future.cancelled():
+        future.exception()
+
+
+def _is_connect_error(error):
+    """checks that the request has failed before it has been sent: on resolving, connecting or in queue"""
+    return isinstance(error, _CONNECT_ERRORS)
+
+
+class RetryPolicy:
+    """
+    decides, which failures are retried and the delay before retry:
+    the exponential backoff with full jitter, but not less than Retry-After.
+    the requests with methods, that are not idempotent, are retried only if they have not been sent.
+    """
+
+    def __init__(self, codes=(429, 502, 503, 504, 599), exceptions=(OSError,), backoff=0.05, max_backoff=5.0,
+                 budget=None, methods=('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE')):
+        self.codes = frozenset(codes)
+        self.exceptions = tuple(exceptions)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget
+        self.methods = frozenset(x.upper() for x in methods)
+
+    def is_idempotent(self, method):
+        """checks that the request with method may be repeated safely"""
+        return method.upper() in self.methods
+
+    def is_retryable(self, error, idempotent=True):
+        """checks that the request may be retried after the error"""
+        if not idempotent and not _is_connect_error(error):
+            return False
+        if isinstance(error, framework.HTTPClient.ErrorClass):
+            return error.code in self.codes
+        return isinstance(error, self.exceptions)
+
+    def delay(self, attempt, response=None):
+        """returns the delay before the retry or None if the request should not be retried"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        if response is not None and response.headers is not None:
+            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                if retry_after > self.max_backoff:
+                    return None
+                delay = max(delay, retry_after)
+        return delay
+
+
+class CircuitBreaker:
+    """
+    the circuit breaker of host:
+    closed - the requests are passed, the outcomes are counted in the time window by seconds;
+    open - the requests are rejected until the open timeout;
+    half-open - the limited number of probes is passed, the breaker is closed if all of them are successful.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_rate=0.5, slow_call=None, slow_rate=0.8, min_requests=20, window=10,
+                 open_timeout=5.0, probes=3, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.min_requests = min_requests
+        self.window = int(window)
+        self.open_timeout = open_timeout
+        self.probes = probes
+        self.clock = clock
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.buckets = collections.deque()
+        self.in_flight = 0
+        self.succeeded = 0
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        """returns None if the request is allowed, otherwise the time in seconds to retry after"""
+        if self.state == self.OPEN:
+            retry_after = self.opened_at + self.open_timeout - self.clock()
+            if retry_after > 0:
+                self.rejected += 1
+                return retry_after
+            self.state = self.HALF_OPEN
+            self.in_flight = self.succeeded = 0
+
+        if self.state == self.HALF_OPEN:
+            if self.in_flight + self.succeeded >= self.probes:
+                self.rejected += 1
+                return self.open_timeout
+            self.in_flight += 1
+        return None
+
+    def record(self, failed, request_time):
+        """accounts the outcome of allowed request"""
+        if self.state == self.HALF_OPEN:
+            self.in_flight = max(self.in_flight - 1, 0)
+            if failed:
+                self._open()
+            else:
+                self.succeeded += 1
+                if self.succeeded >= self.probes:
+                    self.state = self.CLOSED
+                    self.buckets.clear()
+            return
+        if self.state == self.OPEN:
+            return
+
+        now = int(self.clock())
+        buckets = self.buckets
+        while buckets and buckets[0][0] <= now - self.window:
+            buckets.popleft()
+        if not buckets or buckets[-1][0] != now:
+            buckets.append([now, 0, 0, 0])
+        bucket = buckets[-1]
+        bucket[1] += 1
+        bucket[2] += bool(failed)
+        bucket[3] += bool(self.slow_call and request_time >= self.slow_call)
+
+        total = sum(x[1] for x in buckets)
+        if total < self.min_requests:
+            return
+        if sum(x[2] for x in buckets) >= total * self.failure_rate:
+            self._open()
+        elif self.slow_call and sum(x[3] for x in buckets) >= total * self.slow_rate:
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = self.clock()
+        self.opened += 1
+        self.buckets.clear()
+
+    def stats(self):
+        """returns the state and counters of breaker"""
+        return {
+            "state": self.state,
+            "requests": sum(x[1] for x in self.buckets),
+            "failures": sum(x[2] for x in self.buckets),
+            "slow": sum(x[3] for x in self.buckets),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+# the headers of cached response, that are updated by 304 response
+_REVALIDATED_HEADERS = ('Cache-Control', 'Expires', 'Date', 'Age', 'Etag', 'Last-Modified')
+
+# the cached response, the headers and body are at the same positions as in the response of handler
+_CachedResponse = collections.namedtuple('_CachedResponse', ('response', 'vary', 'headers', 'body'))
+
+
+def _json_size(value):
+    """estimates the memory size of decoded json in bytes"""
+    size = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return size
+
+
+def _parse_cache_control(value):
+    """returns the directives of Cache-Control header as dict"""
+    directives = dict()
+    for item in value.split(','):
+        name, _, arg = item.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('" ')
+    return directives
+
+
+def _http_date(value):
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_shared(directives):
+    """checks that the response to the authorized request may be stored in shared cache, see RFC 7234 3.2"""
+    return 'public' in directives or 's-maxage' in directives
+
+
+def _freshness(headers, authorized=False):
+    """
+    returns the time to live of response in seconds by Cache-Control and Expires headers,
+    or None if the response should not be stored
+    :param authorized: the request has Authorization or Cookie header
+    """
+    directives = _parse_cache_control(headers.get('Cache-Control', ''))
+    if 'no-store' in directives or 'private' in directives:
+        return None
+    if authorized and not _is_shared(directives):
+        return None
+    if 'no-cache' in directives:
+        return 0
+    try:
+        max_age = directives.get('s-maxage') or directives['max-age']
+        return max(int(max_age) - int(headers.get('Age', 0)), 0)
+    except (KeyError, ValueError):
+        pass
+    expires = _http_date(headers.get('Expires'))
+    if expires is None:
+        return 0
+    return max(expires - (_http_date(headers.get('Date')) or time.time()), 0)
+
+
+def _vary(response_headers, request_headers):
+    """returns the values of request headers, that are listed in Vary, or None if the response varies on all"""
+    names = [x.strip().lower() for x in response_headers.get('Vary', '').split(',') if x.strip()]
+    if '*' in names:
+        return None
+    return tuple((name, request_headers.get(name)) for name in sorted(names))
+
+
 class HTTPClient:
-    def __init__(self, retries=None, loop=None, **kwargs):
-        self.client = framework.HTTPClient(kwargs)
+    def __init__(self, retries=None, loop=None, max_connections=10, max_connections_per_host=None,
+                 keep_alive_timeout=0, queue_timeout=None, retry_policy=None, breaker=None, cache_size=0, **kwargs):
+        self.client = framework.HTTPClient(
+            kwargs, max_clients=max_connections, max_per_host=max_connections_per_host,
+            idle_timeout=keep_alive_timeout, queue_timeout=queue_timeout
+        )
         self.retries = retries
+        self.retry_policy = retry_policy or RetryPolicy(budget=RetryBudget())
+        self.breaker = breaker
+        self.breakers = dict()
+        self.cache = ResponseCache(cache_size) if cache_size else None
         self.loop = loop
 
-    def fetch(self, context, url, args=None, method=None, data=None, headers=None, retries=None, **kwargs):
+    def get_breaker(self, host):
+        """returns the circuit breaker of host or None if breakers are disabled"""
+        if self.breaker is None:
+            return None
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(**self.breaker)
+        return breaker
+
+    def stats(self):
+        """
+        returns the statistics of connections:
+        the active and queued requests, idle connections and ratio of reused connections,
+        the counters of retry budget, the states of circuit breakers by host and the counters of cache
+        """
+        stats = self.client.stats()
+        if self.retry_policy.budget is not None:
+            stats["retries"] = self.retry_policy.budget.stats()
+        stats["breakers"] = {host: breaker.stats() for host, breaker in self.breakers.items()}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+    def fetch(self, context, url, args=None, method=None, data=None, headers=None, retries=None, idempotent=None,
+              **kwargs):
         """
         executes rest-request asynchronously
         :param context: the RequestContext
@@ -65,10 +497,20 @@ class HTTPClient:
         :param method: the request method
         :param data: the request body
         :param headers: the custom headers
+        :param retries: the maximum number of retries
+        :param idempotent: the request may be repeated safely, default: by method (GET, HEAD, OPTIONS, PUT, DELETE)
         :param kwargs: see framework.HTTPClient.urlfetch for details
+
+        the failures are retried according to the retry policy of client,
+        the requests, that are not idempotent, are retried only if they have not been sent.
+        the requests to the host with open circuit breaker fail with CircuitOpenError immediately.
+        if the context has deadline, the timeouts and retries are limited by the remaining time of request.
+        if the client has cache, the GET responses are cached according to Cache-Control, Expires and Vary,
+        the stale responses are revalidated by ETag and Last-Modified.
+        the cached response, including decoded json, is shared between callers and should not be modified.
         """
         if retries is None:
-            retries = self.retries
+            retries = self.retries or 0
 
         if method is None:
             method = 'GET' if data is None else 'POST'
@@ -91,56 +533,248 @@ class HTTPClient:
 
         if isinstance(data, dict):
             set_default_content_type("application/json; charset=utf-8")
-            data = ujson.dumps(data).encode('utf8')
+            data = serializers.get().dumps(data)
         elif isinstance(data, str):
             set_default_content_type("text/plain; charset=utf-8")
             data = data.encode('utf8')
         elif isinstance(data, bytes):
             set_default_content_type("octet/binary")
-        else:
+        elif data is not None:
             raise ValueError("unsupported type of data - %s" % type(data))
 
-        future = asyncio.Future(loop=self.loop)
+        loop = self.loop or asyncio.get_event_loop()
+        future = asyncio.Future(loop=loop)
         client = self.client
 
+        cache = self.cache
+        cache_key = cached = None
+        if cache is not None and method == 'GET' and data is None:
+            cache_key = (url, ())
+            request_headers = {k.lower(): v for k, v in headers.items()}
+            authorized = 'authorization' in request_headers or 'cookie' in request_headers
+            entry = cache.get(cache_key)
+            if entry is not None and authorized:
+                if not _is_shared(_parse_cache_control(entry.response.response.headers.get('Cache-Control', ''))):
+                    entry = None
+            if entry is not None and entry.response.vary == _vary(entry.response.response.headers, request_headers):
+                if entry.expires > time.monotonic():
+                    cache.hits += 1
+                    future.set_result(entry.response.response)
+                    return future
+                cached = entry.response
+                etag = cached.response.headers.get('Etag')
+                last_modified = cached.response.headers.get('Last-Modified')
+                if etag is not None and 'if-none-match' not in request_headers:
+                    headers['If-None-Match'] = etag
+                if last_modified is not None and 'if-modified-since' not in request_headers:
+                    headers['If-Modified-Since'] = last_modified
+            cache.misses += 1
+
+        def store(response, ttl):
+            """puts the response to cache, the responses with validators are kept for revalidation"""
+            vary = _vary(response.headers, request_headers)
+            if ttl is None or vary is None:
+                cache.discard(cache_key)
+            elif ttl > 0 or 'Etag' in response.headers or 'Last-Modified' in response.headers:
+                headers = list(response.headers.get_all())
+                # the decoded json is kept with the body
+                size = len(response.body) + sum(len(k) + len(v) for k, v in headers)
+                if getattr(response, 'json', None) is not None:
+                    size += _json_size(response.json)
+                cached_response = _CachedResponse(response, vary, headers, response.body)
+                cache.put(cache_key, cached_response, ttl, float('inf'), size)
+
+        policy = self.retry_policy
+        if idempotent is None:
+            idempotent = policy.is_idempotent(method)
+        budget = policy.budget
+        if budget is not None:
+            budget.deposit()
+        breaker = self.get_breaker(urlsplit(url).netloc)
+
+        def retry(retries_, error, response):
+            """schedules the retry, returns False if the request should not be retried"""
+            if retries_ == 0 or not policy.is_retryable(error, idempotent):
+                return False
+            delay = policy.delay(retries - retries_, response)
+            if delay is None:
+                return False
+            remaining = context.remaining_time()
+            if remaining is not None and remaining <= delay:
+                return False
+            if budget is not None and not budget.withdraw():
+                return False
+            loop.call_later(delay, send, retries_ - 1)
+            return True
+
+        def send(retries_):
+            if future.done():
+                return
+            if breaker is not None:
+                retry_after = breaker.allow()
+                if retry_after is not None:
+                    future.set_exception(CircuitOpenError(urlsplit(url).netloc, retry_after))
+                    return
+            request_kwargs = kwargs
+            remaining = context.remaining_time()
+            if remaining is not None:
+                request_kwargs = dict(kwargs)
+                for name in ('connect_timeout', 'request_timeout'):
+                    request_kwargs[name] = min(kwargs.get(name) or client.defaults[name], remaining)
+
+            inflight[0] = client.fetch(
+                method, url, body=data, headers=headers,
+                callback=functools.partial(done_callback, retries_), **request_kwargs
+            )
+
         def done_callback(retries_, response):
             error = response.error
+            if breaker is not None:
+                breaker.record(_is_failure(error), response.request_time)
+            if future.done():
+                return
 
             if error is None:
                 body = response.body
-                content_type, _, charset = response.headers['Content-Type'].lower().partition(';')
-                if len(body) > 0 and content_type == 'application/json':
+                content_type, _, params = response.headers.get('Content-Type', '').lower().partition(';')
+                if len(body) > 0 and content_type.strip() == 'application/json':
+                    charset = params.partition('charset=')[2].strip() or 'utf-8'
                     try:
-                        response.json = ujson.loads(body.decode(charset.lower() or 'utf-8'))
+                        response.json = serializers.get().loads(body.decode(charset))
                     except ValueError as e:
                         future.set_exception(e)
 
                 if not future.done():
+                    if cache_key is not None and response.code == 200:
+                        store(response, _freshness(response.headers, authorized))
                     future.set_result(response)
-            else:
-                if isinstance(error, client.ErrorClass):
-                    if error.code > 500 or retries_ == 0:
-                        future.set_exception(error)
-                else:
-                    future.set_exception(error)
+            elif cached is not None and response.code == 304:
+                cache.stale_hits += 1
+                # the cached response is held by the previous callers, so the updated copy is stored
+                revalidated = copy.copy(cached.response)
+                revalidated.headers = cached.response.headers.copy()
+                for name in _REVALIDATED_HEADERS:
+                    if name in response.headers:
+                        revalidated.headers[name] = response.headers[name]
+                store(revalidated, _freshness(revalidated.headers, authorized))
+                future.set_result(revalidated)
+            elif not retry(retries_, error, response):
+                future.set_exception(error)
 
             if future.done():
                 logger.info(
                     "HTTP request %d %s %02.f (%d)", response.code, url, response.request_time, retries - retries_
                 )
-            else:
-                client.fetch(
-                    method, url, data=data, headers=headers,
-                    callback=functools.partial(done_callback, retries_ - 1), **kwargs
-                )
 
-        client.fetch(
-            method, url, data=data, headers=headers,
-            callback=functools.partial(done_callback, retries), **kwargs
-        )
+        # the cancellation of future cancels the request in flight, that frees its place in the client queue
+        inflight = [None]
+        future.add_done_callback(lambda f: f.cancelled() and inflight[0] is not None and inflight[0].cancel())
+
+        if _is_expired(context):
+            future.set_exception(asyncio.TimeoutError())
+        else:
+            send(retries)
 
         return future
 
+    def _fetch_one(self, context, request):
+        """starts the request, that is the url or dict of fetch arguments"""
+        try:
+            if isinstance(request, dict):
+                return self.fetch(context, **request)
+            return self.fetch(context, request)
+        except Exception as e:
+            future = asyncio.Future(loop=self.loop)
+            future.set_exception(e)
+            return future
+
+    def _fan_out(self, context, requests, concurrency, fail_fast, on_result):
+        """
+        executes the requests with limited concurrency, calls on_result(index, result) on completion of each one,
+        returns the future, that is resolved when all requests are completed
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency should be positive: %r" % concurrency)
+        loop = self.loop or asyncio.get_event_loop()
+        pending = iter(enumerate(requests))
+        active = set()
+        done = asyncio.Future(loop=loop)
+
+        def cancel_active(_):
+            for x in list(active):
+                x.cancel()
+
+        def start():
+            while len(active) < concurrency and not done.done():
+                item = next(pending, None)
+                if item is None:
+                    if not active:
+                        done.set_result(None)
+                    return
+                future = self._fetch_one(context, item[1])
+                active.add(future)
+                future.add_done_callback(functools.partial(complete, item[0]))
+
+        def complete(index, future):
+            active.discard(future)
+            if done.done():
+                return
+            if future.cancelled():
+                result = asyncio.CancelledError()
+            else:
+                result = future.exception() or future.result()
+            on_result(index, result)
+            if fail_fast and isinstance(result, BaseException):
+                done.set_exception(result)
+            else:
+                start()
+
+        done.add_done_callback(cancel_active)
+        start()
+        return done
+
+    async def fetch_many(self, context, requests, concurrency=10, fail_fast=False):
+        """
+        executes the requests concurrently, but not more than `concurrency` at once
+        :param context: the RequestContext
+        :param requests: the urls or dicts of fetch arguments
+        :param concurrency: the maximum number of requests in flight
+        :param fail_fast: if True, the first error cancels the other requests and is raised
+        :return: the list of responses in order of requests, the failed request has exception in its place
+        """
+        requests = list(requests)
+        results = [None] * len(requests)
+        await self._fan_out(context, requests, concurrency, fail_fast, results.__setitem__)
+        return results
+
+    def fetch_as_completed(self, context, requests, concurrency=10, fail_fast=False):
+        """
+        executes the requests like fetch_many
+        :return: the iterator of awaitables, that return (index, response or exception) in order of completion
+        """
+        requests = list(requests)
+        loop = self.loop or asyncio.get_event_loop()
+        slots = [asyncio.Future(loop=loop) for _ in requests]
+        for slot in slots:
+            # the consumer may stop before all results are awaited
+            slot.add_done_callback(_retrieve_exception)
+        completed = iter(slots)
+
+        def on_result(index, result):
+            next(completed).set_result((index, result))
+
+        def on_done(future):
+            if not future.cancelled() and future.exception() is not None:
+                for slot in completed:
+                    slot.set_exception(future.exception())
+
+        self._fan_out(context, requests, concurrency, fail_fast, on_result).add_done_callback(on_done)
+        return iter(slots)
+
+    def close(self):
+        """closes the underlying client"""
+        self.client.close()
+
 
 def load(options, **_):
     """load urlfetch module"""
@@ -154,9 +788,40 @@ def load(options, **_):
             except FileNotFoundError as e:
                 print(e, file=sys.stderr)
 
+    retry_policy = RetryPolicy(
+        codes=options['retry_codes'],
+        backoff=options['retry_backoff'],
+        max_backoff=options['retry_max_backoff'],
+        budget=RetryBudget(options['retry_budget'], options['retry_budget_reserve'])
+    )
+
+    breaker = None
+    if options['breaker_failure_rate']:
+        breaker = {
+            "failure_rate": options['breaker_failure_rate'],
+            "slow_call": options['breaker_slow_call'] or None,
+            "slow_rate": options['breaker_slow_rate'],
+            "min_requests": options['breaker_min_requests'],
+            "window": options['breaker_window'],
+            "open_timeout": options['breaker_open_timeout'],
+            "probes": options['breaker_probes'],
+        }
+
     return HTTPClient(user_agent="WebEngine-UrlFetch",
                       ca_certs=load_cert(options['root_ca']),
                       client_key=load_cert(options['client_key']),
                       client_cert=load_cert(options['client_cert']),
                       validate_cert=options['validate_cert'],
-                      retries=options['retries'])
+                      retries=options['retries'],
+                      max_connections=options['max_connections'],
+                      max_connections_per_host=options['max_connections_per_host'] or None,
+                      keep_alive_timeout=options['keep_alive_timeout'],
+                      queue_timeout=options['queue_timeout'] or None,
+                      retry_policy=retry_policy,
+                      breaker=breaker,
+                      cache_size=options['cache_size'])
+
+
+def unload(client, **_):
+    """unload urlfetch module"""
+    client.close()
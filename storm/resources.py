@@ -90,31 +90,53 @@ def _resolve_packages(packages):
                 raise RuntimeError("package not found: %s" % package)
 
 
-def _traverse(path, package, consumer):
+def _module_origin(finder, name):
+    """returns the module file name without import"""
+    try:
+        return finder.find_spec(name).origin
+    except AttributeError:
+        return None
+
+
+def _load(name, origin, manifest):
+    """imports the module or takes it from manifest"""
+    if manifest is None:
+        return _import_object(name)
+
+    unit = manifest.get(name, origin)
+    if unit is None:
+        unit = _import_object(name)
+        manifest.put(name, origin, unit)
+    return unit
+
+
+def _traverse(path, package, consumer, manifest=None):
     """
     Walk through specified packages and build handlers list
     :param path: the root path
     :param package:  the package object
     :param consumer: the descriptor consumer
+    :param manifest: the manifest of modules, that allows to skip import
     """
     import pkgutil
 
-    def import_package(n):
-        if package:
-            n = '.'.join((package, n))
-        return _import_object(n)
-
     if isinstance(path, str):
-        children = [(_import_object(package), False)]
+        children = [(package, path, False)]
     else:
-        children = map(lambda x: (import_package(x[1]), x[2]), pkgutil.iter_modules(path))
-    for child in filter(None, children):
-        consumer(child[0])
-        if child[1]:
-            _traverse(child[0].__path__, child[0].__package__, consumer)
+        children = (
+            ('.'.join(filter(None, (package, x[1]))), _module_origin(x[0], x[1]), x[2])
+            for x in pkgutil.iter_modules(path)
+        )
+
+    for name, origin, ispkg in children:
+        unit = _load(name, origin, manifest)
+        consumer(unit)
+        if ispkg:
+            # the namespace package has no origin
+            _traverse([os.path.dirname(origin)] if origin else unit.__path__, name, consumer, manifest)
 
 
-def traverse(packages, consumer):
+def traverse(packages, consumer, manifest=None):
     """traverse list of packages and collect descriptors"""
     for path, package in _resolve_packages(packages):
-        _traverse(path, package, consumer)
+        _traverse(path, package, consumer, manifest)
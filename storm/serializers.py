@@ -0,0 +1,170 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import functools
+import json
+
+__all__ = ("Serializer", "configure", "get", "negotiate")
+
+
+JSON_CONTENT_TYPE = 'application/json'
+MSGPACK_CONTENT_TYPE = 'application/msgpack'
+CHARSET = 'UTF-8'
+
+# the json backends in order of preference, orjson is used only if it is selected explicitly,
+# because it does not serialize some values, that the others do, see _orjson
+JSON_BACKENDS = ('ujson', 'json')
+
+
+class Serializer:
+    """the serialization backend"""
+
+    __slots__ = ('name', 'content_type', 'dumps', 'loads', 'text')
+
+    def __init__(self, name, content_type, dumps, loads, text=True):
+        """
+        :param name: the name of backend
+        :param content_type: the value of Content-Type header
+        :param dumps: the function f(data, pretty=False) -> bytes
+        :param loads: the function f(bytes) -> data
+        :param text: the data is text in UTF-8 encoding
+        """
+        self.name = name
+        self.content_type = content_type
+        self.dumps = dumps
+        self.loads = loads
+        self.text = text
+
+
+def _json(sort_keys):
+    compact = json.JSONEncoder(sort_keys=sort_keys, ensure_ascii=False, separators=(',', ':')).encode
+    pretty = json.JSONEncoder(sort_keys=sort_keys, ensure_ascii=False, indent=2).encode
+
+    def dumps(data, pretty_=False):
+        return (pretty if pretty_ else compact)(data).encode(CHARSET)
+
+    return dumps, json.loads
+
+
+def _ujson(sort_keys):
+    import ujson
+
+    _dumps = ujson.dumps
+
+    def dumps(data, pretty=False):
+        return _dumps(data, sort_keys=sort_keys, indent=pretty << 1).encode(CHARSET)
+
+    return dumps, ujson.loads
+
+
+def _orjson(sort_keys):
+    import orjson
+
+    _dumps = orjson.dumps
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    options = (option, option | orjson.OPT_INDENT_2)
+    # the integers beyond 64 bits and the keys of mixed types are not supported by orjson
+    fallback = _json(sort_keys)[0]
+
+    def dumps(data, pretty=False):
+        try:
+            return _dumps(data, option=options[pretty])
+        except TypeError:
+            return fallback(data, pretty)
+
+    return dumps, orjson.loads
+
+
+def _msgpack(_):
+    import msgpack
+
+    packb = functools.partial(msgpack.packb, use_bin_type=True)
+
+    def dumps(data, pretty=False):
+        return packb(data)
+
+    return dumps, functools.partial(msgpack.unpackb, raw=False)
+
+
+_JSON_FACTORIES = {'json': _json, 'ujson': _ujson, 'orjson': _orjson}
+
+_JSON_CONTENT_TYPE = '%s; charset=%s' % (JSON_CONTENT_TYPE, CHARSET)
+
+# the serializers by media type
+_registry = dict()
+
+
+def configure(backend=None, sort_keys=True):
+    """
+    selects the serialization backends
+    :param backend: the name of json backend: json, ujson or orjson, the first available of ujson and json by default
+    :param sort_keys: if True, the keys of objects are sorted
+    """
+    if backend is not None and backend not in _JSON_FACTORIES:
+        raise ValueError("unknown json backend: %r" % backend)
+
+    names = JSON_BACKENDS if backend is None else (backend,)
+    for name in names:
+        try:
+            dumps, loads = _JSON_FACTORIES[name](sort_keys)
+            break
+        except ImportError:
+            if backend is not None:
+                raise
+    else:
+        raise ImportError("there is no json backend")
+
+    _registry.clear()
+    _registry[JSON_CONTENT_TYPE] = Serializer(name, _JSON_CONTENT_TYPE, dumps, loads)
+    try:
+        dumps, loads = _msgpack(sort_keys)
+        _registry[MSGPACK_CONTENT_TYPE] = _registry['application/x-msgpack'] = Serializer(
+            'msgpack', MSGPACK_CONTENT_TYPE, dumps, loads, text=False
+        )
+    except ImportError:
+        pass
+    negotiate.cache_clear()
+
+
+def get(media_type=JSON_CONTENT_TYPE):
+    """returns the serializer by media type, None if media type is not supported"""
+    return _registry.get(media_type)
+
+
+@functools.lru_cache(maxsize=256)
+def negotiate(accept):
+    """selects the serializer by Accept header, json is used by default"""
+    if accept:
+        candidates = []
+        for i, item in enumerate(accept.split(',')):
+            media_type, _, params = item.partition(';')
+            quality = 1.0
+            for param in params.split(';'):
+                name, _, value = param.partition('=')
+                if name.strip() == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if quality > 0:
+                candidates.append((-quality, i, media_type.strip().lower()))
+
+        for _, _, media_type in sorted(candidates):
+            serializer = _registry.get(media_type)
+            if serializer is not None:
+                return serializer
+    return _registry[JSON_CONTENT_TYPE]
+
+
+configure()
@@ -15,6 +15,11 @@ SOFTWARE.
 
 import asyncio
 import functools
+import inspect
+
+
+# the results of handlers, that are checked before the slow check of abstract Awaitable
+_PLAIN_TYPES = (dict, list, tuple, str, bytes, int, float)
 
 
 def _convert(converter, future1, future2):
@@ -39,3 +44,8 @@ def convert1(converter, future, loop=None):
 
     result = asyncio.Future(loop=loop)
     return convert2(converter, future, result)
+
+
+def isawaitable(obj):
+    """the fast version of inspect.isawaitable for the plain results"""
+    return obj is not None and not isinstance(obj, _PLAIN_TYPES) and inspect.isawaitable(obj)
@@ -13,11 +13,21 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import asyncio
+import socket
 import unittest
 import warnings
 from unittest import mock
 
+from tornado import web
+from tornado.iostream import IOStream
+from tornado.platform.asyncio import AsyncIOLoop
+from tornado.testing import AsyncHTTPTestCase
+from tornado.testing import gen_test
+
 from storm import application
+from storm._tornado.application import _shutdown_handler
+from storm._tornado.handler import RequestHandler
 
 
 class PackageStub:
@@ -31,7 +41,7 @@ class PackageStub:
         self.SETTINGS = settings
 
 
-def _traverse_mock(p, consumer):
+def _traverse_mock(p, consumer, manifest=None):
     for i in p:
         consumer(i)
 
@@ -82,5 +92,132 @@ class TestApplication(unittest.TestCase):
             "/",
             package.SETTINGS, ["m1"],
             dict([]).items(),
-            known_exceptions=package.EXCEPTIONS
+            known_exceptions=mock.ANY
         )
+        resolver = framework.start_serve.call_args[1]['known_exceptions']
+        self.assertEqual(package.EXCEPTIONS, resolver.exceptions)
+
+    def test_exception_resolver(self):
+        class Error1(Exception):
+            pass
+
+        class Error2(Error1, KeyError):
+            pass
+
+        resolver = application.ExceptionResolver({Exception: 500, LookupError: 404, Error1: 400})
+        self.assertEqual(400, resolver.resolve(Error1))
+        self.assertEqual(400, resolver.resolve(Error2))
+        self.assertEqual(404, resolver.resolve(KeyError))
+        self.assertEqual(500, resolver.resolve(ValueError))
+        self.assertIsNone(resolver.resolve(KeyboardInterrupt))
+
+
+class _SlowHandler(RequestHandler):
+    async def get(self):
+        self.settings['entered'].set()
+        await self.settings['release'].wait()
+        self.write('slow')
+
+
+class _FastHandler(RequestHandler):
+    def get(self):
+        self.write('fast')
+
+
+@mock.patch('storm._tornado.application.executors.shutdown')
+class TestShutdown(AsyncHTTPTestCase):
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    def get_app(self):
+        self.active_requests = set()
+        return web.Application(
+            [('/slow', _SlowHandler), ('/fast', _FastHandler)],
+            active_requests=self.active_requests, entered=asyncio.Event(), release=asyncio.Event()
+        )
+
+    def _shutdown(self, timeout=5):
+        self.modules = mock.MagicMock()
+        stopped = asyncio.Future()
+        loop = mock.Mock(wraps=self.io_loop)
+        loop.stop.side_effect = lambda: stopped.set_result(True)
+        _shutdown_handler(loop, self.http_server, self._app.settings, self.modules, timeout)()
+        return stopped
+
+    async def _connect(self):
+        stream = IOStream(socket.socket())
+        await stream.connect(('127.0.0.1', self.get_http_port()))
+        return stream
+
+    @staticmethod
+    async def _request(stream, path):
+        stream.write(('GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % path).encode())
+        headers = (await stream.read_until(b'\r\n\r\n')).decode()
+        length = next(int(x.split(':')[1]) for x in headers.split('\r\n') if x.lower().startswith('content-length'))
+        return headers, await stream.read_bytes(length)
+
+    @gen_test
+    async def test_inflight_request(self, _):
+        settings = self._app.settings
+        stream = await self._connect()
+        response = asyncio.ensure_future(self._request(stream, '/slow'))
+        await settings['entered'].wait()
+        stopped = self._shutdown()
+        await asyncio.sleep(0.3)
+        self.assertFalse(stopped.done())
+        self.assertEqual(1, len(self.active_requests))
+
+        settings['release'].set()
+        _, body = await response
+        self.assertEqual(b'slow', body)
+        await asyncio.wait_for(stream.read_until_close(), 1)
+        await asyncio.wait_for(stopped, 1)
+        self.assertEqual(0, len(self.active_requests))
+        self.modules.unload.assert_called_once_with()
+
+    @gen_test
+    async def test_keep_alive(self, _):
+        settings = self._app.settings
+        idle = await self._connect()
+        headers, _ = await self._request(idle, '/fast')
+        self.assertNotIn('Connection: close', headers)
+
+        stream = await self._connect()
+        response = asyncio.ensure_future(self._request(stream, '/slow'))
+        await settings['entered'].wait()
+        stopped = self._shutdown()
+        await asyncio.sleep(0.2)
+
+        # the client is asked to close the kept alive connection
+        headers, body = await self._request(idle, '/fast')
+        self.assertEqual(b'fast', body)
+        self.assertIn('Connection: close', headers)
+
+        settings['release'].set()
+        headers, _ = await response
+        self.assertIn('Connection: close', headers)
+        await asyncio.wait_for(stopped, 1)
+        # the connection, that has not been closed by client, is closed by server
+        await asyncio.wait_for(idle.read_until_close(), 1)
+
+    @gen_test
+    async def test_idle_connection_closed(self, _):
+        idle = await self._connect()
+        await self._request(idle, '/fast')
+        stopped = self._shutdown()
+        await asyncio.wait_for(idle.read_until_close(), 1)
+        await asyncio.wait_for(stopped, 1)
+
+    @gen_test
+    async def test_closed_connection(self, _):
+        settings = self._app.settings
+        stream = await self._connect()
+        stream.write(b'GET /slow HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        await settings['entered'].wait()
+        stream.close()
+        await asyncio.sleep(0.1)
+        # the handler is still running
+        self.assertEqual(1, len(self.active_requests))
+        settings['release'].set()
+        await asyncio.sleep(0.1)
+        self.assertEqual(0, len(self.active_requests))
@@ -0,0 +1,146 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import datetime
+import enum
+import typing
+import unittest
+import uuid
+
+from storm.decorators import argparser
+from storm.decorators import converters
+
+
+class _Color(enum.Enum):
+    red = 1
+    green = 2
+
+
+class _Context:
+    def __init__(self, **arguments):
+        self.arguments = arguments
+
+    def get_arguments(self, name):
+        return self.arguments.get(name, [])
+
+
+def _handler(context, **kwargs):
+    return kwargs
+
+
+class TestArgparser(unittest.TestCase):
+    def test_parse(self):
+        wrapped = argparser.argparser([
+            ('p1', int, False),
+            ('p2s', None, True),
+            ('k1', str, False, None),
+            ('k2', int, True, 2),
+        ])(_handler)
+
+        self.assertEqual(
+            {'p1': 2, 'p2s': ['a', 'b'], 'k1': None, 'k2': [3, 4]},
+            wrapped(_Context(p1=['1', '2'], p2s=['a', 'b'], k2=['3', '4']))
+        )
+        self.assertEqual(
+            {'p1': 5, 'p2s': ['a'], 'k1': 'c', 'k2': 2},
+            wrapped(_Context(p2s=['a'], k1=['c']), p1='5', unknown='1')
+        )
+
+    def test_errors(self):
+        wrapped = argparser.argparser([('p1', int, False), ('p2', None, False)])(_handler)
+
+        with self.assertRaises(argparser.MissingArgumentError) as ctx:
+            wrapped(_Context(p2=['a']))
+        self.assertEqual('p1', ctx.exception.arg_name)
+
+        with self.assertRaises(argparser.MissingArgumentError) as ctx:
+            wrapped(_Context(p1=['1']))
+        self.assertEqual('p2', ctx.exception.arg_name)
+
+        with self.assertRaises(argparser.InvalidArgumentTypeError) as ctx:
+            wrapped(_Context(p1=['a'], p2=['a']))
+        self.assertEqual(400, ctx.exception.status_code)
+        self.assertEqual('p1', ctx.exception.arg_name)
+        self.assertIs(int, ctx.exception.arg_type)
+
+    def test_path_sequence(self):
+        wrapped = argparser.argparser([('ids', typing.List[int], False), ('name', str, False)])(_handler)
+        self.assertEqual({'ids': [1, 2], 'name': 'a'}, wrapped(_Context(), ids='1,2', name='a'))
+        self.assertEqual({'ids': [3], 'name': 'b'}, wrapped(_Context(ids=['1']), ids='3', name='b'))
+
+    def test_wraps(self):
+        wrapped = argparser.argparser([])(_handler)
+        self.assertIs(_handler, wrapped.__wrapped__)
+        self.assertEqual({}, wrapped(_Context(p1=['1'])))
+
+
+class TestConverters(unittest.TestCase):
+    def test_resolve(self):
+        self.assertEqual((None, False, None, False), converters.resolve(None))
+        self.assertEqual((None, False, None, False), converters.resolve(str))
+        self.assertEqual((int, False, None, False), converters.resolve(int))
+        self.assertEqual((int, True, ',', False), converters.resolve(typing.List[int]))
+        self.assertEqual((None, True, ',', False), converters.resolve(list))
+        self.assertEqual((int, True, ',', False), converters.resolve(typing.Sequence[int]))
+        self.assertEqual((int, False, None, True), converters.resolve(typing.Optional[int]))
+        self.assertEqual((uuid.UUID, False, None, False), converters.resolve(uuid.UUID))
+        self.assertRaises(TypeError, converters.resolve, typing.Union[int, str])
+        self.assertRaises(TypeError, converters.resolve, typing.Dict[str, int])
+        self.assertRaises(TypeError, converters.resolve, typing.List[typing.Tuple[int, int]])
+
+    def test_convert(self):
+        def convert(annotation, value):
+            return converters.resolve(annotation)[0](value)
+
+        self.assertIs(True, convert(bool, 'Yes'))
+        self.assertIs(False, convert(bool, '0'))
+        self.assertRaises(ValueError, convert, bool, '2')
+        self.assertIs(_Color.green, convert(_Color, 'green'))
+        self.assertIs(_Color.red, convert(_Color, '1'))
+        self.assertRaises(ValueError, convert, _Color, 'blue')
+        self.assertEqual(datetime.date(2015, 3, 1), convert(datetime.date, '2015-03-01'))
+        self.assertEqual(datetime.datetime(2015, 3, 1, 10, 20, 30), convert(datetime.datetime, '2015-03-01T10:20:30'))
+        self.assertEqual(
+            datetime.datetime(2015, 3, 1, 10, 20, tzinfo=datetime.timezone.utc),
+            convert(datetime.datetime, '2015-03-01T10:20:00Z')
+        )
+        self.assertEqual(
+            datetime.datetime(2015, 3, 1, 10, 20, tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30))),
+            convert(datetime.datetime, '2015-03-01T10:20:00+05:30')
+        )
+        self.assertEqual(
+            datetime.datetime(2015, 3, 1, 10, 20, tzinfo=datetime.timezone.utc),
+            convert(datetime.datetime, '2015-03-01T10:20:00.000-00:00')
+        )
+        self.assertRaises(ValueError, convert, datetime.datetime, '2015-03-01 10')
+
+    def test_parse_typed(self):
+        wrapped = argparser.argparser([
+            ('ids', typing.List[int], False),
+            ('color', typing.Optional[_Color], False),
+            ('flag', bool, False, False),
+        ])(_handler)
+
+        self.assertEqual(
+            {'ids': [1, 2, 3], 'color': None, 'flag': False},
+            wrapped(_Context(ids=['1,2', '3'], flag=['false']))
+        )
+        self.assertEqual(
+            {'ids': [1], 'color': _Color.red, 'flag': True},
+            wrapped(_Context(ids=['1'], color=['red'], flag=['1']))
+        )
+        with self.assertRaises(argparser.InvalidArgumentTypeError) as ctx:
+            wrapped(_Context(ids=['1,a']))
+        self.assertEqual('Invalid type of argument ids, expected int', ctx.exception.log_message)
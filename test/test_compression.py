@@ -0,0 +1,55 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import gzip
+import unittest
+import zlib
+from unittest import mock
+
+from storm import compression
+
+
+class TestCompression(unittest.TestCase):
+    def tearDown(self):
+        super().tearDown()
+        compression.configure()
+
+    def test_negotiate(self):
+        self.assertIsNone(compression.negotiate(None))
+        self.assertIsNone(compression.negotiate('identity'))
+        self.assertEqual('gzip', compression.negotiate('gzip'))
+        self.assertEqual('deflate', compression.negotiate('gzip;q=0.5, deflate'))
+        self.assertIsNone(compression.negotiate('gzip;q=0'))
+        self.assertIn(compression.negotiate('gzip, deflate, br'), ('gzip', 'br'))
+        compression.configure(enabled=False)
+        self.assertIsNone(compression.negotiate('gzip'))
+
+    def test_compress(self):
+        compression.configure(threshold=10, level=1)
+        body = b'{"items": [1, 2, 3]}' * 10
+        context = mock.MagicMock()
+        context.get_header.return_value = 'gzip'
+        self.assertEqual(body, gzip.decompress(compression.compress(context, body)))
+        context.set_header.assert_any_call('Content-Encoding', 'gzip')
+        context.add_vary.assert_called_once_with('Accept-Encoding')
+
+        context = mock.MagicMock()
+        context.get_header.return_value = 'deflate'
+        self.assertEqual(body, zlib.decompress(compression.compress(context, body)))
+
+        context = mock.MagicMock()
+        context.get_header.return_value = 'gzip'
+        self.assertEqual(b'{}', compression.compress(context, b'{}'))
+        context.add_vary.assert_called_once_with('Accept-Encoding')
+        context.set_header.assert_not_called()
@@ -0,0 +1,589 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import gzip
+import importlib
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import ujson
+from tornado import gen
+from tornado import web
+from tornado.platform.asyncio import AsyncIOLoop
+from tornado.testing import AsyncHTTPTestCase
+from tornado.testing import gen_test
+
+from storm._tornado import executors
+from storm._tornado.application import compile_handler
+from storm._tornado.handler import RequestHandler
+from storm.decorators import cache
+from storm.decorators.cache import ResponseCache
+from storm.decorators.cache import _normalize
+from storm.decorators import handler
+from storm.decorators import json
+from storm.decorators import limits
+from storm.handler import _apply_argparser
+from storm.handler import declare
+
+
+class _Context:
+    deadline = None
+    remaining_time = RequestHandler.remaining_time
+    admit = RequestHandler.admit
+    settings = {}
+
+    def __init__(self):
+        self.current_user = 'user'
+        self.finished = False
+        self.logger = mock.MagicMock()
+        self.send_error = mock.MagicMock()
+        self.write = mock.MagicMock()
+        self.set_status = mock.MagicMock()
+
+
+class TestHandler(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        super().tearDown()
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_sync_handler(self):
+        context = _Context()
+        self.assertIsNone(handler.handler(lambda c: 'ok', status=201)(context))
+        context.set_status.assert_called_once_with(201)
+        context.write.assert_called_once_with('ok')
+
+    def test_async_handler(self):
+        async def func(_):
+            return 'ok'
+
+        context = _Context()
+        self.loop.run_until_complete(handler.handler(func)(context))
+        context.write.assert_called_once_with('ok')
+        self.assertIsNone(context.deadline)
+
+    def test_timeout(self):
+        async def func(_):
+            await asyncio.sleep(1)
+
+        context = _Context()
+        self.loop.run_until_complete(handler.handler(func, timeout=0.01)(context))
+        context.send_error.assert_called_once_with(504, reason=mock.ANY)
+        self.assertEqual(0, context.remaining_time())
+
+    def test_remaining_time(self):
+        remaining = []
+
+        async def func(c):
+            remaining.append(c.remaining_time())
+
+        start = time.monotonic()
+        context = _Context()
+        self.loop.run_until_complete(handler.handler(func, timeout=10)(context))
+        self.assertTrue(0 < remaining[0] <= 10)
+        self.assertAlmostEqual(start + 10, context.deadline, delta=1)
+        context.send_error.assert_not_called()
+
+    def test_max_concurrency(self):
+        event = asyncio.Event()
+
+        async def func(_):
+            await event.wait()
+            return 'ok'
+
+        h = handler.handler(func, max_concurrency=1, max_queue=1)
+        contexts = [_Context() for _ in range(3)]
+        tasks = [self.loop.create_task(h(c)) for c in contexts]
+        self.loop.run_until_complete(asyncio.sleep(0))
+        contexts[2].send_error.assert_called_once_with(503, reason=mock.ANY, headers={"Retry-After": "1"})
+        event.set()
+        self.loop.run_until_complete(asyncio.gather(*tasks))
+        contexts[0].write.assert_called_once_with('ok')
+        contexts[1].write.assert_called_once_with('ok')
+        name = func.__module__ + '.' + func.__qualname__
+        self.assertEqual(
+            {"max_concurrency": 1, "max_queue": 1, "active": 0, "queued": 0, "shed": 1, "timeouts": 0},
+            limits.stats()[name]
+        )
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        super().tearDown()
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_fifo(self):
+        limiter = limits.ConcurrencyLimiter(1, max_queue=2)
+        order = []
+
+        async def call(n):
+            await limiter.acquire()
+            order.append(n)
+            await asyncio.sleep(0)
+            limiter.release()
+
+        tasks = [self.loop.create_task(call(n)) for n in range(3)]
+        self.loop.run_until_complete(asyncio.wait(tasks))
+        self.assertEqual([0, 1, 2], order)
+        self.assertEqual(0, limiter.active)
+
+    def test_queue_timeout(self):
+        limiter = limits.ConcurrencyLimiter(1, max_queue=1, queue_timeout=0.01)
+        self.loop.run_until_complete(limiter.acquire())
+        with self.assertRaises(limits.Overloaded):
+            self.loop.run_until_complete(limiter.acquire())
+        self.assertEqual(0, limiter.queued)
+        self.assertEqual(1, limiter.timeouts)
+        limiter.release()
+        self.assertEqual(0, limiter.active)
+
+
+class TestSingleFlight(AsyncHTTPTestCase):
+    calls = 0
+
+    def get_app(self):
+        release = self.release = asyncio.Event()
+
+        async def func(context, value: int):
+            TestSingleFlight.calls += 1
+            await release.wait()
+            return {'value': value, 'calls': TestSingleFlight.calls}
+
+        async def session(context, value: int):
+            TestSingleFlight.calls += 1
+            context.set_cookie('session', str(TestSingleFlight.calls))
+            await release.wait()
+            return {'value': value}
+
+        async def flaky(context, value: int):
+            TestSingleFlight.calls += 1
+            calls = TestSingleFlight.calls
+            await release.wait()
+            if calls == 1:
+                raise web.HTTPError(503)
+            return {'value': value}
+
+        h = handler.handler(_apply_argparser(json.output(func)), secure=False, coalesce=True)
+        h_session = handler.handler(_apply_argparser(json.output(session)), secure=False, coalesce=True)
+        h_flaky = handler.handler(_apply_argparser(json.output(flaky)), secure=False, coalesce=True)
+        return web.Application(
+            [('/test', compile_handler({'get': h})), ('/session', compile_handler({'get': h_session})),
+             ('/flaky', compile_handler({'get': h_flaky}))],
+            active_requests=set(), known_exceptions=handler.ExceptionResolver({})
+        )
+
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    @gen_test
+    def test_coalesce(self):
+        TestSingleFlight.calls = 0
+        client = self.http_client
+        futures = [client.fetch(self.get_url('/test?value=%d' % (i % 2))) for i in range(4)]
+        yield gen.sleep(0.05)
+        self.release.set()
+        responses = yield futures
+        self.assertEqual(2, TestSingleFlight.calls)
+        self.assertEqual(
+            [{'value': i % 2, 'calls': 2} for i in range(4)],
+            [ujson.loads(r.body) for r in responses]
+        )
+
+    @gen_test
+    def test_cookies_not_shared(self):
+        TestSingleFlight.calls = 0
+        client = self.http_client
+        futures = [client.fetch(self.get_url('/session?value=1')) for _ in range(3)]
+        yield gen.sleep(0.05)
+        self.release.set()
+        responses = yield futures
+        self.assertEqual(3, TestSingleFlight.calls)
+        cookies = [r.headers['Set-Cookie'].split(';')[0] for r in responses]
+        self.assertEqual(3, len(set(cookies)))
+
+    @gen_test
+    def test_error_not_shared(self):
+        TestSingleFlight.calls = 0
+        client = self.http_client
+        futures = [client.fetch(self.get_url('/flaky?value=1'), raise_error=False) for _ in range(3)]
+        yield gen.sleep(0.05)
+        self.release.set()
+        responses = yield futures
+        # the followers handle the requests on their own, when the leader fails
+        self.assertEqual(3, TestSingleFlight.calls)
+        self.assertEqual([503, 200, 200], sorted((r.code for r in responses), reverse=True))
+
+
+class TestCache(AsyncHTTPTestCase):
+    calls = 0
+
+    def get_app(self):
+        async def func(context, value: int):
+            TestCache.calls += 1
+            return {'value': value, 'calls': TestCache.calls}
+
+        h = handler.handler(_apply_argparser(cache(json.output(func), ttl=0.05, stale=10)), secure=False)
+        self.name = func.__module__ + '.' + func.__qualname__
+        return web.Application(
+            [('/test', compile_handler({'get': h}))],
+            active_requests=set(), known_exceptions=handler.ExceptionResolver({})
+        )
+
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    def setUp(self):
+        super().setUp()
+        TestCache.calls = 0
+        cache.store.clear()
+
+    @gen_test
+    def test_cache(self):
+        fetch = self.http_client.fetch
+        responses = yield [fetch(self.get_url('/test?value=1')) for _ in range(3)]
+        self.assertEqual([{'value': 1, 'calls': 1}] * 3, [ujson.loads(r.body) for r in responses])
+        self.assertEqual('application/json; charset=UTF-8', responses[2].headers['Content-Type'])
+
+        response = yield fetch(self.get_url('/test?value=2'))
+        self.assertEqual({'value': 2, 'calls': 2}, ujson.loads(response.body))
+
+        # the stale response is served and refreshed in background
+        yield gen.sleep(0.06)
+        response = yield fetch(self.get_url('/test?value=1'))
+        self.assertEqual({'value': 1, 'calls': 1}, ujson.loads(response.body))
+        yield gen.sleep(0.01)
+        response = yield fetch(self.get_url('/test?value=1'))
+        self.assertEqual({'value': 1, 'calls': 3}, ujson.loads(response.body))
+
+        cache.invalidate(self.name, value=1)
+        response = yield fetch(self.get_url('/test?value=1'))
+        self.assertEqual({'value': 1, 'calls': 4}, ujson.loads(response.body))
+        self.assertEqual(2, len(cache.store))
+
+    @gen_test
+    def test_output_format(self):
+        fetch = self.http_client.fetch
+        pretty = yield fetch(self.get_url('/test?value=1&pretty=1'))
+        self.assertIn(b'\n', pretty.body)
+        response = yield fetch(self.get_url('/test?value=1'))
+        self.assertNotIn(b'\n', response.body)
+        self.assertEqual(2, TestCache.calls)
+
+    @gen_test
+    def test_date(self):
+        fetch = self.http_client.fetch
+        yield fetch(self.get_url('/test?value=1'))
+        entry = next(iter(cache.store._entries.values()))
+        self.assertNotIn('Date', [k for k, _ in entry.response[2]])
+        response = yield fetch(self.get_url('/test?value=1'))
+        self.assertIn('Date', response.headers)
+        self.assertEqual(1, TestCache.calls)
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_lru(self):
+        store = ResponseCache(30)
+        store.put(('a', (('id', 1),), None), (200, 'OK', [], b'1' * 10), 60)
+        store.put(('a', (('id', 2),), None), (200, 'OK', [], b'2' * 10), 60)
+        store.get(('a', (('id', 1),), None))
+        store.put(('b', (), None), (200, 'OK', [('X', 'y')], b'3' * 10), 60)
+        self.assertIsNotNone(store.get(('a', (('id', 1),), None)))
+        self.assertIsNone(store.get(('a', (('id', 2),), None)))
+        self.assertEqual(22, store.size)
+        store.put(('c', (), None), (200, 'OK', [], b'4' * 31), 60)
+        self.assertIsNone(store.get(('c', (), None)))
+        self.assertEqual(2, len(store))
+
+    def test_invalidate(self):
+        store = ResponseCache(100)
+        store.put(('a', (('id', 1), ('x', 1)), None), (200, 'OK', [], b'1'), 60)
+        store.put(('a', (('id', 2), ('x', 1)), None), (200, 'OK', [], b'2'), 60)
+        store.put(('b', (('id', 1),), None), (200, 'OK', [], b'3'), 60)
+        store.invalidate('a', id=1)
+        self.assertEqual(2, len(store))
+        store.invalidate('a')
+        self.assertEqual(1, len(store))
+        self.assertEqual(1, store.size)
+
+    def test_normalize(self):
+        key = _normalize({'ids': [[1, 2], [3]], 'tags': {'b', 'a'}, 'filter': {'x': [1]}, 'id': 1})
+        self.assertEqual(
+            (('filter', (('x', (1,)),)), ('id', 1), ('ids', ((1, 2), (3,))), ('tags', frozenset('ab'))), key
+        )
+        hash(key)
+
+
+class TestEtag(AsyncHTTPTestCase):
+    calls = 0
+
+    def get_app(self):
+        def func(context, value: int):
+            TestEtag.calls += 1
+            return {'value': value}
+
+        def versioned(context, value: int):
+            if context.check_version('v%d' % value):
+                return
+            TestEtag.calls += 1
+            return {'value': value}
+
+        return web.Application(
+            [
+                ('/test', compile_handler({'get': handler.handler(
+                    _apply_argparser(json.output(func)), secure=False, etag='fast'
+                )})),
+                ('/default', compile_handler({'get': handler.handler(
+                    _apply_argparser(json.output(func)), secure=False
+                )})),
+                ('/versioned', compile_handler({'get': handler.handler(
+                    _apply_argparser(json.output(versioned)), secure=False
+                )})),
+                ('/disabled', compile_handler({'get': handler.handler(
+                    _apply_argparser(json.output(func)), secure=False, etag=False
+                )})),
+            ],
+            active_requests=set(), known_exceptions=handler.ExceptionResolver({})
+        )
+
+    def setUp(self):
+        super().setUp()
+        TestEtag.calls = 0
+
+    def test_fingerprint(self):
+        response = self.fetch('/test?value=1')
+        self.assertEqual(200, response.code)
+        etag = response.headers['Etag']
+        response = self.fetch('/test?value=1', headers={'If-None-Match': etag})
+        self.assertEqual(304, response.code)
+        self.assertEqual(b'', response.body)
+        response = self.fetch('/test?value=2', headers={'If-None-Match': etag})
+        self.assertEqual(200, response.code)
+        self.assertNotIn('Etag', self.fetch('/disabled?value=1').headers)
+
+    def test_default(self):
+        etag = self.fetch('/default?value=1').headers['Etag']
+        self.assertEqual(42, len(etag))
+        self.assertNotEqual(etag, self.fetch('/test?value=1').headers['Etag'])
+        response = self.fetch('/default?value=1', headers={'If-None-Match': etag})
+        self.assertEqual(304, response.code)
+
+    def test_version(self):
+        response = self.fetch('/versioned?value=1')
+        self.assertEqual('"v1"', response.headers['Etag'])
+        response = self.fetch('/versioned?value=1', headers={'If-None-Match': '"v1"'})
+        self.assertEqual(304, response.code)
+        self.assertEqual(1, TestEtag.calls)
+
+
+def _pid(_, value: int):
+    return {'value': value, 'pid': os.getpid(), 'thread': threading.get_ident()}
+
+
+class TestExecutor(AsyncHTTPTestCase):
+    def get_app(self):
+        def make(executor):
+            return declare('get', '/', mutator='json', secure=False, executor=executor)(_pid).keywords['h']
+
+        app = web.Application(
+            [('/thread', compile_handler({'get': make('thread')})),
+             ('/process', compile_handler({'get': make('process')}))],
+            active_requests=set(), known_exceptions=handler.ExceptionResolver({})
+        )
+        executors.start()
+        return app
+
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    def tearDown(self):
+        super().tearDown()
+        executors.shutdown()
+
+    def test_thread(self):
+        response = ujson.loads(self.fetch('/thread?value=1').body)
+        self.assertEqual(1, response['value'])
+        self.assertEqual(os.getpid(), response['pid'])
+        self.assertNotEqual(threading.get_ident(), response['thread'])
+
+    def test_process(self):
+        response = ujson.loads(self.fetch('/process?value=2').body)
+        self.assertEqual(2, response['value'])
+        self.assertNotEqual(os.getpid(), response['pid'])
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            declare('get', '/', executor='fiber')(_pid)
+
+    def test_not_started(self):
+        executors.shutdown()
+        with self.assertRaisesRegex(RuntimeError, "not started"):
+            executors.get('process')
+
+    @mock.patch('storm._tornado.executors.multiprocessing.get_start_method', return_value='spawn')
+    def test_start_method(self, _):
+        executors.shutdown()
+        with self.assertRaisesRegex(RuntimeError, "'fork' start method"):
+            executors.start()
+
+
+class TestJsonStream(AsyncHTTPTestCase):
+    def get_app(self):
+        def generator(context, count: int):
+            return ({'id': i} for i in range(count))
+
+        class Iterator:
+            def __init__(self, count):
+                self.items = iter(range(count))
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                await asyncio.sleep(0)
+                try:
+                    return {'id': next(self.items)}
+                except StopIteration:
+                    raise StopAsyncIteration
+
+        async def iterator(context, count: int):
+            return Iterator(count)
+
+        def failing(context, count: int):
+            yield from ({'id': i} for i in range(count))
+            raise ValueError("failed")
+
+        return web.Application(
+            [('/generator', compile_handler({'get': handler.handler(
+                _apply_argparser(json.output(generator)), secure=False)})),
+             ('/failing', compile_handler({'get': handler.handler(
+                 _apply_argparser(json.output(failing)), secure=False)})),
+             ('/iterator', compile_handler({'get': handler.handler(
+                 _apply_argparser(json.output(iterator)), secure=False)}))],
+            active_requests=set(), known_exceptions=handler.ExceptionResolver({})
+        )
+
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    @mock.patch.object(importlib.import_module('storm.decorators.json'), 'STREAM_BATCH_SIZE', 16)
+    def test_array(self):
+        for path in ('/generator', '/iterator'):
+            for count in (0, 1, 100):
+                response = self.fetch(path + '?count=%d' % count)
+                self.assertEqual([{'id': i} for i in range(count)], ujson.loads(response.body))
+
+    @mock.patch.object(importlib.import_module('storm.decorators.json'), 'STREAM_BATCH_SIZE', 16)
+    def test_error(self):
+        # the error before the first flush is reported by status
+        self.assertEqual(500, self.fetch('/failing?count=1').code)
+        # the response, that has been started, is broken
+        response = self.fetch('/failing?count=10')
+        self.assertEqual(599, response.code)
+        self.assertIsNotNone(response.error)
+
+    def test_ndjson(self):
+        for path in ('/generator', '/iterator'):
+            response = self.fetch(path + '?count=3', headers={'Accept': 'application/x-ndjson'})
+            self.assertEqual('application/x-ndjson; charset=UTF-8', response.headers['Content-Type'])
+            self.assertEqual(b'{"id":0}\n{"id":1}\n{"id":2}\n', response.body)
+
+
+class TestStreamBody(AsyncHTTPTestCase):
+    def get_app(self):
+        async def func(context):
+            total = 0
+            async for item in context.body_stream:
+                total += item['value']
+            return {'total': total}
+
+        def buffered(context, _json):
+            return {'total': sum(i['value'] for i in _json)}
+
+        methods = {
+            'post': declare('post', '/', mutator='json.output', secure=False, stream_body=True,
+                            max_body_size=1024)(func).keywords['h'],
+            'put': declare('put', '/', mutator='json', secure=False)(buffered).keywords['h'],
+        }
+        return web.Application(
+            [('/test', compile_handler(methods))],
+            active_requests=set(), known_exceptions=handler.ExceptionResolver({})
+        )
+
+    def test_array(self):
+        body = ujson.dumps([{'value': i} for i in range(10)])
+        response = self.fetch('/test', method='POST', body=body, headers={'Content-Type': 'application/json'})
+        self.assertEqual({'total': 45}, ujson.loads(response.body))
+        response = self.fetch('/test', method='PUT', body=body, headers={'Content-Type': 'application/json'})
+        self.assertEqual({'total': 45}, ujson.loads(response.body))
+
+    def test_ndjson(self):
+        body = '\n'.join(ujson.dumps({'value': i}) for i in range(10))
+        response = self.fetch('/test', method='POST', body=body, headers={'Content-Type': 'application/x-ndjson'})
+        self.assertEqual({'total': 45}, ujson.loads(response.body))
+
+    def test_invalid(self):
+        response = self.fetch('/test', method='POST', body='[{"value": 1}, {"value"')
+        self.assertEqual(400, response.code)
+
+    def test_max_body_size(self):
+        body = ujson.dumps([{'value': i} for i in range(1000)])
+        response = self.fetch('/test', method='POST', body=body, headers={'Content-Type': 'application/json'})
+        self.assertNotEqual(200, response.code)
+
+
+class TestCompressedCache(AsyncHTTPTestCase):
+    calls = 0
+
+    def get_app(self):
+        def func(context):
+            TestCompressedCache.calls += 1
+            return {'items': list(range(1000))}
+
+        h = handler.handler(_apply_argparser(cache(json.output(func), ttl=60)), secure=False)
+        return web.Application(
+            [('/test', compile_handler({'get': h}))],
+            active_requests=set(), known_exceptions=handler.ExceptionResolver({})
+        )
+
+    def setUp(self):
+        super().setUp()
+        TestCompressedCache.calls = 0
+        cache.store.clear()
+
+    def test_compressed(self):
+        for _ in range(2):
+            response = self.fetch('/test', headers={'Accept-Encoding': 'gzip'}, decompress_response=False)
+            self.assertEqual('gzip', response.headers['Content-Encoding'])
+            self.assertEqual('Accept, Accept-Encoding', response.headers['Vary'])
+            self.assertEqual(list(range(1000)), ujson.loads(gzip.decompress(response.body))['items'])
+        for _ in range(2):
+            response = self.fetch('/test', decompress_response=False)
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertEqual(list(range(1000)), ujson.loads(response.body)['items'])
+        self.assertEqual(2, TestCompressedCache.calls)
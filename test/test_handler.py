@@ -44,16 +44,22 @@ class TestResources(unittest.TestCase):
         self.assertEqual(1, handler._apply_mutation(1, None))
         self.assertEqual(1, handler._apply_mutation(1, ''))
 
+        mutation3 = mock.Mock(return_value=4)
+        self.assertEqual(4, handler._apply_mutation(1, ['mutation1', mutation3]))
+        mutation3.assert_called_once_with(2)
+
     @mock.patch('storm.handler.argparser')
     def test_apply_argparser(self, argparser):
-        def test_func(p1, _p2, p3, p4s, p5: int, k1=2, k2: str=None, k3=None, k4s=2, _k5=0):
-            del p1, _p2, p3, p4s, p5, k1, k2, k3, k4s, _k5
+        def test_func(p1, _p2, p3, p4s, p5: int, status: int, address: str, k1=2, k2: str=None, k3=None, k4s=2, _k5=0):
+            del p1, _p2, p3, p4s, p5, status, address, k1, k2, k3, k4s, _k5
 
         handler._apply_argparser(test_func)
         argparser.argparser.assert_called_once_with([
             ('p3', None, False),
             ('p4s', None, True),
             ('p5', int, False),
+            ('status', int, False),
+            ('address', str, False),
             ('k1', int, False, 2),
             ('k2', str, False, None),
             ('k3', None, False, None),
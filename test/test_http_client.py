@@ -0,0 +1,178 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+
+from tornado import web
+from tornado.httpclient import HTTPError
+from tornado.platform.asyncio import AsyncIOLoop
+from tornado.testing import AsyncHTTPTestCase
+from tornado.testing import gen_test
+
+from storm._tornado.http_client import PooledHTTPClient
+
+
+class _SlowHandler(web.RequestHandler):
+    active = 0
+    peak = 0
+
+    async def get(self):
+        cls = type(self)
+        cls.active += 1
+        cls.peak = max(cls.peak, cls.active)
+        await asyncio.sleep(float(self.get_argument('delay', 0)))
+        cls.active -= 1
+        self.write('ok')
+
+
+class _StaleHandler(web.RequestHandler):
+    """closes the connection instead of answering the second request on it or any request, if close is set"""
+    streams = set()
+    close = False
+
+    def get(self):
+        stream = self.request.connection.stream
+        if self.close or stream in self.streams:
+            stream.close()
+            return
+        self.streams.add(stream)
+        self.write('ok')
+
+    post = get
+
+
+class _RedirectHandler(web.RequestHandler):
+    def post(self):
+        self.redirect('/', status=303)
+
+
+class TestPooledHTTPClient(AsyncHTTPTestCase):
+    def get_app(self):
+        return web.Application([('/', _SlowHandler), ('/stale', _StaleHandler), ('/redirect', _RedirectHandler)])
+
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    def setUp(self):
+        super().setUp()
+        _SlowHandler.active = _SlowHandler.peak = 0
+        _StaleHandler.streams = set()
+        _StaleHandler.close = False
+
+    def create_client(self, **kwargs):
+        client = PooledHTTPClient(**kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    @gen_test
+    def test_keep_alive(self):
+        client = self.create_client(idle_timeout=10)
+        for _ in range(3):
+            response = yield client.fetch(self.get_url('/'))
+            self.assertEqual(b'ok', response.body)
+        stats = client.stats()
+        self.assertEqual(1, stats['connections'])
+        self.assertEqual(2, stats['reused'])
+        self.assertEqual(1, stats['idle'])
+        self.assertAlmostEqual(2 / 3, stats['reuse_ratio'])
+
+    @gen_test
+    def test_no_keep_alive(self):
+        client = self.create_client()
+        for _ in range(2):
+            yield client.fetch(self.get_url('/'))
+        stats = client.stats()
+        self.assertEqual(0, stats['reused'])
+        self.assertEqual(0, stats['idle'])
+
+    @gen_test
+    def test_idle_timeout(self):
+        client = self.create_client(idle_timeout=0.05)
+        yield client.fetch(self.get_url('/'))
+        self.assertEqual(1, client.stats()['idle'])
+        yield asyncio.sleep(0.1)
+        self.assertEqual(0, client.stats()['idle'])
+
+    @gen_test
+    def test_per_host_limit(self):
+        client = self.create_client(max_clients=10, max_per_host=2)
+        futures = [client.fetch(self.get_url('/?delay=0.05')) for _ in range(5)]
+        yield asyncio.sleep(0.01)
+        stats = client.stats()
+        self.assertEqual(2, stats['active'])
+        self.assertEqual(3, stats['queued'])
+        self.assertEqual({'127.0.0.1:%d' % self.get_http_port(): 2}, stats['per_host'])
+        yield futures
+        self.assertEqual(2, _SlowHandler.peak)
+        self.assertEqual(3, client.stats()['queued_total'])
+        self.assertEqual({}, client.stats()['per_host'])
+
+    @gen_test
+    def test_queue_timeout(self):
+        client = self.create_client(max_clients=1, queue_timeout=0.02)
+        first = client.fetch(self.get_url('/?delay=0.1'))
+        with self.assertRaises(HTTPError) as ctx:
+            yield client.fetch(self.get_url('/'))
+        self.assertEqual(599, ctx.exception.code)
+        yield first
+        self.assertEqual(1, client.stats()['queue_timeouts'])
+
+    @gen_test
+    def test_stale_connection(self):
+        client = self.create_client(idle_timeout=10)
+        for _ in range(2):
+            response = yield client.fetch(self.get_url('/stale'))
+            self.assertEqual(b'ok', response.body)
+        stats = client.stats()
+        self.assertEqual(2, stats['connections'])
+        self.assertEqual(1, stats['reused'])
+        self.assertEqual(1, stats['stale_retries'])
+        self.assertEqual(2, len(_StaleHandler.streams))
+
+    @gen_test
+    def test_stale_retried_once(self):
+        client = self.create_client(idle_timeout=10)
+        yield client.fetch(self.get_url('/stale'))
+        # the new connection is closed too, so the request fails
+        _StaleHandler.close = True
+        with self.assertRaises(HTTPError) as ctx:
+            yield client.fetch(self.get_url('/stale'))
+        self.assertEqual(599, ctx.exception.code)
+        self.assertEqual(1, client.stats()['stale_retries'])
+
+    @gen_test
+    def test_stale_not_idempotent(self):
+        client = self.create_client(idle_timeout=10)
+        yield client.fetch(self.get_url('/stale'))
+        # the server may have processed the request, so it is not repeated
+        with self.assertRaises(HTTPError) as ctx:
+            yield client.fetch(self.get_url('/stale'), method='POST', body='')
+        self.assertEqual(599, ctx.exception.code)
+        self.assertEqual(0, client.stats()['stale_retries'])
+
+    @gen_test
+    def test_redirect(self):
+        client = self.create_client(idle_timeout=10)
+        response = yield client.fetch(self.get_url('/redirect'), method='POST', body='data')
+        self.assertEqual(b'ok', response.body)
+        self.assertEqual(self.get_url('/'), response.effective_url)
+        self.assertEqual(1, client.stats()['reused'])
+
+    @gen_test
+    def test_callback(self):
+        client = self.create_client()
+        responses = []
+        yield client.fetch(self.get_url('/unknown'), callback=responses.append)
+        self.assertEqual(404, responses[0].code)
+        self.assertEqual(404, responses[0].error.code)
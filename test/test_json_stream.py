@@ -0,0 +1,67 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import unittest
+
+from storm._tornado.json_stream import JsonStream
+
+
+class TestJsonStream(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        super().tearDown()
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def _parse(self, stream, body, size):
+        items = []
+
+        async def consume():
+            async for item in stream:
+                items.append(item)
+
+        async def produce():
+            for i in range(0, len(body), size):
+                drained = stream.feed(body[i:i + size])
+                if drained is not None:
+                    await drained
+            stream.close()
+
+        self.loop.run_until_complete(asyncio.gather(consume(), produce(), loop=self.loop))
+        return items
+
+    def test_array(self):
+        expected = [1, 23.5, "a,]\"b", {"x": [1, {"y": "}"}]}, [], None, True, -123456, "ф"]
+        body = ' [ 1 , 23.5,"a,]\\"b", {"x": [1, {"y": "}"}]}, [], null ,true,-123456, "ф"] '.encode('utf-8')
+        for size in (1, 2, 3, 7, len(body)):
+            self.assertEqual(expected, self._parse(JsonStream(max_pending=2), body, size))
+
+    def test_empty_array(self):
+        self.assertEqual([], self._parse(JsonStream(), b' [ ] ', 1))
+
+    def test_ndjson(self):
+        body = b'{"id": 1}\n\n{"id": 22}\r\n33'
+        for size in (1, 5, len(body)):
+            self.assertEqual([{"id": 1}, {"id": 22}, 33], self._parse(JsonStream(ndjson=True), body, size))
+
+    def test_invalid(self):
+        for body in (b'{"a": 1}', b'[1, 2', b'[1 2]', b'[1] 2', b'[1, {]'):
+            with self.assertRaises(Exception) as ctx:
+                self._parse(JsonStream(), body, 2)
+            self.assertEqual(400, ctx.exception.status_code)
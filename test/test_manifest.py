@@ -0,0 +1,158 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from storm import manifest
+from storm import resources
+
+
+_HANDLERS = '''
+import storm
+
+LAZY = True
+
+@storm.declare('get', '/lazy', secure=False)
+def get(context):
+    return 'lazy'
+'''
+
+_STREAM = '''
+import storm
+
+LAZY = True
+
+@storm.declare('post', '/stream', secure=False, stream_body=True, max_body_size=1024)
+def post(context):
+    return 'stream'
+'''
+
+_LIMITED = '''
+import storm
+
+LAZY = True
+
+@storm.declare('get', '/limited', secure=False, max_concurrency=1)
+def get(context):
+    return 'limited'
+'''
+
+_EAGER = '''
+import storm
+
+@storm.declare('get', '/eager', secure=False)
+def get(context):
+    return 'eager'
+'''
+
+_SETTINGS = '''
+SETTINGS = [{"name": "option"}]
+'''
+
+
+class _Registry:
+    def __init__(self):
+        self.items = list()
+
+    def add(self, *args):
+        self.items.extend(args)
+
+
+def _unload():
+    for name in [x for x in sys.modules if x.startswith('lazy_package')]:
+        del sys.modules[name]
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.TemporaryDirectory()
+        self.package = os.path.join(self.root.name, 'lazy_package')
+        os.mkdir(self.package)
+        modules = (
+            ('__init__', ''), ('handlers', _HANDLERS), ('settings', _SETTINGS), ('stream', _STREAM),
+            ('limited', _LIMITED), ('eager', _EAGER)
+        )
+        for name, content in modules:
+            with open(os.path.join(self.package, name + '.py'), 'w') as stream:
+                stream.write(content)
+        self.path = os.path.join(self.root.name, 'manifest.json')
+        sys.path.insert(0, self.root.name)
+
+    def tearDown(self):
+        super().tearDown()
+        sys.path.remove(self.root.name)
+        _unload()
+        self.root.cleanup()
+
+    def _traverse(self):
+        units = dict()
+        m = manifest.Manifest(self.path)
+        resources.traverse(['lazy_package'], lambda x: units.setdefault(x.__name__, x), m)
+        m.save()
+        return units
+
+    def test_lazy_import(self):
+        units = self._traverse()
+        self.assertIs(sys.modules['lazy_package.handlers'], units['lazy_package.handlers'])
+        _unload()
+
+        units = self._traverse()
+        self.assertNotIn('lazy_package.handlers', sys.modules)
+        self.assertIs(sys.modules['lazy_package.settings'], units['lazy_package.settings'])
+
+        registry = _Registry()
+        units['lazy_package.handlers'].get(registry)
+        method, url, h = registry.items
+        self.assertEqual(('get', '/lazy'), (method, url))
+        self.assertNotIn('lazy_package.handlers', sys.modules)
+        h(mock.MagicMock())
+        self.assertIn('lazy_package.handlers', sys.modules)
+        self.assertIs(sys.modules['lazy_package.handlers'].get.keywords['h'], h.load())
+
+    def test_invalidate(self):
+        self._traverse()
+        _unload()
+        with open(os.path.join(self.package, 'handlers.py'), 'a') as stream:
+            stream.write('\n# modified\n')
+        units = self._traverse()
+        self.assertIs(sys.modules['lazy_package.handlers'], units['lazy_package.handlers'])
+
+    def test_handler_attributes(self):
+        self._traverse()
+        _unload()
+        units = self._traverse()
+        self.assertNotIn('lazy_package.stream', sys.modules)
+        registry = _Registry()
+        units['lazy_package.stream'].post(registry)
+        h = registry.items[2]
+        self.assertTrue(h.stream_body)
+        self.assertEqual(1024, h.max_body_size)
+
+    def test_side_effects(self):
+        self._traverse()
+        _unload()
+        units = self._traverse()
+        self.assertIs(sys.modules['lazy_package.limited'], units['lazy_package.limited'])
+
+    def test_opt_in(self):
+        self._traverse()
+        _unload()
+        units = self._traverse()
+        self.assertIs(sys.modules['lazy_package.eager'], units['lazy_package.eager'])
@@ -0,0 +1,110 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import unittest
+
+from storm._tornado.application import OverloadController
+
+
+class TestOverloadController(unittest.TestCase):
+    def test_shed_by_priority(self):
+        controller = OverloadController(initial_limit=10)
+        for _ in range(5):
+            self.assertTrue(controller.admit('low'))
+        self.assertFalse(controller.admit('low'))
+        for _ in range(4):
+            self.assertTrue(controller.admit('normal'))
+        self.assertFalse(controller.admit('normal'))
+        self.assertTrue(controller.admit('high'))
+        self.assertFalse(controller.admit('high'))
+        self.assertTrue(controller.admit('critical'))
+        self.assertEqual({'low': 1, 'normal': 1, 'high': 1}, controller.stats()['shed'])
+        self.assertEqual(11, controller.inflight)
+
+    def test_increase(self):
+        controller = OverloadController(initial_limit=16, max_limit=20)
+        for _ in range(9):
+            controller.admit('normal')
+        controller.complete(0.01)
+        controller.adjust()
+        self.assertEqual(20, controller.limit)
+
+    def test_backoff_on_lag(self):
+        controller = OverloadController(initial_limit=100, min_limit=85, lag_threshold=0.05, backoff=0.9)
+        controller.lag = 0.1
+        controller.adjust()
+        self.assertEqual(90, controller.limit)
+        controller.adjust()
+        self.assertEqual(85, controller.limit)
+
+    def test_backoff_on_latency(self):
+        controller = OverloadController(initial_limit=100, latency_tolerance=2.0, backoff=0.5)
+        controller.admit('normal')
+        controller.complete(0.01)
+        controller.adjust()
+        for _ in range(20):
+            controller.admit('normal')
+            controller.complete(1.0)
+        controller.adjust()
+        self.assertEqual(50, controller.limit)
+        self.assertLess(controller.baseline, 0.02)
+
+    def test_idle(self):
+        controller = OverloadController(initial_limit=100, latency_tolerance=2.0, backoff=0.5)
+        controller.admit('normal')
+        controller.complete(0.01)
+        controller.adjust()
+        controller.admit('normal')
+        controller.complete(1.0)
+        controller.adjust()
+        self.assertEqual(50, controller.limit)
+        # no requests have been completed, the latency of previous interval is not checked again
+        for _ in range(10):
+            controller.adjust()
+        self.assertEqual(50, controller.limit)
+
+    def test_mixed_latency(self):
+        controller = OverloadController(initial_limit=100, latency_tolerance=2.0)
+        for _ in range(60):
+            controller.admit('normal')
+        for i in range(300):
+            # the steady load of fast and slow handlers, the share of slow requests varies from 25% to 75%
+            slow = 1 + i % 3
+            for n in range(60):
+                controller.complete(0.02 if n % 4 < slow else 0.001)
+                controller.admit('normal')
+            controller.adjust()
+        self.assertGreaterEqual(controller.limit, 100)
+        self.assertEqual({}, controller.stats()['shed'])
+
+    def test_recover_after_latency_shift(self):
+        controller = OverloadController(initial_limit=100, min_limit=10, baseline_window=10)
+        controller.admit('normal')
+        controller.complete(0.001)
+        controller.adjust()
+        for _ in range(30):
+            controller.admit('normal')
+            controller.complete(0.01)
+            controller.adjust()
+        limit = controller.limit
+        self.assertLess(limit, 100)
+        self.assertAlmostEqual(0.01, controller.baseline, delta=0.001)
+
+        for _ in range(int(limit)):
+            controller.admit('normal')
+        for _ in range(10):
+            controller.admit('normal')
+            controller.complete(0.01)
+            controller.adjust()
+        self.assertGreater(controller.limit, limit + 20)
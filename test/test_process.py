@@ -0,0 +1,86 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from storm._tornado import process
+
+
+# each worker appends own id to the file, the worker crashes on the first start, if crash is set
+_WORKER = """
+import os, sys
+from storm._tornado import process
+path, crash = sys.argv[1], sys.argv[2] == '1'
+worker_id = process.fork_workers(2)
+marker = '%s.%d' % (path, worker_id)
+with open(path, 'a') as f:
+    f.write('%d\\n' % worker_id)
+if crash and not os.path.exists(marker):
+    open(marker, 'w').close()
+    os._exit(1)
+os._exit(0)
+"""
+
+
+class TestForkWorkers(unittest.TestCase):
+    def _run(self, crash):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'workers')
+            subprocess.run(
+                [sys.executable, '-c', _WORKER, path, crash], check=True, timeout=30,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            )
+            with open(path) as f:
+                return sorted(int(x) for x in f.read().split())
+
+    def test_fork(self):
+        self.assertEqual([0, 1], self._run('0'))
+
+    def test_restart(self):
+        self.assertEqual([0, 0, 1, 1], self._run('1'))
+
+    @mock.patch.multiple('storm._tornado.process', _freeze_heap=mock.DEFAULT, signal=mock.DEFAULT, os=mock.DEFAULT,
+                         time=mock.DEFAULT)
+    def test_restart_rate(self, os, time, **_):
+        os.fork.side_effect = range(100, 200)
+        os.wait.side_effect = lambda: (os.fork.call_count + 99, signal.SIGKILL)
+        os.WIFSIGNALED.return_value = True
+        time.monotonic.side_effect = [0, 30, 61, 70]
+
+        with self.assertRaisesRegex(RuntimeError, 'too many worker restarts'):
+            process.fork_workers(1, max_restarts=2, restart_window=60)
+        # the restart at 0 is out of window at 61, so the master stops after the fourth crash
+        self.assertEqual(4, time.monotonic.call_count)
+        self.assertEqual(4, os.fork.call_count)
+
+    @mock.patch('storm._tornado.process.gc')
+    def test_freeze_heap(self, gc):
+        process._freeze_heap()
+        gc.collect.assert_called_once_with()
+        gc.freeze.assert_called_once_with()
+
+        del gc.freeze
+        process._freeze_heap()
+        self.assertEqual(1, gc.collect.call_count)
+
+    def test_worker_count(self):
+        self.assertEqual(3, process.worker_count(3))
+        with mock.patch('storm._tornado.process.os.cpu_count', return_value=None):
+            self.assertEqual(1, process.worker_count(0))
@@ -0,0 +1,100 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from tornado import httputil
+from tornado import web
+
+from storm._tornado import routing
+
+
+class _Handler(web.RequestHandler):
+    pass
+
+
+def _handler(name):
+    return type(name, (_Handler,), {})
+
+
+class TestRouting(unittest.TestCase):
+    def test_is_template(self):
+        self.assertTrue(routing.is_template('/test'))
+        self.assertTrue(routing.is_template('/v1.0/users/{id:int}/{name}'))
+        self.assertFalse(routing.is_template(r'/users/(\d+)'))
+        self.assertFalse(routing.is_template('/users/(?P<id>[^/]+)'))
+
+    def test_match(self):
+        router = routing.Router()
+        router.add('/', 'root')
+        router.add('/users/', 'users')
+        router.add('/users/me', 'me')
+        router.add('/users/{id:int}', 'user')
+        router.add('/users/{name}/items/{item:float}', 'item')
+        router.add('/files/{path:path}', 'files')
+
+        self.assertEqual(('root', {}), router.match('/'))
+        self.assertEqual(('users', {}), router.match('/users/'))
+        self.assertEqual(('me', {}), router.match('/users/me'))
+        self.assertEqual(('user', {'id': b'10'}), router.match('/users/10'))
+        self.assertEqual(('item', {'name': b'10', 'item': b'1.5'}), router.match('/users/10/items/1.5'))
+        self.assertEqual(('item', {'name': b'a b', 'item': b'2'}), router.match('/users/a%20b/items/2'))
+        self.assertEqual(('files', {'path': b'a/b.txt'}), router.match('/files/a/b.txt'))
+        self.assertIsNone(router.match('/users'))
+        self.assertIsNone(router.match('/users/a'))
+        self.assertIsNone(router.match('/users/a/items/b'))
+        self.assertIsNone(router.match('/files/'))
+
+    def test_add_invalid(self):
+        router = routing.Router()
+        with self.assertRaisesRegex(ValueError, "unknown type"):
+            router.add('/users/{id:uuid}', 'user')
+        with self.assertRaisesRegex(ValueError, "should be last"):
+            router.add('/files/{path:path}/info', 'files')
+
+    def test_add_duplicate(self):
+        router = routing.Router()
+        router.add('/users/{id}', 'user')
+        with self.assertRaisesRegex(ValueError, "already added"):
+            router.add('/users/{name}', 'name')
+        router.add('/files/{path:path}', 'files')
+        with self.assertRaisesRegex(ValueError, "already added"):
+            router.add('/files/{name:path}', 'files')
+        self.assertEqual(('user', {'id': b'1'}), router.match('/users/1'))
+
+    def test_application(self):
+        me, regex_user, template_user, named, regex_files, template_files, root = (
+            _handler(x) for x in ('me', 'regex_user', 'template_user', 'named', 'regex_files', 'template_files', 'root')
+        )
+        app = routing.Application([
+            ('/users/me', me),
+            (r'/users/(?P<id>\d+)$', regex_user),
+            ('/users/{id:int}', template_user),
+            ('/users/{name}', named),
+            (r'/files/(.*)$', regex_files),
+            ('/files/{path:path}', template_files),
+            ('/', root),
+        ])
+
+        def find(path):
+            delegate = app.find_handler(httputil.HTTPServerRequest(method='GET', uri=path))
+            return delegate.handler_class, delegate.path_args, delegate.path_kwargs
+
+        self.assertEqual((me, [], {}), find('/users/me'))
+        self.assertEqual((regex_user, [], {'id': b'10'}), find('/users/10'))
+        self.assertEqual((named, [], {'name': b'bob'}), find('/users/bob'))
+        self.assertEqual((regex_files, [b'a/b.txt'], {}), find('/files/a/b.txt'))
+        self.assertEqual((root, [], {}), find('/'))
+        self.assertIs(web.ErrorHandler, find('/unknown')[0])
@@ -0,0 +1,128 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import datetime
+import enum
+import importlib
+import typing
+import unittest
+from unittest import mock
+
+from storm.decorators import schema
+
+try:
+    import dataclasses
+except ImportError:
+    dataclasses = None
+
+
+class _Kind(enum.Enum):
+    book = 'book'
+    pen = 'pen'
+
+
+class _Item(dict):
+    name: str
+    kind: _Kind
+    price: float
+
+
+class _Order(dict):
+    id: int
+    created: datetime.date
+    items: typing.List[_Item]
+    note: typing.Optional[str]
+    extra: typing.Dict[str, int]
+
+
+class TestSchema(unittest.TestCase):
+    def test_is_schema(self):
+        self.assertTrue(schema.is_schema(_Order))
+        self.assertFalse(schema.is_schema(dict))
+        self.assertFalse(schema.is_schema(int))
+        self.assertFalse(schema.is_schema(None))
+        self.assertFalse(schema.is_schema(typing.List[int]))
+
+    def test_validate(self):
+        validate = schema.compile_schema(_Order)
+        result, errors = validate({
+            'id': 1, 'created': '2015-03-01', 'note': None, 'extra': {'a': 1},
+            'items': [{'name': 'a', 'kind': 'book', 'price': 1}],
+        })
+        self.assertEqual([], errors)
+        self.assertEqual(
+            {
+                'id': 1, 'created': datetime.date(2015, 3, 1), 'note': None, 'extra': {'a': 1},
+                'items': [{'name': 'a', 'kind': _Kind.book, 'price': 1.0}],
+            },
+            result
+        )
+
+    def test_errors(self):
+        validate = schema.compile_schema(_Order)
+        result, errors = validate({
+            'id': True, 'created': 'today', 'extra': {'a': 'b'},
+            'items': [{'name': 'a', 'kind': 'car', 'price': '1'}, 2],
+        })
+        self.assertIsNone(result)
+        self.assertEqual(
+            [
+                'id: expected int',
+                'created: expected date',
+                'items[0].kind: expected one of book, pen',
+                'items[0].price: expected float',
+                'items[1]: expected object',
+                'note: is required',
+                'extra.a: expected int',
+            ],
+            errors
+        )
+        self.assertEqual(['body: expected object'], validate([])[1])
+
+    @unittest.skipIf(dataclasses is None, "dataclasses are not available")
+    def test_dataclass(self):
+        @dataclasses.dataclass
+        class Point:
+            x: int
+            y: int = 0
+
+        self.assertTrue(schema.is_schema(Point))
+        validate = schema.compile_schema(Point)
+        self.assertEqual((Point(1, 0), []), validate({'x': 1}))
+        self.assertEqual((None, ['y: expected int']), validate({'x': 1, 'y': 'a'}))
+
+
+class TestJsonInput(unittest.TestCase):
+    def test_return_annotation(self):
+        json_module = importlib.import_module('storm.decorators.json')
+
+        def get(context) -> _Item:
+            return {'name': 'pen'}
+
+        context = mock.MagicMock()
+        context.get_body.return_value = b''
+        self.assertEqual({'name': 'pen'}, json_module._json_input(get)(context))
+        context.send_error.assert_not_called()
+
+    def test_body_required(self):
+        json_module = importlib.import_module('storm.decorators.json')
+
+        def post(context, item: _Item) -> _Item:
+            return item
+
+        context = mock.MagicMock()
+        context.get_body.return_value = b''
+        json_module._json_input(post)(context)
+        context.send_error.assert_called_once_with(400, reason="the request body is required")
@@ -0,0 +1,66 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import unittest
+
+from storm import serializers
+
+
+class TestSerializers(unittest.TestCase):
+    def tearDown(self):
+        super().tearDown()
+        serializers.configure()
+
+    def test_configure(self):
+        serializers.configure('json', sort_keys=False)
+        serializer = serializers.get()
+        self.assertEqual('json', serializer.name)
+        self.assertEqual('application/json; charset=UTF-8', serializer.content_type)
+        self.assertEqual(b'{"b":1,"a":[1,2]}', serializer.dumps({"b": 1, "a": [1, 2]}))
+        self.assertEqual({"a": 1}, serializer.loads(b'{"a": 1}'))
+
+        serializers.configure('json', sort_keys=True)
+        self.assertEqual(b'{"a":[1,2],"b":1}', serializers.get().dumps({"b": 1, "a": [1, 2]}))
+        self.assertEqual(b'{\n  "a": 1\n}', serializers.get().dumps({"a": 1}, True))
+
+        with self.assertRaises(ValueError):
+            serializers.configure('unknown')
+
+    def test_default(self):
+        serializers.configure()
+        self.assertIn(serializers.get().name, ('ujson', 'json'))
+        self.assertEqual(b'{"1":"a"}', serializers.get().dumps({1: 'a'}))
+
+    def test_orjson_fallback(self):
+        try:
+            serializers.configure('orjson')
+        except ImportError:
+            self.skipTest('orjson is not installed')
+        dumps = serializers.get().dumps
+        self.assertEqual(b'{"1":"a"}', dumps({1: 'a'}))
+        self.assertEqual(b'[%d]' % 2 ** 70, dumps([2 ** 70]))
+
+    def test_negotiate(self):
+        serializers.configure('json')
+        json_serializer = serializers.get()
+        msgpack_serializer = serializers.get(serializers.MSGPACK_CONTENT_TYPE)
+        self.assertIs(json_serializer, serializers.negotiate(None))
+        self.assertIs(json_serializer, serializers.negotiate('*/*'))
+        self.assertIs(json_serializer, serializers.negotiate('text/html, application/json'))
+        self.assertIs(json_serializer, serializers.negotiate('application/msgpack;q=0'))
+        self.assertIsNone(serializers.get('text/html'))
+        if msgpack_serializer is not None:
+            self.assertIs(msgpack_serializer, serializers.negotiate('application/msgpack'))
+            self.assertIs(msgpack_serializer, serializers.negotiate('application/json;q=0.5, application/x-msgpack'))
+            self.assertEqual({"a": [1]}, msgpack_serializer.loads(msgpack_serializer.dumps({"a": [1]})))
@@ -0,0 +1,530 @@
+"""
+This file is part of Storm
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import email.utils
+import gc
+import socket
+import time
+import unittest
+from unittest import mock
+
+from tornado import web
+from tornado.httpclient import HTTPError
+from tornado.platform.asyncio import AsyncIOLoop
+from tornado.testing import AsyncHTTPTestCase
+from tornado.testing import gen_test
+
+from storm._tornado.http_client import ConnectTimeoutError
+from storm._tornado.http_client import QueueTimeoutError
+from storm.modules import urlfetch
+
+
+def _context(remaining=None):
+    context = mock.MagicMock()
+    context.get_full_url.return_value = 'http://localhost/'
+    context.remaining_time.return_value = remaining
+    return context
+
+
+class _FlakyHandler(web.RequestHandler):
+    calls = 0
+    failures = 0
+    code = 503
+    retry_after = None
+
+    def get(self):
+        cls = type(self)
+        cls.calls += 1
+        if cls.calls <= cls.failures:
+            self.set_status(cls.code)
+            if cls.retry_after is not None:
+                self.set_header('Retry-After', cls.retry_after)
+        else:
+            self.write({'calls': cls.calls})
+
+    post = get
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_parse_retry_after(self):
+        self.assertIsNone(urlfetch._parse_retry_after(None))
+        self.assertIsNone(urlfetch._parse_retry_after('soon'))
+        self.assertEqual(2.0, urlfetch._parse_retry_after('2'))
+        date = email.utils.formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(60, urlfetch._parse_retry_after(date), delta=2)
+
+    def test_is_retryable(self):
+        policy = urlfetch.RetryPolicy()
+        self.assertTrue(policy.is_retryable(HTTPError(503)))
+        self.assertTrue(policy.is_retryable(HTTPError(599)))
+        self.assertFalse(policy.is_retryable(HTTPError(501)))
+        self.assertFalse(policy.is_retryable(HTTPError(404)))
+        self.assertTrue(policy.is_retryable(ConnectionRefusedError()))
+        self.assertFalse(policy.is_retryable(ValueError()))
+
+    def test_not_idempotent(self):
+        policy = urlfetch.RetryPolicy()
+        self.assertTrue(policy.is_idempotent('get'))
+        self.assertTrue(policy.is_idempotent('PUT'))
+        self.assertFalse(policy.is_idempotent('POST'))
+        self.assertFalse(policy.is_idempotent('PATCH'))
+        self.assertFalse(policy.is_retryable(HTTPError(503), False))
+        self.assertFalse(policy.is_retryable(HTTPError(599, 'Timeout during request'), False))
+        self.assertFalse(policy.is_retryable(ConnectionResetError(), False))
+        self.assertFalse(policy.is_retryable(HTTPError(599, 'Timeout while connecting'), False))
+        self.assertTrue(policy.is_retryable(ConnectTimeoutError(), False))
+        self.assertTrue(policy.is_retryable(QueueTimeoutError(), False))
+        self.assertTrue(policy.is_retryable(ConnectionRefusedError(), False))
+        self.assertTrue(policy.is_retryable(socket.gaierror(), False))
+
+    def test_delay(self):
+        policy = urlfetch.RetryPolicy(backoff=0.1, max_backoff=1.0)
+        for attempt in range(10):
+            self.assertLessEqual(policy.delay(attempt), min(1.0, 0.1 * 2 ** attempt))
+        response = mock.MagicMock(headers={'Retry-After': '0.5'})
+        self.assertGreaterEqual(policy.delay(0, response), 0.5)
+        response = mock.MagicMock(headers={'Retry-After': '5'})
+        self.assertIsNone(policy.delay(0, response))
+
+    def test_budget(self):
+        budget = urlfetch.RetryBudget(ratio=0.5, reserve=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+        self.assertEqual({'requests': 2, 'retries': 3, 'rejected': 2, 'balance': 0}, budget.stats())
+
+
+class TestRetries(AsyncHTTPTestCase):
+    def get_app(self):
+        return web.Application([('/', _FlakyHandler)])
+
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    def setUp(self):
+        super().setUp()
+        _FlakyHandler.calls = _FlakyHandler.failures = 0
+        _FlakyHandler.code = 503
+        _FlakyHandler.retry_after = None
+        self.budget = urlfetch.RetryBudget(ratio=0.1, reserve=10)
+        self.client = urlfetch.HTTPClient(
+            retries=3, retry_policy=urlfetch.RetryPolicy(backoff=0.01, max_backoff=0.1, budget=self.budget)
+        )
+        self.addCleanup(self.client.close)
+
+    @gen_test
+    def test_retry(self):
+        _FlakyHandler.failures = 2
+        response = yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertEqual({'calls': 3}, response.json)
+        self.assertEqual(2, self.budget.retries)
+
+    @gen_test
+    def test_post(self):
+        _FlakyHandler.failures = 1
+        with self.assertRaises(HTTPError) as ctx:
+            yield self.client.fetch(_context(), self.get_url('/'), data={})
+        self.assertEqual(503, ctx.exception.code)
+        self.assertEqual(1, _FlakyHandler.calls)
+
+        _FlakyHandler.calls = 0
+        response = yield self.client.fetch(_context(), self.get_url('/'), data={}, idempotent=True)
+        self.assertEqual({'calls': 2}, response.json)
+
+    @gen_test
+    def test_post_not_sent(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        with self.assertRaises(ConnectionRefusedError):
+            yield self.client.fetch(_context(), 'http://127.0.0.1:%d/' % port, data={}, retries=2)
+        self.assertEqual(2, self.budget.retries)
+
+    @gen_test
+    def test_not_retryable(self):
+        _FlakyHandler.failures = 1
+        _FlakyHandler.code = 501
+        with self.assertRaises(HTTPError) as ctx:
+            yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertEqual(501, ctx.exception.code)
+        self.assertEqual(1, _FlakyHandler.calls)
+
+    @gen_test
+    def test_retries_exhausted(self):
+        _FlakyHandler.failures = 10
+        with self.assertRaises(HTTPError):
+            yield self.client.fetch(_context(), self.get_url('/'), retries=1)
+        self.assertEqual(2, _FlakyHandler.calls)
+
+    @gen_test
+    def test_retry_after(self):
+        _FlakyHandler.failures = 1
+        _FlakyHandler.retry_after = '0.05'
+        start = time.monotonic()
+        yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+        _FlakyHandler.calls = 0
+        _FlakyHandler.retry_after = '60'
+        with self.assertRaises(HTTPError):
+            yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertEqual(1, _FlakyHandler.calls)
+
+    @gen_test
+    def test_deadline(self):
+        _FlakyHandler.failures = 1
+        _FlakyHandler.retry_after = '0.05'
+        with self.assertRaises(HTTPError):
+            yield self.client.fetch(_context(0.04), self.get_url('/'))
+        self.assertEqual(1, _FlakyHandler.calls)
+
+    @gen_test
+    def test_budget(self):
+        self.budget.balance = 1
+        _FlakyHandler.failures = 10
+        with self.assertRaises(HTTPError):
+            yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertEqual(2, _FlakyHandler.calls)
+        self.assertEqual(1, self.budget.rejected)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.clock = _Clock()
+        self.breaker = urlfetch.CircuitBreaker(
+            failure_rate=0.5, slow_call=1.0, slow_rate=0.8, min_requests=4, window=10,
+            open_timeout=5, probes=2, clock=self.clock
+        )
+
+    def test_failure_rate(self):
+        breaker = self.breaker
+        for failed in (True, False, True):
+            self.assertIsNone(breaker.allow())
+            breaker.record(failed, 0.1)
+        self.assertEqual('closed', breaker.state)
+        breaker.record(False, 0.1)
+        self.assertEqual('open', breaker.state)
+        self.assertEqual(5, breaker.allow())
+        self.assertEqual(1, breaker.stats()['rejected'])
+
+    def test_window(self):
+        breaker = self.breaker
+        for _ in range(3):
+            breaker.record(True, 0.1)
+        self.clock.now += 10
+        breaker.record(True, 0.1)
+        self.assertEqual('closed', breaker.state)
+        self.assertEqual(1, breaker.stats()['requests'])
+
+    def test_slow_rate(self):
+        breaker = self.breaker
+        for _ in range(4):
+            breaker.record(False, 2.0)
+        self.assertEqual('open', breaker.state)
+
+    def test_half_open(self):
+        breaker = self.breaker
+        for _ in range(4):
+            breaker.record(True, 0.1)
+        self.clock.now += 5
+        self.assertIsNone(breaker.allow())
+        self.assertEqual('half-open', breaker.state)
+        self.assertIsNone(breaker.allow())
+        self.assertIsNotNone(breaker.allow())
+        breaker.record(False, 0.1)
+        breaker.record(False, 0.1)
+        self.assertEqual('closed', breaker.state)
+
+        for _ in range(4):
+            breaker.record(True, 0.1)
+        self.clock.now += 5
+        self.assertIsNone(breaker.allow())
+        breaker.record(True, 0.1)
+        self.assertEqual('open', breaker.state)
+        self.assertEqual(3, breaker.stats()['opened'])
+
+
+class TestBreaker(AsyncHTTPTestCase):
+    def get_app(self):
+        return web.Application([('/', _FlakyHandler)])
+
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    def setUp(self):
+        super().setUp()
+        _FlakyHandler.calls = 0
+        _FlakyHandler.failures = 100
+        _FlakyHandler.code = 500
+        _FlakyHandler.retry_after = None
+        self.client = urlfetch.HTTPClient(breaker={'min_requests': 2, 'open_timeout': 60})
+        self.addCleanup(self.client.close)
+
+    @gen_test
+    def test_fail_fast(self):
+        for _ in range(2):
+            with self.assertRaises(HTTPError):
+                yield self.client.fetch(_context(), self.get_url('/'))
+        with self.assertRaises(urlfetch.CircuitOpenError) as ctx:
+            yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertGreater(ctx.exception.retry_after, 0)
+        self.assertEqual(2, _FlakyHandler.calls)
+        stats = self.client.stats()['breakers']['127.0.0.1:%d' % self.get_http_port()]
+        self.assertEqual('open', stats['state'])
+        self.assertEqual(1, stats['rejected'])
+        self.assertEqual(503, urlfetch.EXCEPTIONS[urlfetch.CircuitOpenError])
+
+
+class _CachedHandler(web.RequestHandler):
+    calls = 0
+    cache_control = 'max-age=60'
+    etag = None
+
+    def get(self):
+        cls = type(self)
+        cls.calls += 1
+        self.set_header('Cache-Control', cls.cache_control)
+        self.set_header('Vary', 'Accept-Language')
+        if cls.etag is not None:
+            self.set_header('Etag', cls.etag)
+            if self.request.headers.get('If-None-Match') == cls.etag:
+                self.set_status(304)
+                return
+        self.write({'calls': cls.calls, 'user': self.request.headers.get('Authorization')})
+
+
+class TestCache(AsyncHTTPTestCase):
+    def get_app(self):
+        return web.Application([('/', _CachedHandler)])
+
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    def setUp(self):
+        super().setUp()
+        _CachedHandler.calls = 0
+        _CachedHandler.cache_control = 'max-age=60'
+        _CachedHandler.etag = None
+        self.client = urlfetch.HTTPClient(cache_size=1 << 20)
+        self.addCleanup(self.client.close)
+
+    def test_freshness(self):
+        self.assertIsNone(urlfetch._freshness({'Cache-Control': 'no-store'}))
+        self.assertEqual(0, urlfetch._freshness({'Cache-Control': 'no-cache, max-age=10'}))
+        self.assertEqual(7, urlfetch._freshness({'Cache-Control': 'public, max-age=10', 'Age': '3'}))
+        self.assertEqual(20, urlfetch._freshness({'Cache-Control': 'max-age=10, s-maxage=20'}, True))
+        self.assertIsNone(urlfetch._freshness({'Cache-Control': 'max-age=10'}, True))
+        self.assertIsNone(urlfetch._freshness({'Cache-Control': 'private, max-age=10'}))
+        self.assertEqual(0, urlfetch._freshness({}))
+        headers = {
+            'Date': email.utils.formatdate(1000, usegmt=True),
+            'Expires': email.utils.formatdate(1030, usegmt=True),
+        }
+        self.assertEqual(30, urlfetch._freshness(headers))
+
+    @gen_test
+    def test_max_age(self):
+        first = yield self.client.fetch(_context(), self.get_url('/'))
+        second = yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertIs(first.json, second.json)
+        self.assertEqual(1, _CachedHandler.calls)
+        self.assertEqual(1, self.client.stats()['cache']['hits'])
+
+    @gen_test
+    def test_authorization(self):
+        url = self.get_url('/')
+        first = yield self.client.fetch(_context(), url, headers={'Authorization': 'Bearer alice'})
+        second = yield self.client.fetch(_context(), url, headers={'Authorization': 'Bearer bob'})
+        self.assertEqual('Bearer alice', first.json['user'])
+        self.assertEqual('Bearer bob', second.json['user'])
+        self.assertEqual(0, self.client.stats()['cache']['entries'])
+
+        _CachedHandler.cache_control = 'public, max-age=60'
+        yield self.client.fetch(_context(), url, headers={'Authorization': 'Bearer alice'})
+        yield self.client.fetch(_context(), url, headers={'Authorization': 'Bearer bob'})
+        self.assertEqual(3, _CachedHandler.calls)
+
+    @gen_test
+    def test_private(self):
+        _CachedHandler.cache_control = 'private, max-age=60'
+        yield self.client.fetch(_context(), self.get_url('/'))
+        yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertEqual(2, _CachedHandler.calls)
+
+    @gen_test
+    def test_anonymous_not_shared(self):
+        yield self.client.fetch(_context(), self.get_url('/'))
+        response = yield self.client.fetch(_context(), self.get_url('/'), headers={'Cookie': 'session=1'})
+        self.assertEqual(2, response.json['calls'])
+
+    @gen_test
+    def test_vary(self):
+        yield self.client.fetch(_context(), self.get_url('/'), headers={'Accept-Language': 'en'})
+        response = yield self.client.fetch(_context(), self.get_url('/'), headers={'Accept-Language': 'de'})
+        self.assertEqual(2, response.json['calls'])
+
+    @gen_test
+    def test_no_store(self):
+        _CachedHandler.cache_control = 'no-store'
+        yield self.client.fetch(_context(), self.get_url('/'))
+        yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertEqual(2, _CachedHandler.calls)
+        self.assertEqual(0, self.client.stats()['cache']['entries'])
+
+    @gen_test
+    def test_revalidate(self):
+        _CachedHandler.cache_control = 'no-cache'
+        _CachedHandler.etag = '"v1"'
+        first = yield self.client.fetch(_context(), self.get_url('/'))
+        second = yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertEqual(2, _CachedHandler.calls)
+        self.assertIs(first.json, second.json)
+        self.assertEqual(1, self.client.stats()['cache']['stale_hits'])
+
+        _CachedHandler.etag = '"v2"'
+        third = yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertEqual(3, third.json['calls'])
+
+    @gen_test
+    def test_revalidate_copy(self):
+        _CachedHandler.cache_control = 'no-cache'
+        _CachedHandler.etag = '"v1"'
+        first = yield self.client.fetch(_context(), self.get_url('/'))
+        _CachedHandler.cache_control = 'max-age=60'
+        second = yield self.client.fetch(_context(), self.get_url('/'))
+        # the response, that is held by the first caller, is not modified
+        self.assertEqual('no-cache', first.headers['Cache-Control'])
+        self.assertEqual('max-age=60', second.headers['Cache-Control'])
+        self.assertIs(first.json, second.json)
+        third = yield self.client.fetch(_context(), self.get_url('/'))
+        self.assertIs(second, third)
+        self.assertEqual(2, _CachedHandler.calls)
+
+    @gen_test
+    def test_json_size(self):
+        response = yield self.client.fetch(_context(), self.get_url('/'))
+        stats = self.client.stats()['cache']
+        self.assertGreater(stats['size'], len(response.body) + urlfetch._json_size(response.json))
+
+
+class _FanOutHandler(web.RequestHandler):
+    active = 0
+    peak = 0
+
+    async def get(self):
+        cls = type(self)
+        cls.active += 1
+        cls.peak = max(cls.peak, cls.active)
+        await asyncio.sleep(float(self.get_argument('delay', 0.01)))
+        cls.active -= 1
+        if self.get_argument('fail', None):
+            self.set_status(404)
+        self.write({'id': int(self.get_argument('id'))})
+
+
+class TestFetchMany(AsyncHTTPTestCase):
+    def get_app(self):
+        return web.Application([('/', _FanOutHandler)])
+
+    def get_new_ioloop(self):
+        return AsyncIOLoop()
+
+    def setUp(self):
+        super().setUp()
+        _FanOutHandler.active = _FanOutHandler.peak = 0
+        self.client = urlfetch.HTTPClient(max_connections=100)
+        self.addCleanup(self.client.close)
+
+    @gen_test
+    def test_fetch_many(self):
+        requests = [self.get_url('/?id=%d' % i) for i in range(10)]
+        requests[3] = {'url': self.get_url('/'), 'args': {'id': 3, 'fail': 1}}
+        results = yield self.client.fetch_many(_context(), requests, concurrency=3)
+        self.assertEqual(3, _FanOutHandler.peak)
+        self.assertIsInstance(results[3], HTTPError)
+        self.assertEqual(404, results[3].code)
+        responses = [x for x in results if not isinstance(x, Exception)]
+        self.assertEqual([i for i in range(10) if i != 3], [x.json['id'] for x in responses])
+
+    @gen_test
+    def test_fail_fast(self):
+        requests = [self.get_url('/?id=0&fail=1&delay=0')] + [self.get_url('/?id=%d&delay=0.1' % i) for i in range(5)]
+        with self.assertRaises(HTTPError):
+            yield self.client.fetch_many(_context(), requests, concurrency=2, fail_fast=True)
+        yield asyncio.sleep(0.15)
+        self.assertLessEqual(_FanOutHandler.peak, 2)
+
+    @gen_test
+    def test_fail_fast_frees_client(self):
+        client = urlfetch.HTTPClient(max_connections=2)
+        self.addCleanup(client.close)
+        requests = [self.get_url('/?id=0&fail=1&delay=0.05')] + [self.get_url('/?id=%d&delay=5' % i) for i in (1, 2)]
+        with self.assertRaises(HTTPError):
+            yield client.fetch_many(_context(), requests, concurrency=3, fail_fast=True)
+        yield asyncio.sleep(0.05)
+        # the active request is aborted and the queued one is removed from the client queue
+        stats = client.stats()
+        self.assertEqual((0, 0), (stats['active'], stats['queued']))
+        response = yield client.fetch(_context(), self.get_url('/?id=3&delay=0'))
+        self.assertEqual(3, response.json['id'])
+
+    @gen_test
+    def test_as_completed(self):
+        requests = [self.get_url('/?id=%d&delay=%f' % (i, 0.05 - i * 0.02)) for i in range(3)]
+        order = []
+        for future in self.client.fetch_as_completed(_context(), requests, concurrency=3):
+            index, response = yield future
+            self.assertEqual(index, response.json['id'])
+            order.append(index)
+        self.assertEqual([2, 1, 0], order)
+
+    @gen_test
+    def test_as_completed_stop_early(self):
+        handler = mock.Mock()
+        asyncio.get_event_loop().set_exception_handler(handler)
+        requests = [self.get_url('/?id=0&fail=1&delay=0')] + [self.get_url('/?id=%d' % i) for i in (1, 2)]
+        futures = self.client.fetch_as_completed(_context(), requests, concurrency=1, fail_fast=True)
+        index, error = yield next(futures)
+        self.assertIsInstance(error, HTTPError)
+        del futures
+        gc.collect()
+        handler.assert_not_called()
+
+    @gen_test
+    def test_invalid_concurrency(self):
+        for concurrency in (0, -1):
+            with self.assertRaises(ValueError):
+                yield self.client.fetch_many(_context(), [self.get_url('/?id=1')], concurrency=concurrency)
+            with self.assertRaises(ValueError):
+                self.client.fetch_as_completed(_context(), [self.get_url('/?id=1')], concurrency=concurrency)
+
+    @gen_test
+    def test_empty(self):
+        results = yield self.client.fetch_many(_context(), [])
+        self.assertEqual([], results)
@@ -42,3 +42,14 @@ class TestUtilities(unittest.TestCase):
         r = utilities.convert1(int, f, loop=self.loop)
         self.loop.run_until_complete(r)
         self.assertEqual(1, r.result())
+
+    def test_isawaitable(self):
+        async def coro():
+            pass
+
+        c = coro()
+        self.assertTrue(utilities.isawaitable(c))
+        self.assertTrue(utilities.isawaitable(asyncio.Future(loop=self.loop)))
+        for value in (None, {}, [], (), 'a', b'a', 1, 1.0, object()):
+            self.assertFalse(utilities.isawaitable(value))
+        c.close()